@@ -0,0 +1,100 @@
+# bm25.py
+# 키워드 검색용 BM25 역색인 / 법 조문 번호(제750조 등)처럼 벡터 검색이 놓치는 단어를 잡음
+import math
+import os
+import pickle
+import re
+from array import array
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+BM25_FILE = "bm25.pkl"
+
+# 조문 번호는 한 덩어리 토큰으로 유지 (예: 제750조, 제3조의2, 제1항)
+_STATUTE = re.compile(r"제\d+조(?:의\d+)?|제\d+항|제\d+호")
+_WORD = re.compile(r"[가-힣]+|[A-Za-z]+|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    """형태소 분석기 없이 쓰는 한국어 토크나이저 (조문 번호 + 단어 + 글자 2-gram)"""
+    tokens = _STATUTE.findall(text)
+    for word in _WORD.findall(_STATUTE.sub(" ", text)):
+        tokens.append(word.lower())
+        # 조사가 붙은 단어도 맞도록 한글은 2글자씩 잘라서 같이 색인
+        if len(word) > 2 and "가" <= word[0] <= "힣":
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class BM25Index:
+    """증분 추가가 가능한 BM25 역색인 (행 번호 = DocStore 행 번호)"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # 단어 -> (행 번호 목록, 단어 빈도 목록) / array 라서 numpy 로 복사 없이 변환됨
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_len = array("f")
+        self.total_len = 0.0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add(self, text: str) -> int:
+        """문서 한 건 추가 → 행 번호 반환"""
+        row = len(self.doc_len)
+        tokens = tokenize(text)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            if token not in self.postings:
+                self.postings[token] = (array("i"), array("f"))
+            rows, tfs = self.postings[token]
+            rows.append(row)
+            tfs.append(tf)
+        self.doc_len.append(len(tokens))
+        self.total_len += len(tokens)
+        return row
+
+    def add_many(self, texts: List[str]) -> List[int]:
+        return [self.add(text) for text in texts]
+
+    def search(self, text: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """질의 → [(행 번호, BM25 점수), ...] (점수 높은 순)"""
+        n = len(self.doc_len)
+        if n == 0:
+            return []
+        doc_len = np.frombuffer(self.doc_len, dtype=np.float32)
+        avgdl = self.total_len / n
+        scores = np.zeros(n, dtype=np.float32)
+
+        for token in set(tokenize(text)):
+            if token not in self.postings:
+                continue
+            rows, tfs = self.postings[token]
+            rows = np.frombuffer(rows, dtype=np.int32)
+            tfs = np.frombuffer(tfs, dtype=np.float32)
+            df = len(rows)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_len[rows] / avgdl)
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        top_k = min(top_k, n)
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(r), float(scores[r])) for r in best if scores[r] > 0]
+
+    def save(self, index_dir: str):
+        with open(os.path.join(index_dir, BM25_FILE), "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "BM25Index":
+        with open(os.path.join(index_dir, BM25_FILE), "rb") as f:
+            return pickle.load(f)
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, BM25_FILE))
@@ -0,0 +1,155 @@
+# build_index.py
+# 판례 검색 인덱스 오프라인 생성 / 서버 실행 전에 한 번만 돌리면 됨
+#
+# 실행 예시 (hakwon_study/Ai 폴더에서)
+# python -m ai_db.app.build_index --dataset ./dataset/training --out ./ai_db/index
+# python -m ai_db.app.build_index --dataset ./dataset/training --encoder legal-bert:./lerning/saved_mode3
+#   -> 승소율 분석 결과의 embedding 으로 바로 판례 검색 (LEGAL_RETURN_EMBEDDING=1)
+import argparse
+import json
+import os
+import time
+from typing import Dict, Iterator, List
+
+from .bm25 import BM25Index
+from .doc_store import DocStoreWriter
+from .vector_index import DEFAULT_ENCODER, VectorIndex, load_encoder
+
+# 임베딩에 넣을 최대 글자 수 (sentence-transformers 는 앞부분만 보기 때문에 잘라서 속도 확보)
+EMBED_CHARS = 1000
+
+
+def iter_legal_json(base_path: str) -> Iterator[Dict]:
+    """lagalAi.ipynb 의 load_legal_data 와 같은 방식으로 판례 JSON 읽기"""
+    for root, dirs, files in os.walk(base_path):
+        for file in sorted(files):
+            if not file.endswith('.json'):
+                continue
+            with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
+                try:
+                    content = json.load(f)
+                except Exception as e:
+                    print(f"Error reading {file}: {e}")
+                    continue
+            info = content.get('info', {})
+            label = content.get('label', {})
+            yield {
+                'category': info.get('lawClass', ''),
+                'case_num': info.get('caseNum', ''),
+                'case_name': info.get('caseName', ''),
+                'case_code': info.get('caseCode', ''),
+                'question': label.get('input', ''),
+                'body': label.get('output', ''),
+            }
+
+
+def iter_pickle(path: str) -> Iterator[Dict]:
+    """전처리된 DataFrame(pkl_file/...) 에서 판례 읽기"""
+    import pandas as pd
+    df = pd.read_pickle(path)
+    for row in df.to_dict("records"):
+        yield {
+            'category': row.get('category', ''),
+            'case_num': row.get('case_num', ''),
+            'case_name': row.get('case_name', ''),
+            'case_code': row.get('case_code', ''),
+            'question': row.get('question', ''),
+            'body': row.get('body', ''),
+        }
+
+
+def embed_text(doc: Dict) -> str:
+    return f"{doc['case_name']} {doc['question']} {doc['body']}"[:EMBED_CHARS]
+
+
+def keyword_text(doc: Dict) -> str:
+    """BM25 는 본문 전체를 색인 (조문 번호가 본문 뒤쪽에 나오는 경우가 많음)"""
+    return f"{doc['case_name']} {doc['question']} {doc['body']}"
+
+
+def assign_case_ids(docs: Iterator[Dict], used: set) -> Iterator[Dict]:
+    """사건번호를 id 로 사용 (같은 사건번호의 질의가 여러 개면 -2, -3 ... 붙이기)"""
+    for i, doc in enumerate(docs):
+        base = str(doc.get('case_num') or f"doc{i}").replace("/", "_")
+        case_id, n = base, 1
+        while case_id in used:
+            n += 1
+            case_id = f"{base}-{n}"
+        used.add(case_id)
+        doc['case_id'] = case_id
+        yield doc
+
+
+def build(docs: Iterator[Dict], out_dir: str, encoder_name: str = DEFAULT_ENCODER,
+          index_type: str = "hnsw", batch_size: int = 256, append: bool = False):
+    """문서 저장소 + 벡터 인덱스 + BM25 역색인을 같은 행 순서로 생성
+
+    append=True 면 기존 인덱스를 불러와 새 판례만 뒤에 추가 (전체 재임베딩 없음)
+    """
+    writer = DocStoreWriter(out_dir, append=append)
+    if append and len(writer.case_ids) > 0:
+        index = VectorIndex.load(out_dir, mmap=False)
+        if index.encoder_name != encoder_name:
+            print(f"⚠️ 기존 인덱스의 임베딩 모델({index.encoder_name})을 그대로 사용합니다.")
+        encoder = load_encoder(index.encoder_name)
+        if index.encoder_fingerprint and encoder.fingerprint != index.encoder_fingerprint:
+            raise RuntimeError("인덱스를 만든 뒤 임베딩 모델 가중치가 바뀌었습니다. append 없이 다시 생성하세요.")
+        bm25 = BM25Index.load(out_dir) if BM25Index.exists(out_dir) else None
+        if bm25 is None or len(bm25) != len(writer.case_ids):
+            raise RuntimeError("기존 BM25 역색인이 문서 저장소와 맞지 않습니다. append 없이 다시 생성하세요.")
+        print(f"🔄 기존 인덱스 {len(index)}건에 이어서 추가합니다.")
+    else:
+        encoder = load_encoder(encoder_name)
+        index = VectorIndex(encoder.dim, index_type=index_type, encoder_name=encoder_name,
+                            encoder_fingerprint=encoder.fingerprint)
+        bm25 = BM25Index()
+
+    start = time.time()
+    batch: List[Dict] = []
+    with writer:
+        for doc in assign_case_ids(docs, set(writer.case_ids)):
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                _flush(batch, writer, encoder, index, bm25)
+                batch = []
+        if batch:
+            _flush(batch, writer, encoder, index, bm25)
+
+    index.save(out_dir)
+    bm25.save(out_dir)
+    print(f"✅ 인덱스 생성 완료: {len(index)}건 / {time.time() - start:.1f}초 → {out_dir}")
+
+
+def _flush(batch, writer, encoder, index, bm25):
+    writer.add_many(batch)
+    index.add(encoder.encode([embed_text(doc) for doc in batch]))
+    bm25.add_many([keyword_text(doc) for doc in batch])
+    print(f"  - {len(index)}건 처리")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="판례 검색 인덱스 생성")
+    parser.add_argument("--dataset", help="판례 JSON 폴더 (예: ./dataset/training)")
+    parser.add_argument("--pickle", help="전처리된 DataFrame pkl 경로")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "..", "index"))
+    parser.add_argument("--encoder", default=DEFAULT_ENCODER,
+                        help="sentence-transformers 모델 이름 또는 legal-bert:<승소율 모델 폴더>")
+    parser.add_argument("--index-type", default="hnsw", choices=["hnsw", "flat"])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--append", action="store_true",
+                        help="기존 인덱스 뒤에 추가 (증분 색인, 새로 들어온 판례 폴더만 지정)")
+    args = parser.parse_args()
+
+    if args.dataset:
+        docs = iter_legal_json(args.dataset)
+    elif args.pickle:
+        docs = iter_pickle(args.pickle)
+    else:
+        parser.error("--dataset 또는 --pickle 중 하나는 필요합니다.")
+
+    build(docs, args.out, encoder_name=args.encoder,
+          index_type=args.index_type, batch_size=args.batch_size, append=args.append)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# doc_store.py
+# 판례 원문 저장소 / 전체 판례를 RAM 에 올리지 않고 메모리맵(mmap)으로 필요한 것만 읽기
+#
+# 파일 구성 (index 폴더 안)
+#   docs.bin     : 판례 JSON(UTF-8) 을 한 줄씩 이어붙인 파일
+#   offsets.npy  : i 번째 판례의 시작 바이트 위치 (길이 N+1, 마지막 값 = 파일 크기)
+#   case_ids.json: i 번째 판례의 사건 id 목록 (id -> 행 번호 테이블은 로딩시 만듦)
+import json
+import mmap
+import os
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+DOCS_FILE = "docs.bin"
+OFFSETS_FILE = "offsets.npy"
+IDS_FILE = "case_ids.json"
+
+# 요약 화면에서 보여줄 본문 길이
+SUMMARY_CHARS = 300
+
+
+class DocStoreWriter:
+    """판례를 한 건씩 docs.bin 뒤에 이어 쓰기 (append 모드면 기존 파일 뒤에 추가)"""
+
+    def __init__(self, index_dir: str, append: bool = False):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+
+        self.case_ids: List[str] = []
+        self.offsets: List[int] = [0]
+        if append and os.path.exists(os.path.join(index_dir, OFFSETS_FILE)):
+            self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE)).tolist()
+            with open(os.path.join(index_dir, IDS_FILE), encoding="utf-8") as f:
+                self.case_ids = json.load(f)
+        else:
+            append = False
+
+        self._f = open(os.path.join(index_dir, DOCS_FILE), "ab" if append else "wb")
+
+    def add(self, doc: Dict) -> int:
+        """판례 한 건 추가 → 행 번호 반환"""
+        data = (json.dumps(doc, ensure_ascii=False) + "\n").encode("utf-8")
+        self._f.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+        self.case_ids.append(doc["case_id"])
+        return len(self.case_ids) - 1
+
+    def add_many(self, docs: Iterable[Dict]) -> List[int]:
+        return [self.add(doc) for doc in docs]
+
+    def close(self):
+        self._f.close()
+        np.save(os.path.join(self.index_dir, OFFSETS_FILE),
+                np.asarray(self.offsets, dtype=np.int64))
+        with open(os.path.join(self.index_dir, IDS_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.case_ids, f, ensure_ascii=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DocStore:
+    """읽기 전용 판례 저장소 (검색 결과 행 번호 / 사건 id 로 원문 조회)"""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, IDS_FILE), encoding="utf-8") as f:
+            self.case_ids: List[str] = json.load(f)
+        # 사건 id -> 행 번호 (id 목록만 메모리에 올림)
+        self.id_to_row = {case_id: row for row, case_id in enumerate(self.case_ids)}
+
+        self._file = open(os.path.join(index_dir, DOCS_FILE), "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.case_ids)
+
+    def get(self, row: int) -> Dict:
+        """행 번호로 판례 원문 읽기 (해당 바이트 구간만 페이지 인)"""
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._mm[start:end].decode("utf-8"))
+
+    def row_of(self, case_id: str) -> int:
+        if case_id not in self.id_to_row:
+            raise KeyError(f"판례를 찾을 수 없습니다: {case_id}")
+        return self.id_to_row[case_id]
+
+    def full(self, case_id: str) -> Dict:
+        return self.get(self.row_of(case_id))
+
+    def summary(self, case_id: str) -> Dict:
+        return summarize(self.full(case_id))
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def summarize(doc: Dict) -> Dict:
+    """목록/요약 화면용 필드만 추리기"""
+    body = doc.get("body", "")
+    return {
+        "case_id": doc["case_id"],
+        "case_name": doc.get("case_name", ""),
+        "case_code": doc.get("case_code", ""),
+        "category": doc.get("category", ""),
+        "question": doc.get("question", ""),
+        "summary": body[:SUMMARY_CHARS] + ("..." if len(body) > SUMMARY_CHARS else ""),
+    }
@@ -0,0 +1,133 @@
+# hybrid.py
+# BM25(키워드) + 벡터(의미) 검색을 동시에 돌리고 RRF(reciprocal rank fusion)로 순위 합치기
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .bm25 import BM25Index
+from .doc_store import summarize
+from .search import PrecedentSearch
+
+# RRF 상수 (논문 기본값 60: 순위가 낮은 결과의 영향을 완만하게)
+RRF_K = 60
+# 각 검색기에서 가져올 후보 수
+CANDIDATES = 50
+# 목표 p95 지연시간(ms) / 한 쪽 검색이 이 시간을 넘기면 먼저 끝난 결과만으로 합침
+# (질의 임베딩(sentence-transformers)은 CPU 에서 이 시간보다 오래 걸릴 수 있어서 예산 밖에서 먼저 계산)
+P95_TARGET_MS = float(os.getenv("PRECEDENT_P95_TARGET_MS", "200"))
+# 검색 스레드 수 / 요청 1건에 2개씩 쓰고, 시간 초과로 버린 검색도 끝날 때까지 자리를 차지함
+SEARCH_WORKERS = int(os.getenv("PRECEDENT_SEARCH_WORKERS", str(max(4, 2 * (os.cpu_count() or 2)))))
+
+
+def rrf_fuse(rankings: List[List[Tuple[int, float]]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """여러 검색 결과 순위를 1/(k+rank) 합으로 합치기 (점수 스케일이 달라도 됨)"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (row, _) in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
+
+
+class HybridSearch(PrecedentSearch):
+    """벡터 검색기에 BM25 역색인을 더한 하이브리드 검색기"""
+
+    def __init__(self, index_dir: str, p95_target_ms: float = P95_TARGET_MS,
+                 workers: int = SEARCH_WORKERS):
+        super().__init__(index_dir)
+        self.bm25 = BM25Index.load(index_dir)
+        self.p95_target_ms = p95_target_ms
+        # 두 검색을 병렬로 (faiss / numpy 연산은 GIL 을 놓아서 스레드로 충분)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hybrid")
+        # (전체 ms, 질의 임베딩 ms, 검색 ms, 한 쪽을 버렸는지)
+        self._latencies = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self.degraded = 0
+        self.abandoned = 0   # 시간 초과로 버렸지만 아직 스레드에서 도는 검색 수
+        print(f"✅ BM25 역색인 로드: {len(self.bm25)}건 / 단어 {len(self.bm25.postings)}개")
+
+    def _abandon(self, future):
+        """늦은 검색 정리 (아직 대기 중이면 취소, 도는 중이면 끝날 때까지 abandoned 로 셈)"""
+        if future.cancel():
+            return
+        with self._lock:
+            self.abandoned += 1
+
+        def done(_):
+            with self._lock:
+                self.abandoned -= 1
+        future.add_done_callback(done)
+
+    def search(self, text: str, top_k: int = 5, embedding: Optional[List[float]] = None,
+               embedding_model: Optional[str] = None) -> Dict:
+        start = time.perf_counter()
+        bm25_future = self._pool.submit(self.bm25.search, text, CANDIDATES)
+        # 질의 임베딩은 BM25 와 겹쳐서 계산하고, 시간 예산은 임베딩이 끝난 뒤부터
+        query = self.query_vector(text, embedding, embedding_model)
+        encoded = time.perf_counter()
+        encode_ms = (encoded - start) * 1000
+        futures = {
+            "bm25": bm25_future,
+            "vector": self._pool.submit(self.index.search, query, CANDIDATES),
+        }
+
+        rankings, used = [], []
+        late = {}
+        for name, future in futures.items():
+            remaining = self.p95_target_ms / 1000 - (time.perf_counter() - encoded)
+            try:
+                rankings.append(future.result(timeout=max(remaining, 0.001)))
+                used.append(name)
+            except FutureTimeout:
+                late[name] = future
+        if not rankings:
+            # 둘 다 늦으면 결과 없이 보내지 않고 끝날 때까지 기다림
+            rankings = [f.result() for f in futures.values()]
+            used = list(futures)
+            late = {}
+        for name, future in late.items():
+            # 시간 예산 초과: 늦은 쪽은 버리고 먼저 끝난 결과로 응답
+            print(f"⚠️ {name} 검색이 {self.p95_target_ms:.0f}ms 를 넘겨 제외했습니다.")
+            self._abandon(future)
+        degraded = bool(late)
+        if degraded:
+            with self._lock:
+                self.degraded += 1
+
+        results = []
+        for row, score in rrf_fuse(rankings)[:top_k]:
+            item = summarize(self.store.get(row))
+            item["score"] = round(score, 6)
+            results.append(item)
+
+        end = time.perf_counter()
+        took_ms = (end - start) * 1000
+        with self._lock:
+            self._latencies.append((took_ms, encode_ms, (end - encoded) * 1000, degraded))
+        return {"results": results, "took_ms": round(took_ms, 2), "encode_ms": round(encode_ms, 2),
+                "sources": used, "degraded": degraded}
+
+    def latency_stats(self) -> Dict:
+        """최근 요청 1000건 기준 지연시간 통계"""
+        with self._lock:
+            values = np.asarray(self._latencies, dtype=np.float64).reshape(-1, 4)
+            degraded, abandoned = self.degraded, self.abandoned
+        if len(values) == 0:
+            return {"count": 0}
+        total, encode, search, dropped = values.T
+        return {
+            "count": int(len(values)),
+            "p50_ms": round(float(np.percentile(total, 50)), 2),
+            "p95_ms": round(float(np.percentile(total, 95)), 2),
+            # 목표(target_p95_ms)는 임베딩을 뺀 검색 + 합치기 시간 기준
+            "search_p95_ms": round(float(np.percentile(search, 95)), 2),
+            "encode_p95_ms": round(float(np.percentile(encode, 95)), 2),
+            "target_p95_ms": self.p95_target_ms,
+            "degraded": degraded,
+            "degraded_rate": round(float(dropped.mean()), 4),   # 최근 요청 중 한 쪽 검색을 버린 비율
+            "abandoned_running": abandoned,
+        }
@@ -0,0 +1,75 @@
+# 판례 검색 모듈 / 통합 main(게이트웨이)에서 import 해서 사용
+# /analyze, /case/{case_id}/summary, /case/{case_id}/full, /search/stats
+# 하이브리드 검색 지연시간 통계는 통합 main 의 /metrics 에도 precedent_search_* 게이지로 나옴
+import asyncio
+import os
+import threading
+
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+from .bm25 import BM25Index
+from .hybrid import HybridSearch
+from .search import PrecedentSearch
+
+# build_index.py 로 만든 인덱스 폴더
+INDEX_DIR = os.getenv("PRECEDENT_INDEX_DIR",
+                      os.path.join(os.path.dirname(__file__), "..", "index"))
+TOP_K = int(os.getenv("PRECEDENT_TOP_K", "5"))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> PrecedentSearch:
+    """검색기는 첫 요청 때 한 번만 로딩"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                # BM25 역색인이 있으면 하이브리드(BM25 + 벡터), 없으면 벡터만
+                if BM25Index.exists(INDEX_DIR):
+                    _engine = HybridSearch(INDEX_DIR)
+                else:
+                    _engine = PrecedentSearch(INDEX_DIR)
+    return _engine
+
+
+async def analyze(request):
+    """사연과 비슷한 판례 top-k (임베딩/검색은 스레드에서 실행해 이벤트 루프를 막지 않음)
+    request.embedding 이 있고 embedding_model 이 인덱스의 모델과 같으면 질의 임베딩을 다시 계산하지 않음"""
+    engine = get_engine()
+    embedding = getattr(request, "embedding", None)
+    embedding_model = getattr(request, "embedding_model", None)
+    result = await asyncio.to_thread(engine.search, request.case_text, TOP_K, embedding, embedding_model)
+    return {"query": request.case_text, **result}
+
+
+async def search_stats():
+    """검색 지연시간 p50/p95, 한 쪽 검색을 버린 비율 (벡터 검색만 쓰면 통계 없음)"""
+    engine = get_engine()
+    if isinstance(engine, HybridSearch):
+        return {"engine": "hybrid", **engine.latency_stats()}
+    return {"engine": "vector"}
+
+
+class SearchStatsCollector:
+    """/metrics scrape 때 HybridSearch.latency_stats() 의 숫자 값을 게이지로 (검색기를 로딩하기 전에는 없음)"""
+
+    def collect(self):
+        if not isinstance(_engine, HybridSearch):
+            return
+        for key, value in _engine.latency_stats().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            yield GaugeMetricFamily(f"precedent_search_{key}", f"판례 검색 {key}", value=value)
+
+
+REGISTRY.register(SearchStatsCollector())
+
+
+async def case_summary(case_id: str):
+    return get_engine().case_summary(case_id)
+
+
+async def case_full(case_id: str):
+    return get_engine().case_full(case_id)
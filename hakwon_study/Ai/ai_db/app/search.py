@@ -0,0 +1,57 @@
+# search.py
+# 판례 검색 엔진 / 저장된 인덱스를 불러와서 사연과 비슷한 판례 top-k 반환
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .doc_store import DocStore, summarize
+from .vector_index import LEGAL_BERT_PREFIX, VectorIndex, load_encoder, normalize
+
+
+class PrecedentSearch:
+    """벡터 인덱스 + 메모리맵 문서 저장소를 묶은 검색기"""
+
+    def __init__(self, index_dir: str):
+        self.store = DocStore(index_dir)
+        self.index = VectorIndex.load(index_dir)
+        # 인덱스를 만들 때 쓴 임베딩 모델로 질의도 임베딩해야 함
+        self.encoder = load_encoder(self.index.encoder_name)
+        if self.index.encoder_fingerprint and self.encoder.fingerprint != self.index.encoder_fingerprint:
+            print(f"⚠️ 인덱스를 만든 뒤 임베딩 모델 가중치가 바뀌었습니다 "
+                  f"({self.index.encoder_fingerprint} → {self.encoder.fingerprint}). 인덱스를 다시 생성하세요.")
+        print(f"✅ 판례 인덱스 로드: {len(self.store)}건 ({self.index.index_type})")
+
+    def query_vector(self, text: str, embedding: Optional[List[float]] = None,
+                     embedding_model: Optional[str] = None) -> np.ndarray:
+        """승소율 분석에서 받은 embedding 이 이 인덱스와 같은 체크포인트에서 나왔으면 그대로 사용 (BERT 를 다시 안 돌림)
+        embedding_model 은 LegalAnalyzer 결과의 embedding_model (가중치 파일 해시) / 다르거나 없으면 다시 임베딩"""
+        if embedding is not None and self.index.encoder_name.startswith(LEGAL_BERT_PREFIX) \
+                and len(embedding) == self.index.dim:
+            if embedding_model and embedding_model == self.index.encoder_fingerprint:
+                return normalize(embedding)
+            print(f"⚠️ 질의 embedding 의 모델({embedding_model})이 인덱스({self.index.encoder_fingerprint})와 달라 다시 임베딩합니다.")
+        return self.encoder.encode([text])[0]
+
+    def search(self, text: str, top_k: int = 5, embedding: Optional[List[float]] = None,
+               embedding_model: Optional[str] = None) -> Dict:
+        start = time.perf_counter()
+        query = self.query_vector(text, embedding, embedding_model)
+        hits = self.index.search(query, top_k)
+
+        results: List[Dict] = []
+        for row, score in hits:
+            item = summarize(self.store.get(row))
+            item["score"] = round(score, 4)
+            results.append(item)
+
+        return {
+            "results": results,
+            "took_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def case_summary(self, case_id: str) -> Dict:
+        return self.store.summary(case_id)
+
+    def case_full(self, case_id: str) -> Dict:
+        return self.store.full(case_id)
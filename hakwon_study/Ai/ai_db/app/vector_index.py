@@ -0,0 +1,166 @@
+# vector_index.py
+# 판례 벡터 인덱스 / sentence-transformers 로 임베딩 → FAISS 로 top-k 유사 판례 검색
+import hashlib
+import json
+import os
+from typing import List, Tuple
+
+import faiss
+import numpy as np
+
+INDEX_FILE = "faiss.index"
+META_FILE = "index_meta.json"
+
+# 한국어 문장 임베딩 모델 (build_index.py 에서 바꿀 수 있음)
+DEFAULT_ENCODER = "jhgan/ko-sroberta-multitask"
+# "legal-bert:<모델 폴더>" 로 지정하면 승소율 분석 BERT(MultiTaskLegalBERT)의 pooler 벡터로 색인
+# → LegalAnalyzer 가 분석하면서 돌려준 embedding 을 그대로 검색 질의로 쓸 수 있음
+LEGAL_BERT_PREFIX = "legal-bert:"
+
+
+def checkpoint_fingerprint(model_path: str, length: int = 16):
+    """pytorch_model.bin 의 sha256 앞부분 (파일이 없으면 None)
+    LegalAnalyzer 의 embedding_model 과 비교 / llm/model.py 에 같은 함수가 있음
+    → 바꿀 때는 둘 다 바꾸고 tests/test_checkpoint_fingerprint.py 로 같은 값인지 확인"""
+    model_file = os.path.join(model_path, "pytorch_model.bin")
+    if not os.path.exists(model_file):
+        return None
+    digest = hashlib.sha256()
+    with open(model_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+class TextEncoder:
+    """sentence-transformers 래퍼 (코사인 유사도용으로 정규화된 float32 벡터 반환)"""
+
+    def __init__(self, model_name: str = DEFAULT_ENCODER, device: str = None):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.fingerprint = None
+        self.model = SentenceTransformer(model_name, device=device)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=batch_size,
+                                    convert_to_numpy=True,
+                                    normalize_embeddings=True,
+                                    show_progress_bar=len(texts) > batch_size)
+        return vectors.astype(np.float32)
+
+
+class LegalBertEncoder:
+    """학습된 MultiTaskLegalBERT 가중치 중 BERT 부분만 불러와 pooler 출력을 임베딩으로 사용"""
+
+    def __init__(self, model_path: str, device: str = None):
+        import torch
+        from transformers import AutoTokenizer, BertConfig, BertModel
+
+        self.model_name = LEGAL_BERT_PREFIX + model_path
+        # 폴더 경로가 같아도 다시 학습하면 벡터 공간이 달라짐 → 가중치 파일 해시로 구분
+        self.fingerprint = checkpoint_fingerprint(model_path)
+        self.device = device or "cpu"
+        # distill.py 로 만든 작은 모델처럼 config.json 이 있으면 그 크기로
+        config_source = model_path if os.path.exists(os.path.join(model_path, "config.json")) else "klue/bert-base"
+        config = BertConfig.from_pretrained(config_source)
+        checkpoint = torch.load(os.path.join(model_path, "pytorch_model.bin"),
+                                map_location="cpu", weights_only=False)
+        if isinstance(checkpoint, dict) and "model_state_dict" in checkpoint:
+            checkpoint = checkpoint["model_state_dict"]
+        self.model = BertModel(config)
+        self.model.load_state_dict({k[len("bert."):]: v for k, v in checkpoint.items()
+                                    if k.startswith("bert.")})
+        self.model.to(self.device).eval()
+        self.tokenizer = AutoTokenizer.from_pretrained("klue/bert-base", use_fast=True)
+        self.dim = config.hidden_size
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        import torch
+
+        vectors = []
+        for i in range(0, len(texts), batch_size):
+            # LegalAnalyzer 와 같은 조건으로 토큰화 (최대 512, token_type_ids 없음)
+            inputs = self.tokenizer(texts[i:i + batch_size], return_tensors="pt", padding=True,
+                                    truncation=True, max_length=512, return_token_type_ids=False)
+            with torch.no_grad():
+                pooled = self.model(**{k: v.to(self.device) for k, v in inputs.items()}).pooler_output
+            vectors.append(pooled.float().cpu().numpy())
+        return normalize(np.concatenate(vectors))
+
+
+def load_encoder(name: str):
+    """인덱스 메타의 encoder 이름 → 임베딩 모델"""
+    if name.startswith(LEGAL_BERT_PREFIX):
+        return LegalBertEncoder(name[len(LEGAL_BERT_PREFIX):])
+    return TextEncoder(name)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """코사인 유사도용 L2 정규화 (행 단위)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    """FAISS 인덱스 (행 번호 = DocStore 행 번호)"""
+
+    def __init__(self, dim: int, index_type: str = "hnsw", encoder_name: str = DEFAULT_ENCODER,
+                 encoder_fingerprint: str = None):
+        self.dim = dim
+        self.index_type = index_type
+        self.encoder_name = encoder_name
+        # legal-bert 인덱스를 만든 체크포인트의 해시 (질의 embedding 재사용 여부 판단)
+        self.encoder_fingerprint = encoder_fingerprint
+        if index_type == "hnsw":
+            # 그래프 기반 근사 검색: 수십만 건에서도 수 ms 안에 top-k
+            self.index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efConstruction = 80
+            self.index.hnsw.efSearch = 64
+        elif index_type == "flat":
+            # 전수 비교 (정확하지만 데이터가 많으면 느림)
+            self.index = faiss.IndexFlatIP(dim)
+        else:
+            raise ValueError(f"지원하지 않는 index_type: {index_type}")
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def add(self, vectors: np.ndarray):
+        """벡터 추가 (순서대로 행 번호가 이어짐 → DocStore 와 같은 순서로 넣어야 함)"""
+        self.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+
+    def search(self, query: np.ndarray, top_k: int = 5) -> List[Tuple[int, float]]:
+        """query 벡터 1개 → [(행 번호, 유사도), ...]"""
+        query = np.ascontiguousarray(query.reshape(1, -1), dtype=np.float32)
+        scores, rows = self.index.search(query, top_k)
+        return [(int(r), float(s)) for r, s in zip(rows[0], scores[0]) if r != -1]
+
+    def save(self, index_dir: str):
+        os.makedirs(index_dir, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(index_dir, INDEX_FILE))
+        meta = {
+            "dim": self.dim,
+            "index_type": self.index_type,
+            "encoder": self.encoder_name,
+            "encoder_fingerprint": self.encoder_fingerprint,
+            "count": len(self),
+        }
+        with open(os.path.join(index_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, index_dir: str, mmap: bool = True) -> "VectorIndex":
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        obj = cls.__new__(cls)
+        obj.dim = meta["dim"]
+        obj.index_type = meta["index_type"]
+        obj.encoder_name = meta["encoder"]
+        obj.encoder_fingerprint = meta.get("encoder_fingerprint")
+        flags = faiss.IO_FLAG_MMAP if (mmap and meta["index_type"] == "flat") else 0
+        obj.index = faiss.read_index(os.path.join(index_dir, INDEX_FILE), flags)
+        if meta["index_type"] == "hnsw":
+            obj.index.hnsw.efSearch = 64
+        return obj
@@ -0,0 +1,172 @@
+# case_labeler.py
+# 규칙 기반 소송 유형 라벨링 / 노트북의 label_case_type(row) 를 apply 없이 컬럼 단위 + 멀티프로세스로
+#
+# 실행 예시
+# python case_labeler.py --input ../pkl_file/pkl/rowtrain_pklFile.pkl --output ../pkl_file/pkl/train_labeled.pkl
+# python case_labeler.py --input judgments.parquet --output judgments_labeled.parquet --scheme merged --workers 8
+#   - 우선순위: 헌법(case_code 가 '헌'으로 시작) > 형사소송 > 가사소송 > 행정소송 > 민사소송 > 기타
+#   - 분류별 키워드 목록은 처음에 한 번만 정규식 하나로 컴파일 (키워드마다 `in` 으로 훑지 않음)
+#   - 아직 분류되지 않은 행만 다음 분류 정규식으로 검사 → 결과는 노트북 함수와 동일
+import argparse
+import os
+import re
+import time
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+CONSTITUTION_LABEL = "헌법"
+DEFAULT_LABEL = "기타"
+TEXT_COLUMNS = ["case_name", "question", "body"]
+
+# 분류 순서 = 우선순위 (앞에 있는 분류의 키워드가 하나라도 있으면 그 분류)
+SCHEMES: Dict[str, List[Tuple[str, List[str]]]] = {
+    # lagalAi.ipynb
+    "basic": [
+        ("형사소송", ['사기', '폭행', '상해', '살인', '강도', '절도',
+                  '처벌', '징역', '벌금', '구속', '기소', '피고인', '유죄']),
+        ("가사소송", ['이혼', '양육권', '친권', '위자료', '재산분할', '혼인']),
+        ("행정소송", ['처분', '취소', '과세', '부과', '행정', '허가',
+                  '등록', '공무원', '징계']),
+        ("민사소송", ['손해배상', '계약', '채무', '채권',
+                  '임대차', '소유권', '부당이득']),
+    ],
+    # machine_lagal.ipynb (민사/가사 합침 → 지금 서비스 모델의 학습 라벨)
+    "merged": [
+        ("형사소송", ['사기', '폭행', '상해', '살인', '강도', '절도',
+                  '처벌', '징역', '벌금', '구속', '기소', '피고인', '유죄']),
+        ("행정소송", ['처분', '취소', '과세', '부과', '행정', '허가',
+                  '등록', '공무원', '징계']),
+        ("민사/가사소송", ['손해배상', '계약', '채무', '채권',
+                      '임대차', '소유권', '부당이득', '보증금', '임차권', '등기명령', '임차권 등기명령',
+                      '이혼', '양육권', '친권', '위자료', '재산분할', '혼인']),
+    ],
+}
+
+
+def compile_scheme(scheme: str) -> List[Tuple[str, "re.Pattern"]]:
+    """분류별 키워드 목록 → 정규식 하나 (텍스트를 분류당 한 번만 훑음)"""
+    return [(label, re.compile("|".join(re.escape(k) for k in dict.fromkeys(keywords))))
+            for label, keywords in SCHEMES[scheme]]
+
+
+_COMPILED: Dict[str, list] = {}
+
+
+def _compiled(scheme: str):
+    """프로세스마다 한 번만 컴파일"""
+    if scheme not in _COMPILED:
+        _COMPILED[scheme] = compile_scheme(scheme)
+    return _COMPILED[scheme]
+
+
+def label_frame(df: pd.DataFrame, scheme: str = "basic") -> np.ndarray:
+    """DataFrame(case_name, question, body, case_code) → case_type 배열 (컬럼 단위 처리)"""
+    # 노트북과 같은 f"{case_name} {question} {body}"
+    text = df[TEXT_COLUMNS[0]].fillna("").astype(str)
+    for column in TEXT_COLUMNS[1:]:
+        text = text + " " + df[column].fillna("").astype(str)
+
+    labels = np.full(len(df), DEFAULT_LABEL, dtype=object)
+    undecided = ~df["case_code"].fillna("").astype(str).str.startswith("헌").to_numpy()
+    labels[~undecided] = CONSTITUTION_LABEL
+
+    for label, pattern in _compiled(scheme):
+        if not undecided.any():
+            break
+        # 아직 정해지지 않은 행만 검사
+        rows = np.flatnonzero(undecided)
+        hit = text.iloc[rows].str.contains(pattern, regex=True).to_numpy()
+        labels[rows[hit]] = label
+        undecided[rows[hit]] = False
+    return labels
+
+
+def label_case_type(row, scheme: str = "basic") -> str:
+    """한 행짜리 호환 함수 (df.apply(label_case_type, axis=1) 를 쓰던 코드용)"""
+    return label_frame(pd.DataFrame([row]), scheme)[0]
+
+
+def _label_chunk(args) -> np.ndarray:
+    df, scheme = args
+    return label_frame(df, scheme)
+
+
+def _chunks(df: pd.DataFrame, size: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), size):
+        yield df.iloc[start:start + size]
+
+
+def label_dataframe(df: pd.DataFrame, scheme: str = "basic", workers: int = None,
+                    chunk_size: int = 50000) -> pd.Series:
+    """전체 코퍼스 라벨링 / 행을 chunk 로 나눠 CPU 코어마다 병렬 처리"""
+    columns = TEXT_COLUMNS + ["case_code"]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(df) <= chunk_size:
+        return pd.Series(label_frame(df[columns], scheme), index=df.index, name="case_type")
+
+    with Pool(workers) as pool:
+        parts = pool.map(_label_chunk, [(chunk, scheme) for chunk in _chunks(df[columns], chunk_size)])
+    return pd.Series(np.concatenate(parts), index=df.index, name="case_type")
+
+
+def label_parquet(input_path: str, output_path: str, scheme: str = "basic",
+                  workers: int = None, batch_size: int = 50000) -> int:
+    """큰 Parquet 은 Arrow 배치 단위로 읽어서 라벨링 후 바로 쓰기 (전체를 메모리에 올리지 않음)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    workers = workers or os.cpu_count() or 1
+    parquet = pq.ParquetFile(input_path)
+    columns = TEXT_COLUMNS + ["case_code"]
+    batches = parquet.iter_batches(batch_size=batch_size)
+    writer = None
+    total = 0
+
+    with Pool(workers) as pool:
+        while True:
+            # worker 수만큼 배치를 읽어서 동시에 라벨링 (메모리에는 그만큼만)
+            frames = [batch.to_pandas() for _, batch in zip(range(workers), batches)]
+            if not frames:
+                break
+            results = pool.map(_label_chunk, [(df[columns], scheme) for df in frames])
+            for df, labels in zip(frames, results):
+                df["case_type"] = labels
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+                total += len(df)
+    if writer is not None:
+        writer.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="규칙 기반 소송 유형 라벨링")
+    parser.add_argument("--input", required=True, help=".pkl (DataFrame) 또는 .parquet")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--scheme", default="basic", choices=list(SCHEMES),
+                        help="basic: lagalAi.ipynb / merged: machine_lagal.ipynb (민사/가사 합침)")
+    parser.add_argument("--workers", type=int, default=None, help="기본: CPU 코어 수")
+    parser.add_argument("--chunk-size", type=int, default=50000,
+                        help="프로세스 하나가 맡는 행 수 (작으면 프로세스 전달 비용이 더 큼)")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.input.endswith(".parquet"):
+        total = label_parquet(args.input, args.output, args.scheme, args.workers, args.chunk_size)
+        print(f"✅ {total}건 라벨링 완료 ({time.time() - start:.1f}초) → {args.output}")
+        return
+
+    df = pd.read_pickle(args.input)
+    df["case_type"] = label_dataframe(df, args.scheme, args.workers, args.chunk_size)
+    df.to_pickle(args.output)
+    print(f"✅ {len(df)}건 라벨링 완료 ({time.time() - start:.1f}초) → {args.output}")
+    print(df["case_type"].value_counts())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# legal_dataset.py
+# 학습 데이터 미리 토큰화 / 한 번만 토큰화해서 int32 numpy 파일(.npy)로 저장 → 학습 때는 메모리맵으로 읽기
+#
+# 실행 예시
+# python legal_dataset.py --input ../pkl_file/machine_data/train_machineData.pkl --out ../pkl_file/tokenized/train
+# python legal_dataset.py --input ../pkl_file/machine_data/test_machineData.pkl --out ../pkl_file/tokenized/test \
+#        --labels-from ../pkl_file/tokenized/train
+#   - 노트북의 LegalDataset 처럼 매 epoch 마다 파이썬 리스트 → torch.tensor 를 새로 만들지 않음
+#   - 파일은 OS 페이지 캐시에 올라가서 DataLoader worker 들이 같은 메모리를 같이 씀
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import Dataset
+
+META_FILE = "meta.json"
+# 파일 이름 = MultiTaskLegalBERT.forward 인자 이름
+ARRAYS = ["input_ids", "attention_mask", "lengths", "labels", "targets"]
+# targets 열 순서 (노트북 컬럼 → forward 인자)
+TARGET_COLUMNS = {"win_rate": "win_rate", "sentence": "sentence_years",
+                  "fine": "fine_amount", "risk": "risk_score"}
+
+
+def build_dataset(df: pd.DataFrame, out_dir: str, tokenizer, max_length: int = 512,
+                  text_column: str = "text", label_column: str = "case_type",
+                  label_names: Optional[List[str]] = None, batch_size: int = 2000) -> Dict:
+    """DataFrame → out_dir/*.npy (input_ids / attention_mask 는 [N, max_length] int32)"""
+    # 정답 컬럼이 빠지면 회귀 헤드가 전부 0 인 라벨로 학습되므로 토큰화 전에 확인
+    missing = [c for c in (text_column, label_column, *TARGET_COLUMNS.values()) if c not in df]
+    if missing:
+        raise ValueError(f"DataFrame 에 없는 컬럼: {missing}")
+    os.makedirs(out_dir, exist_ok=True)
+    n = len(df)
+    if label_names is None:
+        label_names = sorted(df[label_column].astype(str).unique().tolist())
+    label_index = {name: i for i, name in enumerate(label_names)}
+
+    # 결과 크기를 미리 알고 있으니 memmap 으로 바로 채움 (중간 리스트 없음)
+    def open_array(name, dtype, shape):
+        return np.lib.format.open_memmap(os.path.join(out_dir, f"{name}.npy"),
+                                         mode="w+", dtype=dtype, shape=shape)
+
+    input_ids = open_array("input_ids", np.int32, (n, max_length))
+    attention_mask = open_array("attention_mask", np.int32, (n, max_length))
+    lengths = open_array("lengths", np.int32, (n,))
+    labels = open_array("labels", np.int32, (n,))
+    targets = open_array("targets", np.float32, (n, len(TARGET_COLUMNS)))
+
+    texts = df[text_column].fillna("").astype(str).tolist()
+    start = time.time()
+    for i in range(0, n, batch_size):
+        encoded = tokenizer(texts[i:i + batch_size], truncation=True, padding="max_length",
+                            max_length=max_length, return_token_type_ids=False,
+                            return_tensors="np")
+        input_ids[i:i + batch_size] = encoded["input_ids"]
+        attention_mask[i:i + batch_size] = encoded["attention_mask"]
+        lengths[i:i + batch_size] = encoded["attention_mask"].sum(axis=1)
+        print(f"  - {min(i + batch_size, n)}/{n} 토큰화 ({time.time() - start:.1f}초)")
+
+    unknown = set(df[label_column].astype(str)) - set(label_index)
+    if unknown:
+        raise ValueError(f"label_names 에 없는 라벨: {sorted(unknown)}")
+    labels[:] = df[label_column].astype(str).map(label_index).to_numpy(np.int32)
+    for j, column in enumerate(TARGET_COLUMNS.values()):
+        targets[:, j] = df[column].fillna(0).to_numpy(np.float32)
+
+    for array in (input_ids, attention_mask, lengths, labels, targets):
+        array.flush()
+
+    meta = {
+        "count": n,
+        "max_length": max_length,
+        "label_names": label_names,
+        "target_names": list(TARGET_COLUMNS),
+        "tokenizer": getattr(tokenizer, "name_or_path", ""),
+        "mean_length": round(float(lengths.mean()), 1) if n else 0,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+class LegalDataset(Dataset):
+    """build_dataset 으로 만든 폴더를 메모리맵으로 여는 데이터셋
+
+    __getitem__ 은 복사 없이 memmap 행을 그대로 텐서로 감싸서 반환
+    (mmap_mode='c': 쓰기 가능한 copy-on-write 매핑이라 torch.from_numpy 경고 없음, 파일은 안 바뀜)
+    """
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        with open(os.path.join(data_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.label_names = self.meta["label_names"]
+        self.target_names = self.meta["target_names"]
+        self._arrays = None
+
+    @property
+    def arrays(self) -> Dict[str, np.ndarray]:
+        # DataLoader worker 마다 fork 뒤에 처음 접근할 때 연다 (파일 핸들을 물려받지 않게)
+        if self._arrays is None:
+            self._arrays = {name: np.load(os.path.join(self.data_dir, f"{name}.npy"), mmap_mode="c")
+                            for name in ARRAYS}
+        return self._arrays
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self.arrays["lengths"]
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def __getitem__(self, idx) -> Dict[str, torch.Tensor]:
+        a = self.arrays
+        item = {
+            "input_ids": torch.from_numpy(a["input_ids"][idx]),
+            "attention_mask": torch.from_numpy(a["attention_mask"][idx]),
+            "labels": torch.tensor(int(a["labels"][idx]), dtype=torch.long),
+        }
+        targets = torch.from_numpy(a["targets"][idx])
+        for j, name in enumerate(self.target_names):
+            item[name] = targets[j]
+        return item
+
+
+def main():
+    parser = argparse.ArgumentParser(description="학습 데이터 미리 토큰화 (int32 .npy)")
+    parser.add_argument("--input", required=True, help="전처리된 DataFrame .pkl 또는 .parquet")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--label-column", default="case_type")
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--labels-from", default=None,
+                        help="학습 데이터 폴더 (테스트 데이터도 같은 라벨 번호를 쓰도록)")
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    df = pd.read_parquet(args.input) if args.input.endswith(".parquet") else pd.read_pickle(args.input)
+    if "text" not in df and args.text_column == "text":
+        # 노트북과 같은 통합 텍스트
+        df["text"] = df["case_name"] + " " + df["question"] + " " + df["body"]
+
+    label_names = None
+    if args.labels_from:
+        with open(os.path.join(args.labels_from, META_FILE), encoding="utf-8") as f:
+            label_names = json.load(f)["label_names"]
+
+    tokenizer = AutoTokenizer.from_pretrained("klue/bert-base", use_fast=True)
+    meta = build_dataset(df, args.out, tokenizer, max_length=args.max_length,
+                         text_column=args.text_column, label_column=args.label_column,
+                         label_names=label_names)
+    print(f"✅ {meta['count']}건 저장 (평균 {meta['mean_length']} 토큰) → {args.out}")
+    print(f"   라벨: {meta['label_names']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# train_multitask.py
+# MultiTaskLegalBERT 학습 스크립트 / 길이가 비슷한 사연끼리 배치로 묶고 배치 안에서만 패딩
+#
+# 실행 예시 (legal_dataset.py 로 토큰화한 폴더 사용)
+# python train_multitask.py --train ../pkl_file/tokenized/train --eval ../pkl_file/tokenized/test --out ./saved_mode4
+# python train_multitask.py --train ../pkl_file/tokenized/train --compare --max-steps 50
+#   - --compare: 같은 데이터로 고정 패딩(max_length) 과 길이 그룹 + 동적 패딩의 학습 시간 비교
+#   - 짧은 질문 텍스트가 긴 판결문과 같은 배치에 섞여 512 토큰까지 패딩되는 낭비를 줄임
+# python train_multitask.py --train ../pkl_file/tokenized/train --bf16 --grad-checkpointing --batch-size 8 --grad-accum 8
+#   - CPU 서버용 절약 모드: bfloat16 autocast + BERT 인코더 gradient checkpointing + gradient 누적
+#     (실제 배치 = batch-size × grad-accum, 가중치/저장 파일은 fp32 그대로)
+import argparse
+import inspect
+import json
+import os
+import random
+import sys
+import time
+from contextlib import nullcontext
+from typing import Dict, Iterator, List
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Sampler
+
+from legal_dataset import LegalDataset
+
+# 모델 정의는 서비스 코드(llm/model.py)와 같은 파일을 사용
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "llm"))
+from model import MultiTaskLegalBERT  # noqa: E402
+
+REPORT_FILE = "train_report.json"
+
+
+class LengthGroupedBatchSampler(Sampler[List[int]]):
+    """길이가 비슷한 사연끼리 배치 만들기
+
+    전체를 섞은 뒤 batch_size × group_factor 개씩 끊어서 그 안에서 길이순 정렬 → 배치로 자르고
+    배치 순서를 다시 섞음 (매 epoch 다른 조합 + 긴/짧은 배치가 골고루 나옴)
+    """
+
+    def __init__(self, lengths: np.ndarray, batch_size: int, group_factor: int = 50,
+                 shuffle: bool = True, seed: int = 42):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.group_size = batch_size * group_factor
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self) -> Iterator[List[int]]:
+        rng = np.random.default_rng(self.seed + self.epoch)
+        order = rng.permutation(len(self.lengths)) if self.shuffle else np.arange(len(self.lengths))
+        batches = []
+        for start in range(0, len(order), self.group_size):
+            group = order[start:start + self.group_size]
+            group = group[np.argsort(self.lengths[group], kind="stable")]
+            batches.extend(group[i:i + self.batch_size].tolist()
+                           for i in range(0, len(group), self.batch_size))
+        if self.shuffle:
+            rng.shuffle(batches)
+        return iter(batches)
+
+
+class DynamicPaddingCollator:
+    """배치 안에서 가장 긴 사연 길이까지만 잘라서 묶기 (dynamic=False 면 max_length 그대로)"""
+
+    def __init__(self, dynamic: bool = True, pad_to_multiple_of: int = 8):
+        self.dynamic = dynamic
+        self.pad_to_multiple_of = pad_to_multiple_of
+
+    def __call__(self, items: List[Dict[str, torch.Tensor]]) -> Dict[str, torch.Tensor]:
+        width = items[0]["input_ids"].size(0)
+        if self.dynamic:
+            longest = max(int(item["attention_mask"].sum()) for item in items)
+            # 8의 배수로 맞추면 행렬 연산 커널이 조금 더 효율적
+            m = self.pad_to_multiple_of
+            width = min(width, (longest + m - 1) // m * m)
+        batch = {
+            "input_ids": torch.stack([item["input_ids"][:width] for item in items]).long(),
+            "attention_mask": torch.stack([item["attention_mask"][:width] for item in items]).long(),
+        }
+        for key in ("labels", "win_rate", "sentence", "fine", "risk"):
+            batch[key] = torch.stack([item[key] for item in items])
+        return batch
+
+
+def make_loader(dataset: LegalDataset, batch_size: int, dynamic: bool, shuffle: bool = True,
+                num_workers: int = 2, seed: int = 42) -> DataLoader:
+    collate = DynamicPaddingCollator(dynamic=dynamic)
+    if dynamic:
+        sampler = LengthGroupedBatchSampler(dataset.lengths, batch_size, shuffle=shuffle, seed=seed)
+        return DataLoader(dataset, batch_sampler=sampler, collate_fn=collate,
+                          num_workers=num_workers, persistent_workers=num_workers > 0)
+    # 기존 노트북 방식: 무작위 배치 + max_length 고정 패딩
+    generator = torch.Generator().manual_seed(seed)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, collate_fn=collate,
+                      num_workers=num_workers, generator=generator,
+                      persistent_workers=num_workers > 0)
+
+
+def autocast(device, bf16: bool):
+    """bf16=True 면 forward 를 bfloat16 으로 (CPU/GPU 모두) / 가중치와 optimizer 는 fp32 유지"""
+    if not bf16:
+        return nullcontext()
+    return torch.autocast(device_type=torch.device(device).type, dtype=torch.bfloat16)
+
+
+def train_epoch(model, loader, optimizer, device, max_steps: int = None,
+                bf16: bool = False, grad_accum: int = 1) -> Dict[str, float]:
+    """1 epoch 학습 (loss 는 MultiTaskLegalBERT.forward 의 MSE 4개 + 0.1×CE)
+
+    grad_accum 개 배치의 gradient 를 모은 뒤 한 번 업데이트 (메모리는 작은 배치만큼만 사용)
+    """
+    model.train()
+    start = time.time()
+    total_loss, steps, updates, tokens, padded = 0.0, 0, 0, 0, 0
+    # 아직 optimizer.step 에 반영하지 않은 gradient 가 있는지
+    pending = False
+    optimizer.zero_grad()
+    for batch in loader:
+        batch = {k: v.to(device) for k, v in batch.items()}
+        with autocast(device, bf16):
+            loss = model(**batch)["loss"]
+        # 회귀 헤드 MSE 는 bf16 정밀도로 합치면 오차가 커서 fp32 로 역전파
+        (loss.float() / grad_accum).backward()
+        pending = True
+
+        total_loss += loss.item()
+        steps += 1
+        if steps % grad_accum == 0:
+            _optimizer_step(model, optimizer)
+            updates += 1
+            pending = False
+
+        tokens += int(batch["attention_mask"].sum())
+        padded += batch["attention_mask"].numel()
+        if max_steps and steps >= max_steps:
+            break
+    if pending:
+        # epoch 끝(또는 max_steps)에 남은 gradient 도 한 번만 반영
+        _optimizer_step(model, optimizer)
+        updates += 1
+    seconds = time.time() - start
+    return {
+        "seconds": round(seconds, 2),
+        "steps": steps,
+        "updates": updates,
+        "loss": round(total_loss / max(steps, 1), 4),
+        # 실제 토큰 / 패딩 포함 토큰 (1 에 가까울수록 낭비가 적음)
+        "token_efficiency": round(tokens / max(padded, 1), 3),
+        "samples_per_sec": round(steps * loader_batch_size(loader) / max(seconds, 1e-6), 2),
+    }
+
+
+def _optimizer_step(model, optimizer):
+    torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+    optimizer.step()
+    optimizer.zero_grad()
+
+
+def loader_batch_size(loader: DataLoader) -> int:
+    return loader.batch_size or loader.batch_sampler.batch_size
+
+
+@torch.no_grad()
+def evaluate(model, loader, device, bf16: bool = False) -> Dict[str, float]:
+    """헤드별 MAE + 소송 유형 정확도"""
+    model.eval()
+    errors = {name: [] for name in ("win_rate", "sentence", "fine", "risk")}
+    correct, total = 0, 0
+    for batch in loader:
+        batch = {k: v.to(device) for k, v in batch.items()}
+        with autocast(device, bf16):
+            out = model(input_ids=batch["input_ids"], attention_mask=batch["attention_mask"])
+        for name in errors:
+            errors[name].append((out[name].float() - batch[name]).abs().cpu())
+        correct += int((out["logits"].argmax(-1) == batch["labels"]).sum())
+        total += batch["labels"].numel()
+    report = {f"mae_{name}": round(torch.cat(v).mean().item(), 4) for name, v in errors.items()}
+    report["case_type_accuracy"] = round(correct / max(total, 1), 4)
+    return report
+
+
+def build_model(num_labels: int, device, grad_checkpointing: bool = False) -> MultiTaskLegalBERT:
+    model = MultiTaskLegalBERT("klue/bert-base", num_labels=num_labels).to(device)
+    if grad_checkpointing:
+        # 레이어 활성값을 저장하지 않고 backward 때 다시 계산 → 긴 시퀀스/큰 배치에서 메모리 절약
+        enable_grad_checkpointing(model.bert)
+    return model
+
+
+def enable_grad_checkpointing(bert):
+    """transformers 4.35 부터 생긴 gradient_checkpointing_kwargs 는 있을 때만 사용 (requirements 는 4.30.2)"""
+    params = inspect.signature(bert.gradient_checkpointing_enable).parameters
+    if "gradient_checkpointing_kwargs" in params:
+        bert.gradient_checkpointing_enable(gradient_checkpointing_kwargs={"use_reentrant": False})
+    else:
+        bert.gradient_checkpointing_enable()
+
+
+def compare(args, dataset: LegalDataset, device) -> Dict:
+    """같은 초기 가중치로 고정 패딩 vs 동적 패딩 epoch 시간 비교"""
+    torch.manual_seed(args.seed)
+    initial = build_model(len(dataset.label_names), "cpu").state_dict()
+    report = {}
+    for name, dynamic in (("fixed_padding", False), ("length_grouped_dynamic", True)):
+        model = build_model(len(dataset.label_names), device, args.grad_checkpointing)
+        model.load_state_dict(initial)
+        optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr)
+        loader = make_loader(dataset, args.batch_size, dynamic, num_workers=args.num_workers,
+                             seed=args.seed)
+        report[name] = train_epoch(model, loader, optimizer, device, args.max_steps,
+                                   bf16=args.bf16, grad_accum=args.grad_accum)
+        print(f"  - {name}: {report[name]}")
+    report["speedup"] = round(report["fixed_padding"]["seconds"]
+                              / max(report["length_grouped_dynamic"]["seconds"], 1e-6), 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MultiTaskLegalBERT 학습 (길이 그룹 배치 + 동적 패딩)")
+    parser.add_argument("--train", required=True, help="legal_dataset.py 로 만든 학습 데이터 폴더")
+    parser.add_argument("--eval", default=None, help="평가 데이터 폴더")
+    parser.add_argument("--out", default="./saved_mode4")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--lr", type=float, default=2e-5)
+    parser.add_argument("--padding", default="dynamic", choices=["dynamic", "fixed"],
+                        help="fixed: 기존 방식(max_length 고정 패딩, 무작위 배치)")
+    parser.add_argument("--num-workers", type=int, default=2)
+    parser.add_argument("--max-steps", type=int, default=None, help="epoch 당 최대 step (빠른 확인용)")
+    parser.add_argument("--compare", action="store_true", help="고정/동적 패딩 1 epoch 시간 비교만")
+    parser.add_argument("--bf16", action="store_true", help="bfloat16 autocast (CPU 는 AVX512-BF16/AMX 가 있으면 효과 큼)")
+    parser.add_argument("--grad-checkpointing", action="store_true", help="BERT 인코더 gradient checkpointing")
+    parser.add_argument("--grad-accum", type=int, default=1, help="gradient 누적 배치 수")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    dataset = LegalDataset(args.train)
+    print(f"📚 학습 데이터 {len(dataset)}건 / 평균 {dataset.meta['mean_length']} 토큰 "
+          f"(max_length {dataset.meta['max_length']}) / 라벨 {dataset.label_names}")
+
+    if args.compare:
+        report = compare(args, dataset, device)
+        print(f"✅ 동적 패딩이 {report['speedup']}배 빠름")
+        os.makedirs(args.out, exist_ok=True)
+        with open(os.path.join(args.out, "padding_compare.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return
+
+    model = build_model(len(dataset.label_names), device, args.grad_checkpointing)
+    print(f"⚙️ bf16={args.bf16} / gradient checkpointing={args.grad_checkpointing} / "
+          f"실제 배치 {args.batch_size} × {args.grad_accum} = {args.batch_size * args.grad_accum}")
+    optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr)
+    loader = make_loader(dataset, args.batch_size, args.padding == "dynamic",
+                         num_workers=args.num_workers, seed=args.seed)
+    eval_loader = None
+    if args.eval:
+        eval_loader = make_loader(LegalDataset(args.eval), args.batch_size * 2,
+                                  args.padding == "dynamic", shuffle=False,
+                                  num_workers=args.num_workers, seed=args.seed)
+
+    history = []
+    for epoch in range(args.epochs):
+        if isinstance(loader.batch_sampler, LengthGroupedBatchSampler):
+            loader.batch_sampler.set_epoch(epoch)
+        result = {"epoch": epoch + 1, **train_epoch(model, loader, optimizer, device, args.max_steps,
+                                                    bf16=args.bf16, grad_accum=args.grad_accum)}
+        if eval_loader is not None:
+            result.update(evaluate(model, eval_loader, device, bf16=args.bf16))
+        history.append(result)
+        print(f"  epoch {epoch + 1}/{args.epochs}: {result}")
+
+    # jem_api.LegalAnalyzer / MultiTaskLegalBERT.from_pretrained 로 바로 불러올 수 있는 형식
+    # (autocast 는 연산만 bf16 이라 저장되는 가중치는 fp32, checkpointing 설정은 config 에 남기지 않음)
+    model.bert.gradient_checkpointing_disable()
+    model.save_pretrained(args.out)
+    with open(os.path.join(args.out, REPORT_FILE), "w", encoding="utf-8") as f:
+        json.dump({"args": vars(args), "label_names": dataset.label_names, "history": history},
+                  f, ensure_ascii=False, indent=2)
+    print(f"✅ 모델 저장: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
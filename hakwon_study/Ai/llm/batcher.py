@@ -0,0 +1,122 @@
+# batcher.py
+# 동시 요청 묶음 처리 / 짧은 시간 안에 들어온 사연들을 모아서 BERT 를 한 번만 돌림
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+
+class BatcherStats:
+    """배치 크기 분포 / 대기 시간 기록 (지연시간 목표에 맞춰 설정값 조정용)"""
+
+    def __init__(self, window: int = 5000):
+        self.batch_sizes = Counter()
+        self.queue_wait_ms = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+
+    def record(self, size: int, waits_ms: List[float]):
+        self.batches += 1
+        self.requests += size
+        self.batch_sizes[size] += 1
+        self.queue_wait_ms.extend(waits_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        waits = np.asarray(self.queue_wait_ms, dtype=np.float64)
+        wait_stats = {}
+        if waits.size:
+            wait_stats = {
+                "p50": round(float(np.percentile(waits, 50)), 2),
+                "p95": round(float(np.percentile(waits, 95)), 2),
+                "p99": round(float(np.percentile(waits, 99)), 2),
+                "max": round(float(waits.max()), 2),
+            }
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "queue_wait_ms": wait_stats,
+        }
+
+
+class InferenceBatcher:
+    """요청마다 future 를 돌려주고, 모인 사연을 predict_batch 한 번으로 처리
+
+    - max_batch_size 개가 모이거나
+    - 첫 요청 후 max_wait_ms 가 지나면 배치 실행
+    배치가 도는 동안 들어온 요청은 다음 배치로 자연스럽게 묶임
+    """
+
+    def __init__(self, predict_batch: Callable[[List[str]], List[Dict]],
+                 max_batch_size: int = 16, max_wait_ms: float = 10.0):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = BatcherStats()
+        self._queue = None
+        self._task = None
+
+    async def start(self):
+        """서버 이벤트 루프 안에서 호출 (startup 이벤트)"""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, text: str) -> Dict[str, Any]:
+        """사연 하나 제출 → 자기 몫의 예측 결과가 나올 때까지 대기"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # 이미 연결이 끊겨 취소된 요청은 빼고 실행
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+
+            now = time.perf_counter()
+            self.stats.record(len(batch), [(now - t) * 1000 for _, _, t in batch])
+
+            texts = [text for text, _, _ in batch]
+            try:
+                # BERT 연산은 스레드에서 (이벤트 루프는 계속 요청을 받음)
+                results = await loop.run_in_executor(None, self.predict_batch, texts)
+            except Exception as e:
+                self.stats.errors += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,58 @@
+# bench_tokenizer.py
+# 토큰화 처리량 비교 / slow(파이썬) vs fast(Rust) 한 건씩 vs fast 배치 vs 캐시
+#
+# 실행 예시
+# python bench_tokenizer.py --n 2000 --batch-size 32
+import argparse
+import time
+
+from transformers import AutoTokenizer
+
+from export_model import SAMPLE_STORIES
+from token_cache import TokenCache
+
+
+def _bench(name, fn, n):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {n / elapsed:>10,.0f} 건/초  ({elapsed * 1000 / n:.3f} ms/건)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="klue/bert-base 토큰화 처리량 벤치마크")
+    parser.add_argument("--n", type=int, default=2000, help="토큰화할 사연 수")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--stories", default=None, help="사연 파일 (한 줄에 하나)")
+    args = parser.parse_args()
+
+    stories = SAMPLE_STORIES
+    if args.stories:
+        with open(args.stories, encoding="utf-8") as f:
+            stories = [line.strip() for line in f if line.strip()]
+    # 서로 다른 사연이 되도록 번호를 붙임 (캐시 측정은 따로)
+    texts = [f"{stories[i % len(stories)]} ({i})" for i in range(args.n)]
+
+    slow = AutoTokenizer.from_pretrained("klue/bert-base", use_fast=False)
+    fast = AutoTokenizer.from_pretrained("klue/bert-base", use_fast=True)
+    kwargs = dict(truncation=True, max_length=512)
+
+    print(f"사연 {args.n}건 / 배치 {args.batch_size}")
+    _bench("slow, 한 건씩", lambda: [slow(t, **kwargs) for t in texts], args.n)
+    _bench("fast, 한 건씩", lambda: [fast(t, **kwargs) for t in texts], args.n)
+    _bench("fast, 배치 __call__",
+           lambda: [fast(texts[i:i + args.batch_size], **kwargs)
+                    for i in range(0, args.n, args.batch_size)], args.n)
+
+    cache = TokenCache(fast, max_size=args.n)
+    _bench("TokenCache 첫 호출(miss)",
+           lambda: [cache.encode(texts[i:i + args.batch_size])
+                    for i in range(0, args.n, args.batch_size)], args.n)
+    _bench("TokenCache 재호출(hit)",
+           lambda: [cache.encode(texts[i:i + args.batch_size])
+                    for i in range(0, args.n, args.batch_size)], args.n)
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
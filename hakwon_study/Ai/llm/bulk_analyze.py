@@ -0,0 +1,176 @@
+# bulk_analyze.py
+# 대량 사연 일괄 분석 / JSONL 또는 Parquet 의 사연을 배치로 BERT 분석 + Gemini 피드백 → JSONL 로 저장
+#
+# 실행 예시
+# python bulk_analyze.py --input stories.jsonl --output results.jsonl
+# python bulk_analyze.py --input archive.parquet --output results.jsonl --no-feedback
+# python bulk_analyze.py --input stories.jsonl --output results.jsonl --no-feedback --with-embedding
+#   - 배치가 끝날 때마다 결과를 쓰고 체크포인트(results.jsonl.ckpt.json) 갱신
+#   - 중간에 멈춰도 같은 명령으로 다시 실행하면 마지막 체크포인트부터 이어서 처리
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Iterator, List
+
+from dotenv import load_dotenv
+
+from jem_api import LegalAnalyzer
+
+
+def iter_records(path: str, text_field: str, id_field: str) -> Iterator[Dict]:
+    """입력 파일을 한 건씩 읽기 (Parquet 도 row group 단위로 읽어서 전체를 메모리에 올리지 않음)"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        columns = [c for c in (id_field, text_field) if c in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=1024, columns=columns):
+            for row in batch.to_pylist():
+                yield row
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batched(records: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoint:
+    """처리 완료한 입력 건수(offset) + 그 시점의 출력 파일 크기 저장"""
+
+    def __init__(self, output_path: str):
+        self.path = output_path + ".ckpt.json"
+        self.offset = 0
+        self.output_bytes = 0
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.offset = data["offset"]
+            self.output_bytes = data["output_bytes"]
+
+    def commit(self, offset: int, output_bytes: int):
+        # 임시 파일에 쓰고 교체 → 저장 도중 멈춰도 체크포인트가 깨지지 않음
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"offset": offset, "output_bytes": output_bytes,
+                       "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")}, f)
+        os.replace(tmp, self.path)
+        self.offset = offset
+        self.output_bytes = output_bytes
+
+
+class BulkJob:
+    def __init__(self, analyzer: LegalAnalyzer, args):
+        self.analyzer = analyzer
+        self.args = args
+        self.checkpoint = Checkpoint(args.output)
+        self.done = 0
+        self.start = time.time()
+
+    def _open_output(self):
+        """이어서 처리할 때는 마지막 체크포인트 이후에 쓰다 만 결과를 잘라냄
+        출력 파일이 없으면 처음부터 (입력은 이 함수가 정한 offset 만큼만 건너뜀)"""
+        if self.checkpoint.offset > 0 and not os.path.exists(self.args.output):
+            print(f"⚠️ 체크포인트({self.checkpoint.offset}건)는 있지만 출력 파일이 없어서 처음부터 다시 처리합니다.")
+        elif self.checkpoint.offset > 0:
+            size = os.path.getsize(self.args.output)
+            if size < self.checkpoint.output_bytes:
+                raise RuntimeError(f"출력 파일({size}바이트)이 체크포인트({self.checkpoint.output_bytes}바이트)보다 짧습니다. "
+                                   f"{self.checkpoint.path} 를 지우고 처음부터 다시 실행하세요.")
+            f = open(self.args.output, "r+b")
+            f.truncate(self.checkpoint.output_bytes)
+            f.seek(self.checkpoint.output_bytes)
+            print(f"🔄 체크포인트 {self.checkpoint.offset}건부터 이어서 처리합니다.")
+            return f
+        self.checkpoint.offset = 0
+        return open(self.args.output, "wb")
+
+    async def _finish(self, out, offset: int, records, bert_results, feedback_task):
+        """피드백까지 끝난 배치를 순서대로 쓰고 체크포인트 커밋"""
+        feedbacks = await feedback_task if feedback_task else [None] * len(records)
+        for i, (record, bert, feedback) in enumerate(zip(records, bert_results, feedbacks)):
+            result = {"id": record.get(self.args.id_field, offset + i), **bert}
+            if feedback is not None:
+                result["feedback"] = feedback
+            out.write((json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8"))
+        out.flush()
+        os.fsync(out.fileno())
+
+        new_offset = offset + len(records)
+        self.checkpoint.commit(new_offset, out.tell())
+        self.done += len(records)
+        rate = self.done / max(time.time() - self.start, 1e-6)
+        print(f"  - {new_offset}건 완료 ({rate:.1f}건/초)")
+
+    async def run(self):
+        records = iter_records(self.args.input, self.args.text_field, self.args.id_field)
+        with self._open_output() as out:
+            # 출력 파일 상태로 정해진 offset 만큼 이미 처리한 입력 건너뛰기
+            offset = self.checkpoint.offset
+            for _ in range(offset):
+                next(records, None)
+            pending = None
+            for batch in batched(records, self.args.batch_size):
+                texts = [str(r.get(self.args.text_field, "")) for r in batch]
+                # 다음 배치의 BERT 는 이전 배치의 Gemini 피드백을 기다리는 동안 실행
+                bert_results = await asyncio.to_thread(self.analyzer.predict_bert_batch, texts)
+                feedback_task = None
+                if not self.args.no_feedback:
+                    # 동시 호출 수는 LLM 게이트웨이(LLM_MAX_CONCURRENCY)가 제한
+                    feedback_task = asyncio.gather(*[
+                        self.analyzer.agenerate_feedback(text, bert)
+                        for text, bert in zip(texts, bert_results)
+                    ])
+
+                if pending:
+                    await self._finish(out, *pending)
+                pending = (offset, batch, bert_results, feedback_task)
+                offset += len(batch)
+
+            if pending:
+                await self._finish(out, *pending)
+
+        print(f"✅ 완료: 이번 실행 {self.done}건 / 누적 {self.checkpoint.offset}건 → {self.args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="사연 대량 일괄 분석 (체크포인트/이어하기 지원)")
+    parser.add_argument("--input", required=True, help=".jsonl 또는 .parquet")
+    parser.add_argument("--output", required=True, help="결과 .jsonl")
+    parser.add_argument("--text-field", default="story")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--no-feedback", action="store_true", help="Gemini 피드백 없이 BERT 수치만")
+    parser.add_argument("--with-embedding", action="store_true",
+                        help="결과에 BERT 문장 벡터(embedding) 저장 (판례 legal-bert 인덱스 질의용)")
+    parser.add_argument("--model-path", default="../lerning/saved_mode3")
+    parser.add_argument("--backend", default=os.getenv("LEGAL_MODEL_BACKEND", "torch"))
+    parser.add_argument("--restart", action="store_true", help="체크포인트를 무시하고 처음부터")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.restart and os.path.exists(args.output + ".ckpt.json"):
+        os.remove(args.output + ".ckpt.json")
+
+    analyzer = LegalAnalyzer(
+        model_path=args.model_path,
+        gemini_api_key=os.getenv("GEMINI_API_KEY"),
+        backend=args.backend,
+        return_embedding=args.with_embedding
+    )
+    asyncio.run(BulkJob(analyzer, args).run())
+
+
+if __name__ == "__main__":
+    main()
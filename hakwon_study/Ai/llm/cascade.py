@@ -0,0 +1,236 @@
+# cascade.py
+# 단계별 분석 (cascade) / 싼 모델로 확실한 사연은 바로 답하고, 애매한 사연만 BERT → 필요할 때만 Gemini
+#
+# 1단계 fast : student 모델 숫자가 teacher(BERT) 와 충분히 가까울 때 바로 응답 (fast_model_path 필요)
+#              - student 오차: 최근 audit(무작위로 BERT 도 같이 돌려 비교) 평균, 없으면 distill_report.json 의 mae
+#              - 오차가 tolerance 보다 크거나 / 위험도가 오차 범위 안에서 escalate_risk·feedback_risk 경계에 걸리면 BERT
+#              - TF-IDF 소송 유형 분류기(case_type_model_path)는 선택 / 있으면 유형 확률이 confidence 미만일 때도 BERT
+# 2단계 bert : MultiTaskLegalBERT (기존 /analyze 와 같은 결과)
+# 3단계 gemini: 피드백을 요청했거나 위험도가 feedback_risk 이상일 때만 Gemini 호출
+#
+# 환경 변수: LEGAL_CASCADE_CONFIDENCE (0.9) / LEGAL_CASCADE_ESCALATE_RISK (70) / LEGAL_CASCADE_FEEDBACK_RISK (70)
+#           LEGAL_CASCADE_TOLERANCE (5, 승소율·위험도 점수) / LEGAL_CASCADE_AUDIT_RATE (0.05)
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+TIERS = ("fast", "bert", "gemini")
+# student 를 믿을지 판단하는 숫자 (0~100 점수라 tolerance 하나로 비교)
+GATED_HEADS = ("win_rate", "risk")
+
+
+class CascadeStats:
+    """단계별 처리 건수 / 평균 소요 시간 / 올려보낸 이유"""
+
+    def __init__(self):
+        self.requests = 0
+        self.answered = Counter()      # 최종 숫자를 낸 단계 (fast / bert)
+        self.calls = Counter()         # 단계별 실행 횟수
+        self.seconds = Counter()       # 단계별 누적 시간
+        self.escalations = Counter()   # bert 로 올린 이유
+        self.feedback = Counter()      # gemini 호출 이유 (requested / high_risk) / skipped
+        # audit 에서 잰 student - teacher 절대 오차 (최근 window 건)
+        self.audit_errors = {head: deque(maxlen=200) for head in GATED_HEADS}
+        self._lock = threading.Lock()
+
+    def record(self, tier: str, seconds: float):
+        with self._lock:
+            self.calls[tier] += 1
+            self.seconds[tier] += seconds
+
+    def finish(self, answered_by: str, escalation: Optional[str], feedback: str):
+        with self._lock:
+            self.requests += 1
+            self.answered[answered_by] += 1
+            if escalation:
+                self.escalations[escalation] += 1
+            self.feedback[feedback] += 1
+
+    def record_audit(self, fast_result: Dict[str, Any], bert_result: Dict[str, Any]):
+        with self._lock:
+            for head in GATED_HEADS:
+                self.audit_errors[head].append(abs(fast_result[head] - bert_result[head]))
+
+    def audit_error(self, head: str, min_samples: int) -> Optional[float]:
+        """최근 audit 평균 오차 (표본이 모자라면 None)"""
+        with self._lock:
+            errors = self.audit_errors[head]
+            if len(errors) < min_samples:
+                return None
+            return sum(errors) / len(errors)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self.seconds.values())
+            stats = {"requests": self.requests}
+            for tier in TIERS:
+                stats[f"{tier}_calls"] = self.calls[tier]
+                stats[f"{tier}_avg_ms"] = round(self.seconds[tier] / self.calls[tier] * 1000, 2) \
+                    if self.calls[tier] else 0
+            for tier in ("fast", "bert"):
+                stats[f"answered_{tier}"] = self.answered[tier]
+            stats["fast_hit_rate"] = round(self.answered["fast"] / self.requests, 4) if self.requests else 0
+            stats["gemini_rate"] = round(self.calls["gemini"] / self.requests, 4) if self.requests else 0
+            # 요청 1건이 실제로 쓴 평균 시간 (모든 단계 합)
+            stats["avg_request_ms"] = round(total / self.requests * 1000, 2) if self.requests else 0
+            for head in GATED_HEADS:
+                errors = self.audit_errors[head]
+                stats[f"audit_{head}_mae"] = round(sum(errors) / len(errors), 3) if errors else 0
+            stats["audits"] = len(self.audit_errors[GATED_HEADS[0]])
+            stats["escalations"] = dict(self.escalations)
+            stats["feedback"] = dict(self.feedback)
+            return stats
+
+
+class CascadeScheduler:
+    """LegalAnalyzer 의 모델들을 싼 순서대로 사용"""
+
+    def __init__(self, analyzer, confidence: float = 0.9, escalate_risk: float = 70.0,
+                 feedback_risk: float = 70.0, tolerance: float = 5.0, audit_rate: float = 0.05,
+                 min_audits: int = 20):
+        """
+        Args:
+            analyzer: LegalAnalyzer
+            confidence: 소송 유형 분류기가 있을 때, 유형 확률이 이 값 미만이면 BERT
+            escalate_risk: fast 위험도(+ 오차 범위)가 이 값 이상이면 BERT 로 다시 분석
+            feedback_risk: 피드백을 요청하지 않아도 위험도가 이 값 이상이면 Gemini 피드백
+            tolerance: student 승소율·위험도 평균 오차(점)가 이 값보다 크면 fast 를 쓰지 않음
+            audit_rate: fast 로 답할 수 있는 요청 중 BERT 로도 돌려서 오차를 재는 비율
+            min_audits: audit 이 이만큼 쌓이면 distill_report 대신 audit 오차 사용
+        """
+        self.analyzer = analyzer
+        self.confidence = confidence
+        self.escalate_risk = escalate_risk
+        self.feedback_risk = feedback_risk
+        self.tolerance = tolerance
+        self.audit_rate = audit_rate
+        self.min_audits = min_audits
+        self.stats = CascadeStats()
+        if analyzer.fast_model is None:
+            print("⚠️ fast 모델(LEGAL_FAST_MODEL_PATH)이 없어 cascade 는 모든 요청을 BERT 로 분석합니다.")
+        elif not analyzer.fast_report.get("mae"):
+            print("⚠️ distill_report.json 이 없어 audit 이 쌓일 때까지 cascade 는 BERT 로 분석합니다.")
+
+    @classmethod
+    def from_env(cls, analyzer, prefix: str = "LEGAL_CASCADE_") -> "CascadeScheduler":
+        return cls(
+            analyzer,
+            confidence=float(os.getenv(f"{prefix}CONFIDENCE", "0.9")),
+            escalate_risk=float(os.getenv(f"{prefix}ESCALATE_RISK", "70")),
+            feedback_risk=float(os.getenv(f"{prefix}FEEDBACK_RISK", "70")),
+            tolerance=float(os.getenv(f"{prefix}TOLERANCE", "5")),
+            audit_rate=float(os.getenv(f"{prefix}AUDIT_RATE", "0.05")),
+        )
+
+    @property
+    def fast_available(self) -> bool:
+        # 소송 유형 분류기는 없어도 됨 (BERT 결과와 같이 기본 유형으로 응답)
+        return self.analyzer.fast_model is not None
+
+    def student_error(self, head: str) -> Optional[float]:
+        """student 평균 오차 추정 (최근 audit → distill_report mae → 모르면 None)"""
+        error = self.stats.audit_error(head, self.min_audits)
+        if error is None:
+            error = (self.analyzer.fast_report.get("mae") or {}).get(head)
+        return error
+
+    def _fast(self, story: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        result = self.analyzer.predict_fast([story])[0]
+        self.stats.record("fast", time.perf_counter() - start)
+        return result
+
+    def _escalation(self, fast_result: Optional[Dict[str, Any]]) -> Optional[str]:
+        """fast 결과를 그대로 쓸 수 없는 이유 (None 이면 fast 로 응답)"""
+        if fast_result is None:
+            return "no_fast_model"
+        errors = [self.student_error(head) for head in GATED_HEADS]
+        if any(error is None for error in errors):
+            return "no_error_estimate"
+        if max(errors) > self.tolerance:
+            return "student_error"
+        if fast_result.get('case_type_confidence', 1.0) < self.confidence:
+            return "low_confidence"
+        # 오차 범위 안에서 BERT 였다면 판단(재분석 / 피드백)이 달라질 수 있는 사연
+        band = self.student_error("risk")
+        if fast_result['risk'] + band >= self.escalate_risk:
+            return "high_risk"
+        if abs(fast_result['risk'] - self.feedback_risk) <= band:
+            return "near_threshold"
+        if random.random() < self.audit_rate:
+            return "audit"
+        return None
+
+    def _record_bert(self, escalation: str, fast_result, result):
+        # 무작위 audit / 오차를 모를 때(모든 요청)만 기록 → 어려운 사연만 골라 잰 오차로 치우치지 않게
+        if escalation in ("audit", "no_error_estimate"):
+            self.stats.record_audit(fast_result, result)
+
+    def _feedback_reason(self, result: Dict[str, Any], requested: bool) -> Optional[str]:
+        if requested:
+            return "requested"
+        if result['risk'] >= self.feedback_risk:
+            return "high_risk"
+        return None
+
+    def _finish(self, result: Dict[str, Any], fast_result, escalation, feedback_reason,
+                feedback, story: str) -> Dict[str, Any]:
+        tier = "bert" if escalation else "fast"
+        self.stats.finish(tier, escalation, feedback_reason or "skipped")
+        cascade = {"tier": tier, "escalation": escalation, "feedback": feedback_reason}
+        if fast_result is not None:
+            cascade["student_error"] = {head: round(self.student_error(head), 3)
+                                        for head in GATED_HEADS if self.student_error(head) is not None}
+            if 'case_type_confidence' in fast_result:
+                cascade["confidence"] = fast_result['case_type_confidence']
+        return {**result, 'feedback': feedback, 'cascade': cascade, 'original_story': story}
+
+    def run(self, story: str, feedback: bool = False) -> Dict[str, Any]:
+        """동기 코드용 (스크립트 / 터미널 테스트)"""
+        fast_result = self._fast(story) if self.fast_available else None
+        escalation = self._escalation(fast_result)
+        result = fast_result
+        if escalation:
+            start = time.perf_counter()
+            result = self.analyzer.predict_bert(story)
+            self.stats.record("bert", time.perf_counter() - start)
+            self._record_bert(escalation, fast_result, result)
+
+        reason = self._feedback_reason(result, feedback)
+        text = None
+        if reason:
+            start = time.perf_counter()
+            text = self.analyzer.generate_feedback(story, result)
+            self.stats.record("gemini", time.perf_counter() - start)
+        return self._finish(result, fast_result, escalation, reason, text, story)
+
+    async def arun(self, story: str, feedback: bool = False,
+                   bert: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+        """FastAPI async 라우트용
+
+        Args:
+            bert: BERT 단계 (기본: 스레드에서 predict_bert / 서버에서는 batcher.submit 을 넘겨 배치로 묶음)
+        """
+        fast_result = await asyncio.to_thread(self._fast, story) if self.fast_available else None
+        escalation = self._escalation(fast_result)
+        result = fast_result
+        if escalation:
+            start = time.perf_counter()
+            if bert is None:
+                result = await asyncio.to_thread(self.analyzer.predict_bert, story)
+            else:
+                result = await bert(story)
+            self.stats.record("bert", time.perf_counter() - start)
+            self._record_bert(escalation, fast_result, result)
+
+        reason = self._feedback_reason(result, feedback)
+        text = None
+        if reason:
+            start = time.perf_counter()
+            text = await self.analyzer.agenerate_feedback(story, result)
+            self.stats.record("gemini", time.perf_counter() - start)
+        return self._finish(result, fast_result, escalation, reason, text, story)
@@ -0,0 +1,152 @@
+# case_type_classifier.py
+# 소송 유형 빠른 분류기 / lagalAi.ipynb 의 TF-IDF + LogisticRegression 파이프라인을 서비스용으로 저장·로드
+#
+# 실행 예시 (학습 → 저장)
+# python case_type_classifier.py --train ../pkl_file/machine_data/train_machineData.pkl \
+#        --test ../pkl_file/machine_data/test_machineData.pkl --out-dir ../lerning/case_type_tfidf
+#   -> case_type_tfidf.joblib, case_type_report.json (정확도 / 1건 예측 시간)
+# LEGAL_CASE_TYPE_MODEL=../lerning/case_type_tfidf python main.py  → 결과의 case_type 이 실제 유형으로 채워짐
+#   - 예측은 sklearn predict_proba 를 거치지 않고 희소 행렬 × 가중치 행렬 곱 한 번 (1건 1ms 미만)
+#   - BERT 를 돌리지 않아도 되는 곳(라우팅, 통계)에서 바로 사용 가능
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+MODEL_FILE = "case_type_tfidf.joblib"
+REPORT_FILE = "case_type_report.json"
+
+
+def build_pipeline() -> Pipeline:
+    """노트북과 같은 설정 (float32 희소 행렬로 메모리 절반)"""
+    return Pipeline([
+        ('tfidf', TfidfVectorizer(
+            max_features=30000,
+            ngram_range=(1, 2),
+            min_df=3,
+            dtype=np.float32
+        )),
+        ('clf', LogisticRegression(
+            max_iter=1000,
+            class_weight='balanced'  # 불균형 대응
+        ))
+    ])
+
+
+class CaseTypeClassifier:
+    """학습된 TF-IDF 파이프라인 → (소송 유형, 확률)"""
+
+    def __init__(self, pipeline: Pipeline, report: Dict = None):
+        self.pipeline = pipeline
+        self.report = report or {}
+        self.vectorizer = pipeline.named_steps['tfidf']
+        clf = pipeline.named_steps['clf']
+        self.labels: List[str] = [str(c) for c in clf.classes_]
+        # [단어 수, 유형 수] 로 미리 전치 → 예측은 희소 행렬 곱 + softmax 만
+        self._coef = np.ascontiguousarray(clf.coef_.T, dtype=np.float32)
+        self._intercept = clf.intercept_.astype(np.float32)
+
+    @classmethod
+    def train(cls, texts: List[str], labels: List[str]) -> "CaseTypeClassifier":
+        pipeline = build_pipeline()
+        pipeline.fit(texts, labels)
+        return cls(pipeline)
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """[사연 수, 유형 수] 확률 (LogisticRegression.predict_proba 와 같은 값)"""
+        scores = np.asarray(self.vectorizer.transform(texts) @ self._coef) + self._intercept
+        if scores.shape[1] == 1:
+            # 유형이 2개면 sklearn 은 가중치 1줄 + sigmoid
+            positive = 1.0 / (1.0 + np.exp(-scores))
+            return np.hstack([1.0 - positive, positive])
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def predict(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """사연 목록 → [(소송 유형, 확률), ...]"""
+        proba = self.predict_proba(texts)
+        best = proba.argmax(axis=1)
+        return [(self.labels[j], float(proba[i, j])) for i, j in enumerate(best)]
+
+    def save(self, out_dir: str) -> str:
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, MODEL_FILE)
+        joblib.dump({"pipeline": self.pipeline, "report": self.report}, path)
+        return path
+
+    @classmethod
+    def load(cls, model_path: str) -> "CaseTypeClassifier":
+        """폴더 또는 .joblib 파일 경로"""
+        if os.path.isdir(model_path):
+            model_path = os.path.join(model_path, MODEL_FILE)
+        saved = joblib.load(model_path)
+        return cls(saved["pipeline"], saved.get("report"))
+
+
+def load_texts(path: str) -> Tuple[List[str], List[str]]:
+    """전처리된 DataFrame(.pkl / .parquet) → (text, case_type)"""
+    import pandas as pd
+
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_pickle(path)
+    if "text" not in df:
+        # 노트북과 같은 통합 텍스트
+        df["text"] = df["case_name"] + " " + df["question"] + " " + df["body"]
+    return df["text"].fillna("").astype(str).tolist(), df["case_type"].astype(str).tolist()
+
+
+def latency_ms(model: CaseTypeClassifier, texts: List[str], repeats: int = 3) -> float:
+    """사연 1건씩 예측한 중앙값"""
+    times = []
+    for _ in range(repeats):
+        for text in texts:
+            start = time.perf_counter()
+            model.predict([text])
+            times.append((time.perf_counter() - start) * 1000)
+    return round(float(np.median(times)), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TF-IDF + LogisticRegression 소송 유형 분류기 학습")
+    parser.add_argument("--train", required=True, help="case_type 이 있는 DataFrame .pkl / .parquet")
+    parser.add_argument("--test", default=None)
+    parser.add_argument("--out-dir", default="../lerning/case_type_tfidf")
+    parser.add_argument("--latency-samples", type=int, default=200)
+    args = parser.parse_args()
+
+    from sklearn.metrics import accuracy_score, classification_report
+
+    texts, labels = load_texts(args.train)
+    print(f"📚 학습 데이터 {len(texts)}건 / 유형 {sorted(set(labels))}")
+    start = time.time()
+    model = CaseTypeClassifier.train(texts, labels)
+    print(f"🏋️ 학습 완료 ({time.time() - start:.1f}초, 단어 {len(model.vectorizer.vocabulary_)}개)")
+
+    report = {"train_samples": len(texts), "labels": model.labels}
+    eval_texts = texts
+    if args.test:
+        eval_texts, eval_labels = load_texts(args.test)
+        preds = [label for label, _ in model.predict(eval_texts)]
+        print(classification_report(eval_labels, preds))
+        report["test_samples"] = len(eval_texts)
+        report["accuracy"] = round(accuracy_score(eval_labels, preds), 4)
+    report["latency_ms"] = latency_ms(model, eval_texts[:args.latency_samples])
+    report["created_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    model.report = report
+
+    path = model.save(args.out_dir)
+    with open(os.path.join(args.out_dir, REPORT_FILE), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"✅ 저장: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# distill.py
+# 빠른 예측용 작은 모델 만들기 / teacher(12층 MultiTaskLegalBERT) 의 헤드 출력을 따라하도록 4~6층 student 학습
+#
+# 실행 예시
+# python distill.py --teacher ../lerning/saved_mode3 --input stories.jsonl --out-dir ../lerning/student_l4 --layers 4
+#   -> pytorch_model.bin, config.json, distill_report.json (teacher 대비 오차 / CPU 지연시간)
+# LEGAL_FAST_MODEL_PATH=../lerning/student_l4 python main.py  → POST /analyze/fast
+#   - 정답 라벨은 필요 없음: 사연만 있으면 teacher 예측값이 학습 목표
+#   - student 레이어는 teacher 레이어를 균등 간격으로 골라 복사해서 시작 (DistilBERT 방식)
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import time
+from typing import Dict, List
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from transformers import AutoTokenizer
+
+from model import MultiTaskLegalBERT
+from export_model import HEAD_NAMES, REGRESSION_HEADS, load_fp32_model
+from bulk_analyze import iter_records
+
+REPORT_FILE = "distill_report.json"
+
+
+def build_student(teacher: MultiTaskLegalBERT, num_layers: int) -> MultiTaskLegalBERT:
+    """teacher 와 같은 폭 / 레이어만 num_layers 개인 student (임베딩, pooler, 헤드는 그대로 복사)"""
+    config = copy.deepcopy(teacher.bert.config)
+    teacher_layers = config.num_hidden_layers
+    config.num_hidden_layers = num_layers
+    student = MultiTaskLegalBERT("klue/bert-base", num_labels=teacher.num_labels, config=config)
+
+    # 예) 12층 → 4층: teacher 0, 4, 7, 11 번째 레이어
+    keep = torch.linspace(0, teacher_layers - 1, num_layers).round().long().tolist()
+    layer_map = {old: new for new, old in enumerate(keep)}
+    state_dict = {}
+    for key, value in teacher.state_dict().items():
+        match = re.match(r"bert\.encoder\.layer\.(\d+)\.(.*)", key)
+        if match is None:
+            state_dict[key] = value
+        elif int(match.group(1)) in layer_map:
+            state_dict[f"bert.encoder.layer.{layer_map[int(match.group(1))]}.{match.group(2)}"] = value
+    student.load_state_dict(state_dict)
+    print(f"🎓 student: teacher {teacher_layers}층 중 {keep} 번째 레이어로 시작")
+    return student
+
+
+def batches(texts: List[str], size: int, tokenizer, max_length: int):
+    """batch 안에서 가장 긴 길이로만 패딩"""
+    for i in range(0, len(texts), size):
+        encoded = tokenizer(texts[i:i + size], return_tensors="pt", truncation=True,
+                            padding=True, max_length=max_length, return_token_type_ids=False)
+        yield i, {"input_ids": encoded["input_ids"], "attention_mask": encoded["attention_mask"]}
+
+
+@torch.no_grad()
+def predict_all(model, tokenizer, texts: List[str], batch_size: int, max_length: int) -> Dict[str, torch.Tensor]:
+    """사연 전체에 대한 헤드 출력 (CPU 텐서)"""
+    model.eval()
+    device = model.device
+    outputs = {name: [] for name in HEAD_NAMES}
+    for _, inputs in batches(texts, batch_size, tokenizer, max_length):
+        result = model(**{k: v.to(device) for k, v in inputs.items()})
+        for name in HEAD_NAMES:
+            outputs[name].append(result[name].float().cpu())
+    return {name: torch.cat(values) for name, values in outputs.items()}
+
+
+def distill_loss(student_out, targets, scale: Dict[str, float], temperature: float):
+    """회귀 헤드는 teacher 출력 표준편차로 나눈 MSE (벌금 같은 큰 값이 loss 를 독점하지 않게)
+    + 분류 헤드는 온도 T 의 KL (학습 때와 같은 0.1 비중)"""
+    loss = sum(F.mse_loss(student_out[name] / scale[name], targets[name] / scale[name])
+               for name in REGRESSION_HEADS)
+    kl = F.kl_div(F.log_softmax(student_out["logits"] / temperature, dim=-1),
+                  F.softmax(targets["logits"] / temperature, dim=-1),
+                  reduction="batchmean") * temperature ** 2
+    return loss + 0.1 * kl
+
+
+def train(student, tokenizer, texts, targets, args):
+    device = student.device
+    scale = {name: max(targets[name].std().item(), 1e-2) for name in REGRESSION_HEADS}
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.lr)
+
+    order = list(range(len(texts)))
+    for epoch in range(args.epochs):
+        student.train()
+        random.shuffle(order)
+        shuffled = [texts[i] for i in order]
+        total, steps, start = 0.0, 0, time.time()
+        for i, inputs in batches(shuffled, args.batch_size, tokenizer, args.max_length):
+            index = torch.tensor(order[i:i + args.batch_size])
+            batch_targets = {name: targets[name][index].to(device) for name in HEAD_NAMES}
+            out = student(**{k: v.to(device) for k, v in inputs.items()})
+            loss = distill_loss(out, batch_targets, scale, args.temperature)
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+            optimizer.step()
+            total += loss.item()
+            steps += 1
+        print(f"  epoch {epoch + 1}/{args.epochs}  loss {total / max(steps, 1):.4f}  ({time.time() - start:.1f}초)")
+
+
+def accuracy_delta(teacher_out, student_out) -> Dict:
+    """holdout 사연에서 student 가 teacher 와 얼마나 다른지"""
+    report = {"mae": {}, "max_abs_error": {}}
+    for name in REGRESSION_HEADS:
+        diff = (student_out[name] - teacher_out[name]).abs()
+        report["mae"][name] = round(diff.mean().item(), 4)
+        report["max_abs_error"][name] = round(diff.max().item(), 4)
+    agree = (student_out["logits"].argmax(-1) == teacher_out["logits"].argmax(-1)).float().mean()
+    report["case_type_agreement"] = round(agree.item(), 4)
+    return report
+
+
+@torch.no_grad()
+def cpu_latency_ms(model, tokenizer, texts: List[str], max_length: int, repeats: int = 3) -> float:
+    """CPU 에서 사연 1건씩 forward 한 중앙값 (화면 숫자 패널과 같은 조건)"""
+    model = model.to("cpu").eval()
+    times = []
+    for _ in range(repeats):
+        for _, inputs in batches(texts, 1, tokenizer, max_length):
+            start = time.perf_counter()
+            model(**inputs)
+            times.append((time.perf_counter() - start) * 1000)
+    return round(float(np.median(times)), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MultiTaskLegalBERT → 작은 student 모델 증류")
+    parser.add_argument("--teacher", default="../lerning/saved_mode3")
+    parser.add_argument("--input", required=True, help="사연 .jsonl 또는 .parquet")
+    parser.add_argument("--text-field", default="story")
+    parser.add_argument("--out-dir", default="../lerning/student_l4")
+    parser.add_argument("--layers", type=int, default=4, help="student 레이어 수 (4~6 권장)")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--lr", type=float, default=5e-5)
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--holdout", type=float, default=0.1, help="오차 측정용으로 빼둘 비율")
+    parser.add_argument("--limit", type=int, default=None, help="앞에서 N건만 사용")
+    parser.add_argument("--latency-samples", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    texts = [str(r.get(args.text_field, "")) for r in iter_records(args.input, args.text_field, "id")]
+    texts = [t for t in texts if t.strip()][:args.limit]
+    random.shuffle(texts)
+    n_holdout = max(1, int(len(texts) * args.holdout))
+    train_texts, eval_texts = texts[n_holdout:], texts[:n_holdout]
+    print(f"📚 사연 {len(texts)}건 (학습 {len(train_texts)} / 평가 {len(eval_texts)})")
+
+    tokenizer = AutoTokenizer.from_pretrained("klue/bert-base", use_fast=True)
+    teacher = load_fp32_model(args.teacher).to(device)
+
+    print("🔍 teacher 예측값 계산 중...")
+    targets = predict_all(teacher, tokenizer, train_texts, args.batch_size * 2, args.max_length)
+    teacher_eval = predict_all(teacher, tokenizer, eval_texts, args.batch_size * 2, args.max_length)
+
+    student = build_student(teacher, args.layers).to(device)
+    print(f"🏋️ student {args.layers}층 학습 시작")
+    train(student, tokenizer, train_texts, targets, args)
+
+    student_eval = predict_all(student, tokenizer, eval_texts, args.batch_size * 2, args.max_length)
+    student.save_pretrained(args.out_dir)
+
+    latency_texts = eval_texts[:args.latency_samples]
+    teacher_ms = cpu_latency_ms(teacher, tokenizer, latency_texts, args.max_length)
+    student_ms = cpu_latency_ms(student, tokenizer, latency_texts, args.max_length)
+
+    report = {
+        "teacher": args.teacher,
+        "teacher_layers": teacher.bert.config.num_hidden_layers,
+        "student_layers": args.layers,
+        "train_samples": len(train_texts),
+        "eval_samples": len(eval_texts),
+        **accuracy_delta(teacher_eval, student_eval),
+        "cpu_latency_ms": {"teacher": teacher_ms, "student": student_ms},
+        "speedup": round(teacher_ms / student_ms, 2) if student_ms else None,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(os.path.join(args.out_dir, REPORT_FILE), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"✅ student 저장: {args.out_dir} (CPU {report['speedup']}배 빠름)")
+
+
+if __name__ == "__main__":
+    main()
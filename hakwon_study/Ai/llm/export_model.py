@@ -0,0 +1,209 @@
+# export_model.py
+# CPU 서빙용 모델 내보내기 / int8 동적 양자화 + ONNX 변환 + 수치 비교 리포트
+#
+# 실행 예시
+# python export_model.py --model-path ../lerning/saved_mode3 --out-dir ../lerning/saved_mode3
+#   -> pytorch_model_int8.bin, config.json, model.onnx, parity_report.json 생성
+import argparse
+import json
+import os
+import time
+
+import torch
+import torch.nn as nn
+from transformers import AutoTokenizer, BertConfig
+
+from model import MultiTaskLegalBERT
+
+INT8_FILE = "pytorch_model_int8.bin"
+ONNX_FILE = "model.onnx"
+REPORT_FILE = "parity_report.json"
+
+# ONNX 그래프 출력 순서 (LegalAnalyzer onnx 백엔드도 이 이름으로 꺼내씀)
+HEAD_NAMES = ["win_rate", "sentence", "fine", "risk", "logits"]
+REGRESSION_HEADS = ["win_rate", "sentence", "fine", "risk"]
+
+# 리포트용 기본 사연 (streamlit 예시 사연과 동일)
+SAMPLE_STORIES = [
+    "저는 회사에서 부당해고를 당했습니다. 5년간 성실히 근무했으나 경영상의 이유로 갑자기 해고 통보를 받았습니다. "
+    "퇴직금 500만원도 받지 못했고, 해고 예고 수당도 없었습니다.",
+    "신호대기 중 뒤에서 추돌당했습니다. 상대방이 100% 과실인데도 보험처리를 거부하고 있습니다. "
+    "병원 치료비 200만원과 차량 수리비 300만원이 발생했습니다.",
+    "임대인이 보증금 1000만원을 돌려주지 않습니다. 계약서에 명시된 날짜가 지났는데도 연락이 두절되었습니다.",
+]
+
+
+def bert_config(model_path: str) -> BertConfig:
+    """모델 폴더의 config.json (없으면 klue/bert-base 설정만) → 사전학습 가중치를 내려받지 않고 뼈대 생성용"""
+    if os.path.exists(os.path.join(model_path, "config.json")):
+        return BertConfig.from_pretrained(model_path)
+    return BertConfig.from_pretrained("klue/bert-base")
+
+
+def load_fp32_model(model_path: str, num_labels: int = 3) -> MultiTaskLegalBERT:
+    """학습된 가중치(pytorch_model.bin)를 CPU fp32 모델로 불러오기"""
+    model = MultiTaskLegalBERT(model_name="klue/bert-base", num_labels=num_labels,
+                               config=bert_config(model_path))
+    checkpoint = torch.load(os.path.join(model_path, "pytorch_model.bin"),
+                            map_location="cpu", weights_only=False)
+    # jem_api.py 와 동일하게 'model_state_dict' 포장 풀기
+    if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+        checkpoint = checkpoint['model_state_dict']
+    model.load_state_dict(checkpoint)
+    model.eval()
+    return model
+
+
+def quantize_int8(model: MultiTaskLegalBERT) -> nn.Module:
+    """nn.Linear 레이어만 int8 동적 양자화 (BERT 연산의 대부분이 Linear)"""
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def load_int8_model(model_path: str, num_labels: int = 3) -> nn.Module:
+    """export 해둔 int8 가중치 불러오기 (config 로 만든 빈 뼈대를 먼저 양자화한 뒤 state_dict 주입)"""
+    model = MultiTaskLegalBERT(model_name="klue/bert-base", num_labels=num_labels,
+                               config=bert_config(model_path))
+    model.eval()
+    model = quantize_int8(model)
+    state_dict = torch.load(os.path.join(model_path, INT8_FILE),
+                            map_location="cpu", weights_only=False)
+    model.load_state_dict(state_dict)
+    return model
+
+
+class _OnnxWrapper(nn.Module):
+    """forward 결과 dict -> tuple 변환 (ONNX 는 dict 출력을 못 씀)"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
+        return tuple(outputs[name] for name in HEAD_NAMES)
+
+
+def export_onnx(model: MultiTaskLegalBERT, tokenizer, onnx_path: str, opset: int = 14):
+    """5개 헤드를 모두 출력하는 ONNX 그래프 저장 (batch / 길이 가변)"""
+    dummy = tokenizer(SAMPLE_STORIES[0], return_tensors="pt",
+                      truncation=True, max_length=512)
+    torch.onnx.export(
+        _OnnxWrapper(model),
+        (dummy["input_ids"], dummy["attention_mask"]),
+        onnx_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=HEAD_NAMES,
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            **{name: {0: "batch"} for name in HEAD_NAMES},
+        },
+        opset_version=opset,
+        do_constant_folding=True,
+    )
+
+
+def _run_torch(model, inputs):
+    with torch.no_grad():
+        outputs = model(input_ids=inputs["input_ids"],
+                        attention_mask=inputs["attention_mask"])
+    return {name: outputs[name].numpy() for name in HEAD_NAMES}
+
+
+def _run_onnx(session, inputs):
+    feed = {
+        "input_ids": inputs["input_ids"].numpy(),
+        "attention_mask": inputs["attention_mask"].numpy(),
+    }
+    return dict(zip(HEAD_NAMES, session.run(HEAD_NAMES, feed)))
+
+
+def parity_report(fp32_model, tokenizer, stories, int8_model=None, onnx_path=None,
+                  repeat: int = 5) -> dict:
+    """fp32 기준으로 int8 / onnx 회귀 헤드 오차와 평균 지연시간 비교"""
+    runners = {"fp32": lambda x: _run_torch(fp32_model, x)}
+    if int8_model is not None:
+        runners["int8"] = lambda x: _run_torch(int8_model, x)
+    if onnx_path is not None:
+        import onnxruntime as ort
+        session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        runners["onnx"] = lambda x: _run_onnx(session, x)
+
+    results = {name: [] for name in runners}
+    latency = {name: 0.0 for name in runners}
+    for story in stories:
+        inputs = tokenizer(story, return_tensors="pt", truncation=True, max_length=512)
+        for name, run in runners.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                out = run(inputs)
+            latency[name] += (time.perf_counter() - start) / repeat
+            results[name].append(out)
+
+    report = {"num_stories": len(stories), "backends": {}}
+    for name in runners:
+        entry = {"avg_latency_ms": round(latency[name] / len(stories) * 1000, 2)}
+        if name != "fp32":
+            heads = {}
+            for head in REGRESSION_HEADS:
+                diffs = [abs(float(a[head].reshape(-1)[0]) - float(b[head].reshape(-1)[0]))
+                         for a, b in zip(results["fp32"], results[name])]
+                heads[head] = {
+                    "max_abs_diff": round(max(diffs), 4),
+                    "mean_abs_diff": round(sum(diffs) / len(diffs), 4),
+                }
+            entry["heads"] = heads
+            # 소송 분류 결과(argmax)가 fp32 와 같은 비율
+            same = sum(int(a["logits"].argmax(-1)[0] == b["logits"].argmax(-1)[0])
+                       for a, b in zip(results["fp32"], results[name]))
+            entry["logits_agreement"] = round(same / len(stories), 4)
+        report["backends"][name] = entry
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MultiTaskLegalBERT int8 / ONNX export")
+    parser.add_argument("--model-path", default="../lerning/saved_mode3")
+    parser.add_argument("--out-dir", default=None, help="기본값: model-path 와 같은 폴더")
+    parser.add_argument("--num-labels", type=int, default=3)
+    parser.add_argument("--stories", default=None,
+                        help="리포트용 사연 파일 (한 줄에 사연 하나, 없으면 예시 사연 사용)")
+    parser.add_argument("--skip-onnx", action="store_true")
+    args = parser.parse_args()
+
+    out_dir = args.out_dir or args.model_path
+    os.makedirs(out_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained("klue/bert-base")
+    print("🔄 fp32 모델 로딩 중...")
+    fp32_model = load_fp32_model(args.model_path, args.num_labels)
+
+    print("🔄 int8 동적 양자화 중...")
+    int8_model = quantize_int8(load_fp32_model(args.model_path, args.num_labels))
+    torch.save(int8_model.state_dict(), os.path.join(out_dir, INT8_FILE))
+    # int8 뼈대를 같은 크기로 만들 수 있게 설정도 같이 저장
+    fp32_model.config.save_pretrained(out_dir)
+    print(f"✅ int8 모델 저장: {os.path.join(out_dir, INT8_FILE)}")
+
+    onnx_path = None
+    if not args.skip_onnx:
+        print("🔄 ONNX 변환 중...")
+        onnx_path = os.path.join(out_dir, ONNX_FILE)
+        export_onnx(fp32_model, tokenizer, onnx_path)
+        print(f"✅ ONNX 모델 저장: {onnx_path}")
+
+    stories = SAMPLE_STORIES
+    if args.stories:
+        with open(args.stories, encoding="utf-8") as f:
+            stories = [line.strip() for line in f if line.strip()]
+
+    print("📊 수치 비교 리포트 생성 중...")
+    report = parity_report(fp32_model, tokenizer, stories,
+                           int8_model=int8_model, onnx_path=onnx_path)
+    with open(os.path.join(out_dir, REPORT_FILE), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
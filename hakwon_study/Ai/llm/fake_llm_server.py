@@ -0,0 +1,79 @@
+# fake_llm_server.py
+# 로컬 가짜 Gemini 서버 / 지연·실패를 흉내내서 llm_gateway 의 재시도, 타임아웃, 서킷 브레이커 확인용
+#
+# 실행 예시
+# python fake_llm_server.py --port 8089 --delay 0.5 --fail-rate 0.3
+# GEMINI_BASE_URL=http://127.0.0.1:8089 python main.py
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 감정 일기 분석 형식의 기본 응답 (법률 피드백 요청에는 --text 로 바꿔서 사용)
+DEFAULT_TEXT = json.dumps({"mood": "Neutral", "summary": "가짜 LLM 응답입니다."}, ensure_ascii=False)
+
+
+def make_handler(args):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *a):
+            if not args.quiet:
+                super().log_message(fmt, *a)
+
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            # genai.list_models() 대응
+            self._send(200, {"models": [{
+                "name": "models/gemini-2.5-flash",
+                "supportedGenerationMethods": ["generateContent"],
+            }]})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            time.sleep(args.delay)
+
+            if not re.search(r":(generateContent|streamGenerateContent)", self.path):
+                return self._send(404, {"error": {"code": 404, "message": "not found"}})
+            if random.random() < args.fail_rate:
+                return self._send(args.fail_status, {"error": {
+                    "code": args.fail_status, "message": "fake failure", "status": "UNAVAILABLE"}})
+
+            self._send(200, {
+                "candidates": [{
+                    "content": {"role": "model", "parts": [{"text": args.text}]},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }],
+                "usageMetadata": {"promptTokenCount": length // 4, "candidatesTokenCount": 20},
+            })
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 Gemini REST 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=0.2, help="응답 지연(초)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="실패 응답 비율 (0~1)")
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--text", default=DEFAULT_TEXT, help="응답 텍스트")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f"🤖 가짜 LLM 서버: http://{args.host}:{args.port} (지연 {args.delay}초, 실패율 {args.fail_rate})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
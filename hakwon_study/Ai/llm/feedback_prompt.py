@@ -0,0 +1,119 @@
+# feedback_prompt.py
+# Gemini 피드백 프롬프트 / 고정 지시문은 system instruction 으로 분리하고,
+# 사용자 메시지에는 사연 + 예측 수치만 보냄. 답변은 JSON 섹션으로 받아서 화면이 바로 그림
+import json
+from typing import Any, Dict, Union
+
+from google.genai import types as genai_types
+
+# 매번 똑같은 부분 (역할 + 답변 형식)
+SYSTEM_INSTRUCTION = """당신은 법률 전문가이자 승소율 높은 최고의 변호사입니다.
+사용자가 보낸 【사연】과 【AI 예측 결과】를 분석하고 조언해주세요.
+반드시 지정된 JSON 형식으로만 답하고, 각 항목은 한국어로 짧고 구체적으로 작성하세요.
+
+- win_rate_analysis (승소율 분석): basis(예측 근거), strengths(유리한 점), weaknesses(불리한 점)
+- strategy (대응 전략): immediate_actions(즉시 해야 할 조치), evidence(증거 확보 방안), legal_review(법률 검토 포인트)
+- cautions (주의사항): legal_risks(법적 위험 요소), avoid(피해야 할 행동)
+- consultation (전문가 상담 추천): necessity(필요성: 상/중/하), specialties(추천 전문 분야)
+"""
+
+_LIST = {"type": "ARRAY", "items": {"type": "STRING"}}
+
+# 응답 JSON 구조 (Gemini response_schema)
+FEEDBACK_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "win_rate_analysis": {
+            "type": "OBJECT",
+            "properties": {"basis": {"type": "STRING"}, "strengths": _LIST, "weaknesses": _LIST},
+            "required": ["basis", "strengths", "weaknesses"],
+        },
+        "strategy": {
+            "type": "OBJECT",
+            "properties": {"immediate_actions": _LIST, "evidence": _LIST, "legal_review": _LIST},
+            "required": ["immediate_actions", "evidence", "legal_review"],
+        },
+        "cautions": {
+            "type": "OBJECT",
+            "properties": {"legal_risks": _LIST, "avoid": _LIST},
+            "required": ["legal_risks", "avoid"],
+        },
+        "consultation": {
+            "type": "OBJECT",
+            "properties": {
+                "necessity": {"type": "STRING", "enum": ["상", "중", "하"]},
+                "specialties": _LIST,
+            },
+            "required": ["necessity", "specialties"],
+        },
+    },
+    "required": ["win_rate_analysis", "strategy", "cautions", "consultation"],
+}
+
+# 화면/텍스트 출력용 섹션 이름
+SECTION_TITLES = {
+    "win_rate_analysis": ("1. 승소율 분석", {
+        "basis": "예측 근거", "strengths": "유리한 점", "weaknesses": "불리한 점"}),
+    "strategy": ("2. 대응 전략", {
+        "immediate_actions": "즉시 해야 할 조치", "evidence": "증거 확보 방안",
+        "legal_review": "법률 검토 포인트"}),
+    "cautions": ("3. 주의사항", {"legal_risks": "법적 위험 요소", "avoid": "피해야 할 행동"}),
+    "consultation": ("4. 전문가 상담 추천", {"necessity": "필요성", "specialties": "추천 전문 분야"}),
+}
+
+
+def user_prompt(story: str, bert_results: Dict) -> str:
+    """매 호출마다 달라지는 부분만"""
+    return (
+        f"【사연】\n{story}\n\n"
+        f"【AI 예측 결과】\n"
+        f"- 소송 유형: {bert_results['case_type']}\n"
+        f"- 승소율: {bert_results['win_rate']:.1f}%\n"
+        f"- 예상 형량: {bert_results['sentence']:.1f}년\n"
+        f"- 예상 벌금: {bert_results['fine']:,.0f}원\n"
+        f"- 위험도: {bert_results['risk']:.1f}/100"
+    )
+
+
+def render_feedback(feedback: Union[str, Dict[str, Any]]) -> str:
+    """구조화된 피드백(dict) → 기존과 같은 번호 목록 텍스트 (문자열이면 그대로)"""
+    if isinstance(feedback, str):
+        return feedback
+    lines = []
+    if feedback.get("notice"):
+        lines += [feedback["notice"], ""]
+    for key, (title, fields) in SECTION_TITLES.items():
+        section = feedback.get(key) or {}
+        lines.append(title)
+        for field, label in fields.items():
+            value = section.get(field)
+            if not value:
+                continue
+            if isinstance(value, list):
+                value = ", ".join(value)
+            lines.append(f"   - {label}: {value}")
+        lines.append("")
+    return "\n".join(lines).strip()
+
+
+class FeedbackConfig:
+    """structured 모드 generate_content 설정 (system instruction + JSON 스키마) / 응답 파싱
+
+    지시문이 Gemini 컨텍스트 캐시 최소 크기(1024 토큰~)보다 훨씬 작아서 캐시는 쓰지 않음
+    → 고정 부분은 system instruction 으로, 매 호출에는 user_prompt 만 보냄
+    """
+
+    def __init__(self):
+        # 호출마다 같은 설정이므로 한 번만 만들어 재사용
+        self.config = genai_types.GenerateContentConfig(
+            system_instruction=SYSTEM_INSTRUCTION,
+            response_mime_type="application/json",
+            response_schema=FEEDBACK_SCHEMA,
+        )
+
+    def parse(self, response) -> Dict[str, Any]:
+        """JSON 응답 → 섹션 dict (스키마를 벗어난 응답이면 예외 → 게이트웨이가 대체 결과 사용)"""
+        feedback = json.loads(response.text)
+        if not isinstance(feedback, dict) or not all(key in feedback for key in SECTION_TITLES):
+            raise ValueError("피드백 JSON 형식이 올바르지 않습니다.")
+        return feedback
@@ -1,13 +1,28 @@
 # legal_analyzer.py
 from google import genai
+from google.genai import types as genai_types
 import torch
 import pickle
 from transformers import AutoTokenizer
 import json
 import os
+import time
 
-from typing import Dict, Any
-from model import MultiTaskLegalBERT #내가 만든 모델 불러와
+from typing import Dict, Any, List, Optional, Union
+from model import MultiTaskLegalBERT, checkpoint_fingerprint #내가 만든 모델 불러와
+from export_model import HEAD_NAMES, ONNX_FILE, load_int8_model
+from token_cache import TokenCache
+from llm_gateway import LLMGateway
+from feedback_prompt import FeedbackConfig, render_feedback, user_prompt
+from case_type_classifier import CaseTypeClassifier
+from cascade import CascadeScheduler
+import metrics
+
+# predict_bert 를 돌릴 수 있는 백엔드 종류
+BACKENDS = ("torch", "int8", "onnx")
+FEEDBACK_MODES = ("text", "structured")
+# 소송 유형 분류기가 없을 때 case_type 자리에 넣는 값
+DEFAULT_CASE_TYPE = "법률 사건 분석"
 
 
 
@@ -16,15 +31,112 @@ from model import MultiTaskLegalBERT #내가 만든 모델 불러와
 class LegalAnalyzer:
     """법률 사건 분석 클래스 (BERT + Gemini)"""
     
-    def __init__(self, model_path: str, gemini_api_key: str):
+    def __init__(self, model_path: str, gemini_api_key: str, backend: str = "torch",
+                 chunking: bool = False, max_chunks: int = 8, chunk_stride: int = 128,
+                 chunk_aggregate: str = "heads", token_cache_size: int = 1024,
+                 feedback_mode: str = "text", fast_model_path: Optional[str] = None,
+                 return_embedding: bool = False, case_type_model_path: Optional[str] = None):
         """
         Args:
             model_path: 학습된 BERT 모델 경로
             gemini_api_key: Gemini API 키
+            backend: "torch"(기본 fp32) / "int8"(동적 양자화) / "onnx"(onnxruntime)
+                     int8, onnx 는 export_model.py 로 만든 파일이 model_path 에 있어야 함
+            chunking: 512 토큰이 넘는 사연을 윈도우로 나눠 분석할지 여부
+            max_chunks: 문서 하나당 최대 윈도우 수 (지연시간 상한)
+            chunk_stride: 윈도우끼리 겹치는 토큰 수
+            chunk_aggregate: "heads"(헤드 예측 평균) / "pooled"(pooler 출력 평균 후 헤드)
+            token_cache_size: 토큰화 결과를 기억할 사연 수 (LRU)
+            feedback_mode: "text"(기존 전체 프롬프트, 자유 텍스트) /
+                           "structured"(고정 지시문은 system instruction, JSON 섹션 응답)
+            fast_model_path: distill.py 로 만든 작은 student 모델 경로 (있으면 predict_fast 사용 가능)
+            return_embedding: 결과에 BERT pooler 벡터('embedding')를 같이 담을지
+                              (판례 검색 legal-bert 인덱스의 질의로 그대로 사용, onnx 백엔드는 지원 안 함)
+            case_type_model_path: case_type_classifier.py 로 만든 TF-IDF 분류기 경로
+                                  (있으면 결과의 case_type / case_type_confidence 를 채움)
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"지원하지 않는 backend: {backend} (가능: {BACKENDS})")
+        if chunk_aggregate not in ("heads", "pooled"):
+            raise ValueError(f"지원하지 않는 chunk_aggregate: {chunk_aggregate}")
+        if feedback_mode not in FEEDBACK_MODES:
+            raise ValueError(f"지원하지 않는 feedback_mode: {feedback_mode} (가능: {FEEDBACK_MODES})")
+        self.backend = backend
+        self.chunking = chunking
+        self.max_chunks = max_chunks
+        self.chunk_stride = chunk_stride
+        self.chunk_aggregate = chunk_aggregate
+        self.feedback_mode = feedback_mode
+        self.return_embedding = return_embedding
+
         # BERT 모델 로드
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.tokenizer = AutoTokenizer.from_pretrained("klue/bert-base")
+        if backend != "torch":
+            # 양자화/ONNX 는 CPU 서빙 전용
+            self.device = torch.device("cpu")
+        # use_fast=True: Rust 토크나이저 (배치 __call__ 이 훨씬 빠름)
+        self.tokenizer = AutoTokenizer.from_pretrained("klue/bert-base", use_fast=True)
+        self.token_cache = TokenCache(self.tokenizer, max_size=token_cache_size)
+        self.onnx_session = None
+
+        load_start = time.perf_counter()
+        if backend == "int8":
+            self.model = load_int8_model(model_path, num_labels=3)
+            print("✅ int8 양자화 모델을 로드했습니다.")
+        elif backend == "onnx":
+            import onnxruntime as ort  # onnx 백엔드를 쓸 때만 필요
+            self.model = None
+            self.onnx_session = ort.InferenceSession(
+                os.path.join(model_path, ONNX_FILE),
+                providers=["CPUExecutionProvider"])
+            print("✅ ONNX 모델을 로드했습니다.")
+        else:
+            self._load_torch_model(model_path)
+        metrics.MODEL_LOAD_SECONDS.labels(backend=backend).set(time.perf_counter() - load_start)
+        # embedding 과 같이 돌려주는 체크포인트 해시 (판례 인덱스의 encoder_fingerprint 와 비교)
+        self.embedding_fingerprint = checkpoint_fingerprint(model_path) if return_embedding else None
+
+        # 빠른 첫 예측용 student 모델 (숫자 패널만 먼저 보여줄 때)
+        self.fast_model = None
+        self.fast_report = {}
+        if fast_model_path:
+            load_start = time.perf_counter()
+            self.fast_model = MultiTaskLegalBERT.from_pretrained(fast_model_path).to(self.device)
+            self.fast_model.eval()
+            report_path = os.path.join(fast_model_path, "distill_report.json")
+            if os.path.exists(report_path):
+                with open(report_path, encoding="utf-8") as f:
+                    self.fast_report = json.load(f)
+            metrics.MODEL_LOAD_SECONDS.labels(backend="fast").set(time.perf_counter() - load_start)
+            print(f"✅ fast 모델을 로드했습니다. ({self.fast_model.config.num_hidden_layers}층)")
+
+        # 소송 유형은 BERT 분류 헤드 대신 TF-IDF 분류기로 (1건 1ms 미만)
+        self.case_type_model = None
+        if case_type_model_path:
+            self.case_type_model = CaseTypeClassifier.load(case_type_model_path)
+            print(f"✅ 소송 유형 분류기를 로드했습니다. ({self.case_type_model.labels})")
+
+        # llm 불러와 / Gemini 설정
+        # genai.configure(api_key=gemini_api_key)
+        # self.gemini_model = genai.GenerativeModel('gemini-pro')
+        # GEMINI_BASE_URL 을 주면 그 주소로 호출 (fake_llm_server.py 로 로컬 테스트)
+        base_url = os.getenv("GEMINI_BASE_URL")
+        http_options = genai_types.HttpOptions(base_url=base_url) if base_url else None
+        self.client = genai.Client(api_key=gemini_api_key, http_options=http_options)
+        self.model_name = "gemini-2.5-flash"
+        self.feedback_config = FeedbackConfig() if feedback_mode == "structured" else None
+        # 동시 호출 수 / 시간 예산 / 재시도 / 서킷 브레이커 (LLM_* 환경 변수로 조절)
+        self.llm = LLMGateway.from_env(name="legal-feedback")
+        # fast → BERT → Gemini 단계별 분석 (임계값은 LEGAL_CASCADE_* 환경 변수)
+        self.cascade = CascadeScheduler.from_env(self)
+        
+        # # 클래스 이름 로드
+        # with open(f"{model_path}/config.json", 'r') as f:
+        #     config = json.load(f)
+        #     self.class_names = config.get('class_names', ['민사/가사소송', '행정소송', '형사소송'])
+
+    def _load_torch_model(self, model_path: str):
+        """fp32 PyTorch 모델 로드 (기본 백엔드)"""
         
         #모델로드/딥러닝했던 모델 불러와 
         # 이건 자동화 실행
@@ -64,50 +176,151 @@ class LegalAnalyzer:
         
         
         self.model.eval()
-        
-        # llm 불러와 / Gemini 설정
-        # genai.configure(api_key=gemini_api_key)
-        # self.gemini_model = genai.GenerativeModel('gemini-pro')
-        self.client = genai.Client(api_key=gemini_api_key)
-        self.model_name = "gemini-2.5-flash"
-        
-        # # 클래스 이름 로드
-        # with open(f"{model_path}/config.json", 'r') as f:
-        #     config = json.load(f)
-        #     self.class_names = config.get('class_names', ['민사/가사소송', '행정소송', '형사소송'])
+
+    def _run_model(self, inputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """백엔드에 맞게 forward 실행 → 5개 헤드 출력 (torch.Tensor)"""
+        if self.onnx_session is not None:
+            feed = {k: v.cpu().numpy() for k, v in inputs.items()}
+            with metrics.stage("forward"):
+                values = self.onnx_session.run(HEAD_NAMES, feed)
+            return {name: torch.from_numpy(v) for name, v in zip(HEAD_NAMES, values)}
+
+        with metrics.stage("forward"), torch.no_grad():
+            return self.model(**inputs)
     
-    def predict_bert(self, text: str) -> Dict[str, Any]:
-        """BERT로 기본 수치 예측"""
-        inputs = self.tokenizer(
-            text, 
-            return_tensors="pt", 
-            truncation=True, 
-            padding=True, 
-            max_length=512
-        )
-        
-         # token_type_ids 제거
-        inputs = {k: v.to(self.device) for k, v in inputs.items()
-                  if k != 'token_type_ids'}
-        
-        with torch.no_grad():
-            outputs = self.model(**inputs)
+    def predict_bert(self, text: str, chunked: Optional[bool] = None) -> Dict[str, Any]:
+        """BERT로 기본 수치 예측
+
+        Args:
+            chunked: True 면 512 토큰을 넘는 사연을 슬라이딩 윈도우로 나눠 한 배치로 분석
+                     (None 이면 생성자의 chunking 설정을 따름)
+        """
+        if chunked is None:
+            chunked = self.chunking
+        if chunked:
+            return self._predict_chunked(text)
+
+        # 캐시된 토큰화 결과 사용 (token_type_ids 는 만들지 않음)
+        with metrics.stage("tokenize"):
+            inputs = self.token_cache([text], device=self.device)
         
+        outputs = self._run_model(inputs)
+        return self._add_case_type([self._format_outputs(outputs)], [text])[0]
+
+    def predict_bert_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """여러 사연을 한 번의 padded 배치로 예측 (동시 요청 묶음 처리용)"""
+        if self.chunking:
+            # 긴 문서 모드는 사연마다 윈도우 배치를 만들기 때문에 한 건씩
+            return [self._predict_chunked(text) for text in texts]
+
+        # 캐시에 없는 사연만 fast tokenizer 배치 호출 → 배치 안에서 가장 긴 길이로 패딩
+        with metrics.stage("tokenize"):
+            inputs = self.token_cache(texts, device=self.device)
+
+        outputs = self._run_model(inputs)
+        return self._add_case_type([self._format_outputs(outputs, i) for i in range(len(texts))], texts)
+
+    def predict_fast(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """student 모델로 빠른 예측 (teacher 대비 오차는 fast_report['mae'] 참고)"""
+        if self.fast_model is None:
+            raise RuntimeError("fast 모델이 없습니다. fast_model_path 를 지정하세요.")
+        with metrics.stage("tokenize"):
+            inputs = self.token_cache(texts, device=self.device)
+        with metrics.stage("forward_fast"), torch.no_grad():
+            outputs = self.fast_model(**inputs)
+        # student 벡터는 teacher 로 만든 판례 인덱스와 공간이 달라서 빼둠
+        outputs.pop('pooled', None)
+        results = [{**self._format_outputs(outputs, i), 'mode': 'fast'} for i in range(len(texts))]
+        return self._add_case_type(results, texts)
+
+    def _chunk_inputs(self, text: str) -> Dict[str, torch.Tensor]:
+        """사연을 겹치는 512 토큰 윈도우로 나누기 (최대 max_chunks 개)"""
+        encoded = self.tokenizer(
+            text,
+            return_tensors="pt",
+            truncation=True,
+            padding=True,
+            max_length=512,
+            stride=self.chunk_stride,           # 윈도우끼리 겹치는 토큰 수
+            return_overflowing_tokens=True      # 잘린 뒷부분도 윈도우로 돌려받기
+        )
+        inputs = {k: encoded[k] for k in ('input_ids', 'attention_mask')}
+
+        num_chunks = inputs['input_ids'].size(0)
+        if num_chunks > self.max_chunks:
+            # 앞부분만 쓰지 않고 문서 전체를 고르게 덮도록 균등 간격으로 선택
+            keep = torch.linspace(0, num_chunks - 1, self.max_chunks).round().long()
+            inputs = {k: v[keep] for k, v in inputs.items()}
+
+        return {k: v.to(self.device) for k, v in inputs.items()}
+
+    def _predict_chunked(self, text: str) -> Dict[str, Any]:
+        """긴 사연: 모든 윈도우를 한 번에 forward 하고 토큰 수 가중 평균으로 합치기"""
+        with metrics.stage("tokenize"):
+            inputs = self._chunk_inputs(text)
+
+        # 실제 토큰이 많은 윈도우일수록 비중을 크게 (마지막 짧은 윈도우 보정)
+        weights = inputs['attention_mask'].sum(dim=1).float()
+        weights = weights / weights.sum()
+
+        if self.chunk_aggregate == "pooled" and self.onnx_session is None:
+            # pooler 출력을 평균낸 뒤 헤드를 한 번만 통과
+            with metrics.stage("forward"), torch.no_grad():
+                pooled = self.model.bert(**inputs).pooler_output
+                pooled = (pooled * weights.unsqueeze(-1)).sum(dim=0, keepdim=True)
+                outputs = self.model.predict_heads(pooled)
+                outputs['pooled'] = pooled
+        else:
+            # 윈도우별 헤드 예측값을 평균 (onnx 는 pooled 출력이 없어서 항상 이 방식)
+            outputs = self._run_model(inputs)
+            outputs = {
+                name: (outputs[name] * weights.view(-1, *[1] * (outputs[name].dim() - 1)))
+                .sum(dim=0, keepdim=True)
+                for name in HEAD_NAMES + ['pooled'] if name in outputs
+            }
+
+        result = self._format_outputs(outputs)
+        result['num_chunks'] = inputs['input_ids'].size(0)
+        return self._add_case_type([result], [text])[0]
+
+    def classify_case_type(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """BERT 없이 소송 유형만 (라우팅 / 통계용)"""
+        if self.case_type_model is None:
+            raise RuntimeError("소송 유형 분류기가 없습니다. case_type_model_path 를 지정하세요.")
+        with metrics.stage("classify"):
+            predictions = self.case_type_model.predict(texts)
+        return [{'case_type': label, 'case_type_confidence': round(confidence, 4)}
+                for label, confidence in predictions]
+
+    def _add_case_type(self, results: List[Dict[str, Any]], texts: List[str]) -> List[Dict[str, Any]]:
+        """분류기가 있으면 결과의 case_type 을 실제 유형으로 채우기"""
+        if self.case_type_model is not None:
+            for result, case_type in zip(results, self.classify_case_type(texts)):
+                result.update(case_type)
+        return results
+
+    def _format_outputs(self, outputs: Dict[str, torch.Tensor], i: int = 0) -> Dict[str, Any]:
+        """헤드 출력(배치의 i 번째) → 화면/JSON 용 결과 (범위 보정 포함)"""
         # # 소송 유형 예측
         # logits = outputs['logits']
         # case_type_idx = logits.argmax(-1).item()
         
-        return {
-           'case_type': "법률 사건 분석", #self.class_names[case_type_idx],
-            'win_rate': max(0, min(100, outputs['win_rate'].item())),
-            'sentence': max(0, outputs['sentence'].item()),
-            'fine': max(0, outputs['fine'].item()),
-            'risk': max(0, min(100, outputs['risk'].item()))
+        result = {
+           'case_type': DEFAULT_CASE_TYPE, #self.class_names[case_type_idx] → case_type_model 로 채움
+            'win_rate': max(0, min(100, outputs['win_rate'][i].item())),
+            'sentence': max(0, outputs['sentence'][i].item()),
+            'fine': max(0, outputs['fine'][i].item()),
+            'risk': max(0, min(100, outputs['risk'][i].item()))
         }
+        if self.return_embedding and 'pooled' in outputs:
+            # 같은 forward 에서 나온 문장 벡터 → 판례 검색 질의로 재사용
+            result['embedding'] = outputs['pooled'][i].float().cpu().tolist()
+            result['embedding_model'] = self.embedding_fingerprint
+        return result
     
-    def generate_feedback(self, story: str, bert_results: Dict) -> str:
-        """Gemini로 상세 피드백 생성"""
-        prompt = f"""
+    def _feedback_prompt(self, story: str, bert_results: Dict) -> str:
+        """Gemini 피드백 요청 프롬프트"""
+        return f"""
 당신은 법률 전문가이자 승소율 높은 최고의 변호사입니다. 다음 사연을 분석하고 조언해주세요.
 
 【사연】
@@ -140,13 +353,57 @@ class LegalAnalyzer:
    - 필요성 (상/중/하)
    - 추천 전문 분야
 """
-        
-        # response = self.gemini_model.generate_content(prompt)
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=prompt
-        )
-        return response.text
+
+    def _feedback_request(self, story: str, bert_results: Dict):
+        """게이트웨이가 재시도할 때마다 새로 만드는 Gemini 비동기 요청"""
+        if self.feedback_config is not None:
+            # structured: 사연 + 예측 수치만 보내고 섹션별 JSON 으로 받음
+            async def request():
+                with metrics.stage("gemini"):
+                    response = await self.client.aio.models.generate_content(
+                        model=self.model_name,
+                        contents=user_prompt(story, bert_results),
+                        config=self.feedback_config.config
+                    )
+                    return self.feedback_config.parse(response)
+            return request
+
+        prompt = self._feedback_prompt(story, bert_results)
+
+        async def request():
+            # response = self.gemini_model.generate_content(prompt)
+            with metrics.stage("gemini"):  # 재시도마다 1번씩 기록
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt
+                )
+            return response.text
+        return request
+
+    def _simple_feedback(self, bert_results: Dict) -> Union[str, Dict[str, Any]]:
+        """Gemini 를 쓸 수 없을 때 (시간 초과/서킷 차단) BERT 수치만으로 만드는 기본 피드백"""
+        risk = bert_results['risk']
+        feedback = {
+            "notice": "⚠️ AI 전문가 피드백 서버가 응답하지 않아 기본 분석 결과만 제공합니다.",
+            "win_rate_analysis": {"basis": f"예측 승소율은 {bert_results['win_rate']:.1f}% 입니다."},
+            "strategy": {"evidence": ["관련 계약서, 문자/메신저 기록, 영수증 등 증거를 먼저 확보하세요."]},
+            "cautions": {"avoid": [f"위험도 {risk:.1f}/100 입니다. 상대방과의 직접적인 충돌은 피하세요."]},
+            "consultation": {"necessity": "상" if risk >= 70 else "중" if risk >= 40 else "하"},
+        }
+        if self.feedback_mode == "structured":
+            return feedback
+        return render_feedback(feedback)
+
+    def generate_feedback(self, story: str, bert_results: Dict) -> Union[str, Dict[str, Any]]:
+        """Gemini로 상세 피드백 생성 (동기 코드용 / 시간 예산·재시도·서킷 브레이커 적용)
+        feedback_mode="structured" 이면 섹션별 dict, 아니면 텍스트"""
+        return self.llm.call(self._feedback_request(story, bert_results),
+                             fallback=lambda: self._simple_feedback(bert_results))
+
+    async def agenerate_feedback(self, story: str, bert_results: Dict) -> Union[str, Dict[str, Any]]:
+        """Gemini로 상세 피드백 생성 (FastAPI async 라우트용)"""
+        return await self.llm.acall(self._feedback_request(story, bert_results),
+                                    fallback=lambda: self._simple_feedback(bert_results))
     
     def analyze(self, story: str) -> Dict[str, Any]:
         """통합 분석 실행"""
@@ -162,6 +419,10 @@ class LegalAnalyzer:
             'original_story': story
         }
     
+    def analyze_cascade(self, story: str, feedback: bool = False) -> Dict[str, Any]:
+        """단계별 분석: 확실한 사연은 fast 모델로, 애매한 사연만 BERT / Gemini 는 요청·고위험일 때만"""
+        return self.cascade.run(story, feedback=feedback)
+
     def print_result(self, result: Dict[str, Any]):
         """결과를 보기 좋게 출력"""
         print("\n" + "="*70)
@@ -182,5 +443,5 @@ class LegalAnalyzer:
         print("\n" + "-"*70)
         print("💡 전문가 피드백:")
         print("-"*70)
-        print(result['feedback'])
+        print(render_feedback(result['feedback']))
         print("="*70)
\ No newline at end of file
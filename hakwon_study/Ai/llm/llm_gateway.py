@@ -0,0 +1,231 @@
+# llm_gateway.py
+# LLM(Gemini) 호출 공통 관문 / 동시 호출 수 제한 + 시간 예산 + 재시도(지수 백오프, jitter) + 서킷 브레이커
+#
+# - 법률 분석(jem_api.LegalAnalyzer) 과 감정 일기(emotion.EmotionAnalyzer) 가 같이 사용
+#   (일기 앱은 복사본을 두지 않고 emotion.py 가 이 폴더를 sys.path 에 추가해서 import)
+# - 호출은 전용 이벤트 루프 스레드에서 실행 → Flask 같은 동기 코드도 call(), FastAPI 는 acall()
+# - 로컬 테스트: python fake_llm_server.py 실행 후 GEMINI_BASE_URL=http://127.0.0.1:8089
+import asyncio
+import concurrent.futures
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+
+class CircuitOpenError(Exception):
+    """연속 실패로 서킷이 열려 있어서 LLM 을 호출하지 않음"""
+
+
+# 다시 시도해도 되는 HTTP 상태 코드 (요청 한도 초과 / 서버 오류)
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    """일시적인 오류만 재시도 (API 키 오류 같은 건 바로 실패)"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_CODES
+    text = str(error).lower()
+    return any(word in text for word in ("429", "503", "unavailable", "timeout",
+                                         "deadline", "connection", "resource_exhausted"))
+
+
+class LLMGateway:
+    """LLM 호출 풀
+
+    Args:
+        max_concurrency: 동시에 나가는 LLM 요청 수 상한
+        timeout: 호출 1건의 전체 시간 예산(초, 재시도 포함)
+        max_retries: 실패 후 재시도 횟수
+        base_delay / max_delay: 지수 백오프 시작/최대 대기(초)
+        failure_threshold: 연속 실패 몇 번이면 서킷을 열지
+        reset_timeout: 서킷을 연 뒤 몇 초 후에 한 번 다시 시도해볼지
+    """
+
+    def __init__(self, name: str = "gemini", max_concurrency: int = 8, timeout: float = 30.0,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        # 서킷 브레이커 상태: closed(정상) / open(차단) / half_open(시험 호출 1건)
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state_lock = threading.Lock()
+
+        self.stats = {"calls": 0, "success": 0, "retries": 0, "failures": 0, "errors": 0,
+                      "timeouts": 0, "short_circuited": 0, "fallbacks": 0}
+
+        self._loop = None
+        self._semaphore = None
+        self._loop_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name: str = "gemini", prefix: str = "LLM_") -> "LLMGateway":
+        """환경 변수로 설정 (LLM_MAX_CONCURRENCY, LLM_TIMEOUT, LLM_MAX_RETRIES ...)"""
+        return cls(
+            name=name,
+            max_concurrency=int(os.getenv(f"{prefix}MAX_CONCURRENCY", "8")),
+            timeout=float(os.getenv(f"{prefix}TIMEOUT", "30")),
+            max_retries=int(os.getenv(f"{prefix}MAX_RETRIES", "3")),
+            failure_threshold=int(os.getenv(f"{prefix}FAILURE_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv(f"{prefix}RESET_TIMEOUT", "30")),
+        )
+
+    # ---------- 이벤트 루프 ----------
+    def _ensure_loop(self):
+        """전용 이벤트 루프 스레드를 처음 호출할 때 시작"""
+        if self._loop is not None:
+            return self._loop
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True,
+                                 name=f"llm-gateway-{self.name}").start()
+                # 세마포어는 사용할 루프 안에서 만들어야 함
+                self._semaphore = asyncio.run_coroutine_threadsafe(
+                    self._make_semaphore(), loop).result()
+                self._loop = loop
+        return self._loop
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_concurrency)
+
+    # ---------- 서킷 브레이커 ----------
+    def _allow_request(self) -> bool:
+        with self._state_lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"  # 한 건만 시험 삼아 보내봄
+                return True
+            return False
+
+    def _record_success(self):
+        with self._state_lock:
+            self._failures = 0
+            self.state = "closed"
+            self.stats["success"] += 1
+
+    def _record_failure(self):
+        with self._state_lock:
+            self._failures += 1
+            self.stats["failures"] += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"⚠️ [{self.name}] LLM 연속 실패 {self._failures}회 → {self.reset_timeout:.0f}초간 호출 차단")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def _record_error(self):
+        """재시도해도 소용없는 오류 (API 키 / 응답 파싱 등) → 서버는 응답했으므로 서킷 실패로 세지 않음"""
+        with self._state_lock:
+            self.stats["errors"] += 1
+            if self.state == "half_open":
+                self._failures = 0
+                self.state = "closed"
+
+    # ---------- 호출 ----------
+    def _backoff(self, attempt: int) -> float:
+        """지수 백오프 + full jitter (여러 요청이 동시에 재시도하며 몰리는 것 방지)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _call(self, make_request: Callable[[], Awaitable[Any]],
+                    fallback: Optional[Callable[[], Any]], timeout: Optional[float]):
+        self.stats["calls"] += 1
+        if not self._allow_request():
+            self.stats["short_circuited"] += 1
+            return self._fallback(fallback, CircuitOpenError(f"[{self.name}] 서킷 열림"))
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        last_error: Exception = asyncio.TimeoutError()
+
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                # 동시 호출 자리를 기다리는 시간도 시간 예산에 포함 (몰릴 때 무한정 대기하지 않도록)
+                result = await asyncio.wait_for(self._attempt(make_request), remaining)
+                self._record_success()
+                return result
+            except Exception as e:
+                last_error = e
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["timeouts"] += 1
+                if not is_retryable(e):
+                    break
+
+            delay = self._backoff(attempt)
+            if attempt == self.max_retries or loop.time() + delay >= deadline:
+                break
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+        if isinstance(last_error, asyncio.TimeoutError) or is_retryable(last_error):
+            self._record_failure()
+        else:
+            self._record_error()
+        return self._fallback(fallback, last_error)
+
+    async def _attempt(self, make_request: Callable[[], Awaitable[Any]]):
+        async with self._semaphore:
+            return await make_request()
+
+    def _fallback(self, fallback, error: Exception):
+        if fallback is None:
+            raise error
+        self.stats["fallbacks"] += 1
+        print(f"⚠️ [{self.name}] LLM 호출 실패 → 로컬 대체 결과 사용 ({type(error).__name__})")
+        return fallback()
+
+    def call(self, make_request: Callable[[], Awaitable[Any]],
+             fallback: Optional[Callable[[], Any]] = None, timeout: Optional[float] = None):
+        """동기 코드에서 호출 (Flask 라우트, 스레드 등)
+
+        Args:
+            make_request: 호출할 때마다 새 코루틴을 만드는 함수 (재시도마다 다시 부름)
+            fallback: 최종 실패/서킷 차단 시 대신 돌려줄 값을 만드는 함수 (없으면 예외)
+            timeout: 이번 호출만 시간 예산을 바꾸고 싶을 때
+        """
+        loop = self._ensure_loop()
+        timeout = timeout or self.timeout
+        future = asyncio.run_coroutine_threadsafe(
+            self._call(make_request, fallback, timeout), loop)
+        try:
+            # 보통은 _call 의 시간 예산이 먼저 끝남 / 루프가 막혀 있어도 호출한 스레드는 예산 + 1초 안에 돌아옴
+            return future.result(timeout=timeout + 1.0)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self.stats["timeouts"] += 1
+            return self._fallback(fallback, asyncio.TimeoutError())
+
+    async def acall(self, make_request: Callable[[], Awaitable[Any]],
+                    fallback: Optional[Callable[[], Any]] = None, timeout: Optional[float] = None):
+        """async 코드에서 호출 (FastAPI 라우트 등, 다른 이벤트 루프에서도 사용 가능)"""
+        loop = self._ensure_loop()
+        timeout = timeout or self.timeout
+        future = asyncio.run_coroutine_threadsafe(
+            self._call(make_request, fallback, timeout), loop)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout + 1.0)
+        except asyncio.TimeoutError:
+            future.cancel()
+            self.stats["timeouts"] += 1
+            return self._fallback(fallback, asyncio.TimeoutError())
+
+    def status(self) -> dict:
+        return {"name": self.name, "state": self.state,
+                "max_concurrency": self.max_concurrency, **self.stats}
@@ -1,9 +1,13 @@
 # api 연결 서비스용 / 스프링부트와 통신할 API 서버 호출하여 실행
 # app.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from pydantic import BaseModel
 import json
+import asyncio
 from jem_api import LegalAnalyzer
+from feedback_prompt import render_feedback
+from batcher import InferenceBatcher
+import metrics
 import uvicorn
 import os
 from dotenv import load_dotenv
@@ -22,8 +26,22 @@ app = FastAPI()
 try:
     analyzer = LegalAnalyzer(
         model_path="../lerning/saved_mode3", 
-        gemini_api_key=os.getenv("GEMINI_API_KEY")
+        gemini_api_key=os.getenv("GEMINI_API_KEY"),
         # 환경 변수에서 가져온 진짜 키를 전달
+        # CPU 서버에서는 LEGAL_MODEL_BACKEND=int8 또는 onnx (export_model.py 먼저 실행)
+        backend=os.getenv("LEGAL_MODEL_BACKEND", "torch"),
+        # 긴 사연(512 토큰 초과)을 윈도우로 나눠 분석 / 문서당 최대 윈도우 수
+        chunking=os.getenv("LEGAL_CHUNKING", "0") == "1",
+        max_chunks=int(os.getenv("LEGAL_MAX_CHUNKS", "8")),
+        token_cache_size=int(os.getenv("LEGAL_TOKEN_CACHE_SIZE", "1024")),
+        # structured: 고정 지시문은 system instruction 으로 분리하고 피드백을 섹션별 JSON 으로 받음
+        feedback_mode=os.getenv("LEGAL_FEEDBACK_MODE", "text"),
+        # distill.py 로 만든 작은 모델 → POST /analyze/fast (숫자 패널 먼저 표시)
+        fast_model_path=os.getenv("LEGAL_FAST_MODEL_PATH") or None,
+        # 결과에 BERT 문장 벡터(embedding) + embedding_model 포함 → 판례 검색 /analyze 에 같이 넘기면 재임베딩 없음
+        return_embedding=os.getenv("LEGAL_RETURN_EMBEDDING", "0") == "1",
+        # case_type_classifier.py 로 만든 TF-IDF 분류기 → 결과의 case_type 을 실제 유형으로
+        case_type_model_path=os.getenv("LEGAL_CASE_TYPE_MODEL") or None
     )
     print("AI 모델 로딩 성공!")
 except Exception as e:
@@ -32,20 +50,132 @@ except Exception as e:
 
 
 
+# 동시에 들어온 사연을 모아서 BERT 한 번에 처리 (배치 크기 / 최대 대기시간 조절 가능)
+batcher = InferenceBatcher(
+    lambda texts: analyzer.predict_bert_batch(texts),
+    max_batch_size=int(os.getenv("LEGAL_BATCH_SIZE", "16")),
+    max_wait_ms=float(os.getenv("LEGAL_BATCH_WAIT_MS", "10"))
+)
+
+
+# 기존 통계(dict)도 /metrics 에서 게이지로 보이게
+metrics.register_stats("legal_batcher", batcher.stats.to_dict)
+metrics.register_stats("legal_token_cache", lambda: analyzer.token_cache.stats())
+metrics.register_stats("legal_llm", lambda: analyzer.llm.status())
+metrics.register_stats("legal_cascade", lambda: analyzer.cascade.stats.to_dict())
+
+
+@app.on_event("startup")
+async def start_batcher():
+    await batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+
+
 # 2. 요청 데이터 구조 정의
 class StoryRequest(BaseModel):
     story: str
     
 # 3. 분석 API 엔드포인트
+def traced_predict(story: str):
+    """profiler 는 연산이 도는 스레드 안에서 켜야 함"""
+    with metrics.trace(True):
+        return analyzer.predict_bert(story)
+
+
 @app.post("/analyze")
-async def analyze_case(request: StoryRequest):
+async def analyze_case(request: StoryRequest, trace: bool = False):
+    """trace=true 이고 LEGAL_TRACE_DIR 가 있으면 이 요청의 BERT 연산을 profiler 트레이스로 저장"""
+    try:
+        with metrics.IN_FLIGHT.track_inprogress(), metrics.stage("request"):
+            if trace and metrics.TRACE_DIR:
+                # 트레이스는 배치 큐를 거치지 않고 이 요청 한 건만 돌림
+                bert_results = await asyncio.to_thread(traced_predict, request.story)
+            else:
+                # 사용자가 보낸 사연(story)을 배치 큐로 전달 → 자기 몫의 BERT 결과만 받음
+                bert_results = await batcher.submit(request.story)
+            # Gemini 호출은 게이트웨이 풀에서 비동기로 (동시 호출 수 제한 + 시간 예산)
+            feedback = await analyzer.agenerate_feedback(request.story, bert_results)
+            result = {
+                **bert_results,
+                'feedback': feedback,
+                'original_story': request.story
+            }
+            with metrics.stage("serialize"):
+                body = json.dumps(result, ensure_ascii=False)
+        return Response(body, media_type="application/json")  # 분석 결과(JSON)를 스프링부트에 반환
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/analyze/fast")
+async def analyze_fast(request: StoryRequest):
+    """student 모델 예측만 (Gemini 없음) / expected_error 는 teacher 대비 평균 오차"""
+    if analyzer.fast_model is None:
+        raise HTTPException(status_code=404, detail="fast 모델이 없습니다. (LEGAL_FAST_MODEL_PATH)")
     try:
-        # 사용자가 보낸 사연(story)을 분석기로 전달
-        result = analyzer.analyze(request.story)
-        return result  # 분석 결과(JSON)를 스프링부트에 반환
+        with metrics.IN_FLIGHT.track_inprogress(), metrics.stage("request_fast"):
+            result = (await asyncio.to_thread(analyzer.predict_fast, [request.story]))[0]
+        return {**result, 'expected_error': analyzer.fast_report.get('mae', {})}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.post("/analyze/cascade")
+async def analyze_cascade(request: StoryRequest, feedback: bool = False):
+    """단계별 분석 (확실한 사연은 fast 모델, 애매하면 BERT / Gemini 는 feedback=true 이거나 고위험일 때만)"""
+    try:
+        with metrics.IN_FLIGHT.track_inprogress(), metrics.stage("request_cascade"):
+            # BERT 단계는 /analyze 와 같은 배치 큐를 사용
+            result = await analyzer.cascade.arun(request.story, feedback=feedback, bert=batcher.submit)
+            with metrics.stage("serialize"):
+                body = json.dumps(result, ensure_ascii=False)
+        return Response(body, media_type="application/json")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/cascade/stats")
+async def cascade_stats():
+    """단계별 처리 건수 / 평균 시간 / 임계값"""
+    cascade = analyzer.cascade
+    return {
+        "confidence": cascade.confidence,
+        "escalate_risk": cascade.escalate_risk,
+        "feedback_risk": cascade.feedback_risk,
+        "fast_available": cascade.fast_available,
+        **cascade.stats.to_dict()
+    }
+
+
+@app.post("/classify")
+async def classify_case(request: StoryRequest):
+    """TF-IDF 분류기로 소송 유형만 (BERT / Gemini 없음)"""
+    if analyzer.case_type_model is None:
+        raise HTTPException(status_code=404, detail="소송 유형 분류기가 없습니다. (LEGAL_CASE_TYPE_MODEL)")
+    return analyzer.classify_case_type([request.story])[0]
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape 용 (단계별 지연시간 / 에러 / 동시 처리 수 / 모델 로딩 시간)"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
+@app.get("/batcher/stats")
+async def batcher_stats():
+    """배치 크기 분포 / 큐 대기시간(ms) 확인용"""
+    return {
+        "max_batch_size": batcher.max_batch_size,
+        "max_wait_ms": batcher.max_wait * 1000,
+        **batcher.stats.to_dict(),
+        "token_cache": analyzer.token_cache.stats(),
+        "llm": analyzer.llm.status()
+    }
+
 print("\n💾 테스트 결과가 'test_input_result.json'에 저장되었습니다.") 
 
 
@@ -92,7 +222,7 @@ def main():
     print(result['sentence'])     # 형량
     print(result['fine'])         # 벌금
     print(result['risk'])         # 위험도
-    print(result['feedback'])     # Gemini 피드백
+    print(render_feedback(result['feedback']))     # Gemini 피드백
 
 if __name__ == "__main__":
      #이거는 터미널에서 내가 입력해서 테스트 할때
@@ -101,5 +231,6 @@ if __name__ == "__main__":
         
     # 서버 실행: 8000번 포트에서 대기 / 이건 스프링부트하고 연결할때 쓰는거야
     # '서버'에서 띄우는거야
+    # 운영 서버(리눅스, CPU 여러 개)에서는 python serve.py → 모델 1번 로딩 후 worker 여러 개
     uvicorn.run(app, host="0.0.0.0", port=8000)
        
\ No newline at end of file
@@ -0,0 +1,111 @@
+# metrics.py
+# 단계별 지연시간 / 에러 / 동시 처리 수 (Prometheus 형식) + 요청 1건 torch profiler 트레이스
+#
+# - 단계(stage): tokenize / forward / gemini / serialize  (+ 요청 전체 request)
+# - GET /metrics 로 노출 (llm/main.py, 통합 main.py)
+# - serve.py 처럼 worker 여러 개면 PROMETHEUS_MULTIPROC_DIR 를 지정해야 worker 합계가 나옴
+#   (register_stats 게이지는 프로세스 안의 값이라 합치지 않고 scrape 에 응답한 worker 값을 pid 라벨로)
+# - LEGAL_TRACE_DIR 를 지정하면 ?trace=1 요청의 BERT 연산을 크롬 트레이스(json)로 저장
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, List
+
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+# 빠른 단계(토큰화 ~ms)부터 Gemini 호출(~수십 초)까지 한 번에 보도록 넓게 잡음
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram("legal_stage_seconds", "분석 단계별 소요 시간(초)",
+                          ["stage"], buckets=LATENCY_BUCKETS)
+ERRORS = Counter("legal_errors_total", "단계별 / 예외 종류별 에러 수", ["stage", "type"])
+IN_FLIGHT = Gauge("legal_requests_in_flight", "처리 중인 분석 요청 수",
+                  multiprocess_mode="livesum")
+MODEL_LOAD_SECONDS = Gauge("legal_model_load_seconds", "BERT 모델 로딩 시간(초)",
+                           ["backend"], multiprocess_mode="max")
+
+TRACE_DIR = os.getenv("LEGAL_TRACE_DIR")
+
+
+@contextmanager
+def stage(name: str):
+    """with stage("forward"): ...  → 소요 시간 기록, 예외가 나면 종류별로 세고 그대로 올림"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ERRORS.labels(stage=name, type=type(e).__name__).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage=name).observe(time.perf_counter() - start)
+
+
+def record_error(stage_name: str, error: Exception):
+    """예외를 삼키는 곳(대체 결과 사용 등)에서 에러만 세기"""
+    ERRORS.labels(stage=stage_name, type=type(error).__name__).inc()
+
+
+def trace(enabled: bool, name: str = "analyze"):
+    """요청 1건의 torch profiler 트레이스 (LEGAL_TRACE_DIR 가 없거나 enabled=False 면 아무것도 안 함)"""
+    if not (enabled and TRACE_DIR):
+        return nullcontext()
+    return _profile(name)
+
+
+@contextmanager
+def _profile(name: str):
+    from torch.profiler import ProfilerActivity, profile  # 트레이스할 때만
+
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as prof:
+        yield
+    path = os.path.join(TRACE_DIR, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.json")
+    prof.export_chrome_trace(path)
+    print(f"🧭 profiler 트레이스 저장: {path} (chrome://tracing 에서 열기)")
+
+
+class StatsCollector:
+    """기존 stats() dict (배치, 토큰 캐시, LLM 게이트웨이) 의 숫자 값을 scrape 할 때 게이지로 노출"""
+
+    def __init__(self, prefix: str, read: Callable[[], Dict[str, Any]]):
+        self.prefix = prefix
+        self.read = read
+
+    def collect(self):
+        try:
+            values = self.read()
+        except Exception:
+            return
+        # worker 여러 개면 어느 worker 의 값인지 pid 라벨로 구분
+        labels = {"pid": str(os.getpid())} if os.getenv("PROMETHEUS_MULTIPROC_DIR") else {}
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            gauge = GaugeMetricFamily(f"{self.prefix}_{key}", f"{self.prefix} {key}", labels=list(labels))
+            gauge.add_metric(list(labels.values()), value)
+            yield gauge
+
+
+# render() 가 multiprocess 용 registry 를 새로 만들 때도 같이 등록
+_stats_collectors: List[StatsCollector] = []
+
+
+def register_stats(prefix: str, read: Callable[[], Dict[str, Any]]):
+    """예) register_stats("legal_token_cache", analyzer.token_cache.stats)"""
+    collector = StatsCollector(prefix, read)
+    _stats_collectors.append(collector)
+    REGISTRY.register(collector)
+
+
+def render() -> bytes:
+    """/metrics 응답 본문 (worker 여러 개면 PROMETHEUS_MULTIPROC_DIR 의 값을 합쳐서)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _stats_collectors:
+            registry.register(collector)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
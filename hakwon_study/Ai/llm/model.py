@@ -1,11 +1,33 @@
 # models.py
+import hashlib
+import os
+
 import torch.nn as nn
-from transformers import BertModel
+from transformers import BertConfig, BertModel
+
+
+def checkpoint_fingerprint(model_path, length=16):
+    """pytorch_model.bin 의 sha256 앞부분 (파일이 없으면 None)
+    ai_db/app/vector_index.py 에 같은 함수가 있음 (패키지끼리 import 하지 않음)
+    → 바꿀 때는 둘 다 바꾸고 tests/test_checkpoint_fingerprint.py 로 같은 값인지 확인"""
+    model_file = os.path.join(model_path, "pytorch_model.bin")
+    if not os.path.exists(model_file):
+        return None
+    digest = hashlib.sha256()
+    with open(model_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
 
 class MultiTaskLegalBERT(nn.Module):
-    def __init__(self, model_name, num_labels):
+    def __init__(self, model_name, num_labels, config=None):
         super().__init__()
-        self.bert = BertModel.from_pretrained(model_name)
+        # config 를 주면 사전학습 가중치 없이 그 크기로 생성 (distill.py 의 작은 student 모델)
+        if config is not None:
+            self.bert = BertModel(config)
+        else:
+            self.bert = BertModel.from_pretrained(model_name)
         self.config = self.bert.config
         hidden_size = self.bert.config.hidden_size
         
@@ -29,11 +51,12 @@ class MultiTaskLegalBERT(nn.Module):
         pooled_output = outputs.pooler_output
         
         # 각 수치 예측
-        pred_win = self.win_rate_head(pooled_output).squeeze(-1)
-        pred_sent = self.sentence_head(pooled_output).squeeze(-1)
-        pred_fine = self.fine_head(pooled_output).squeeze(-1)
-        pred_risk = self.risk_head(pooled_output).squeeze(-1)
-        logits = self.classifier(pooled_output)
+        heads = self.predict_heads(pooled_output)
+        pred_win = heads["win_rate"]
+        pred_sent = heads["sentence"]
+        pred_fine = heads["fine"]
+        pred_risk = heads["risk"]
+        logits = heads["logits"]
         
         loss = None
         if win_rate is not None:
@@ -52,7 +75,19 @@ class MultiTaskLegalBERT(nn.Module):
             "sentence": pred_sent, 
             "fine": pred_fine, 
             "risk": pred_risk, 
-            "logits": logits
+            "logits": logits,
+            # 판례 유사도 검색 질의로 다시 쓰는 문장 벡터 (ai_db legal-bert 인덱스)
+            "pooled": pooled_output
+        }
+    
+    def predict_heads(self, pooled_output):
+        """pooler 출력 → 5개 헤드 값 (긴 문서 청크 평균 등 pooled 를 직접 다룰 때 사용)"""
+        return {
+            "win_rate": self.win_rate_head(pooled_output).squeeze(-1),
+            "sentence": self.sentence_head(pooled_output).squeeze(-1),
+            "fine": self.fine_head(pooled_output).squeeze(-1),
+            "risk": self.risk_head(pooled_output).squeeze(-1),
+            "logits": self.classifier(pooled_output)
         }
     
     def save_pretrained(self, save_path):
@@ -72,8 +107,12 @@ class MultiTaskLegalBERT(nn.Module):
         """저장된 모델 불러오기"""
         import torch
         
-        # 모델 초기화
-        model = cls("klue/bert-base", num_labels=num_labels)
+        # 모델 초기화 (student 처럼 config.json 의 레이어 수가 다르면 그 크기로)
+        import os
+        config = None
+        if os.path.exists(f"{model_path}/config.json"):
+            config = BertConfig.from_pretrained(model_path)
+        model = cls("klue/bert-base", num_labels=num_labels, config=config)
         
         # 가중치 로드
         # state_dict = torch.load(f"{model_path}/pytorch_model.bin", 
@@ -0,0 +1,93 @@
+# serve.py
+# 운영 서버 실행용 / 모델을 한 번만 로딩한 뒤 worker 여러 개로 fork (리눅스 전용)
+#
+# 실행 예시
+# LEGAL_WORKERS=4 python serve.py
+#   - master 가 main.py 를 import → LegalAnalyzer(BERT) 로딩 1번
+#   - worker 들은 fork 로 가중치 메모리를 공유 (worker 수만큼 RAM 이 늘지 않음)
+#   - worker 마다 torch 스레드 수 = CPU 코어 / worker 수 (코어 과점유 방지)
+import gc
+import os
+import shutil
+import tempfile
+
+import torch
+from gunicorn.app.base import BaseApplication
+
+CPU_COUNT = os.cpu_count() or 1
+WORKERS = int(os.getenv("LEGAL_WORKERS", str(min(4, CPU_COUNT))))
+THREADS_PER_WORKER = int(os.getenv("LEGAL_TORCH_THREADS", str(max(1, CPU_COUNT // WORKERS))))
+BIND = os.getenv("LEGAL_BIND", "0.0.0.0:8000")
+
+
+def post_fork(server, worker):
+    """fork 직후 worker 안에서 실행 / 스레드 수를 worker 몫으로 제한"""
+    torch.set_num_threads(THREADS_PER_WORKER)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # master 에서 이미 병렬 연산이 시작됐으면 바꿀 수 없음 (intra-op 만 적용)
+        pass
+    server.log.info(f"worker {worker.pid}: torch 스레드 {THREADS_PER_WORKER}개")
+
+
+def child_exit(server, worker):
+    """죽은 worker 의 지표 파일 정리 (in-flight 게이지가 남지 않게)"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def prepare_metrics_dir():
+    """worker 여러 개의 /metrics 를 합치려면 prometheus_client import 전에 공유 폴더 지정"""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), "legal_prometheus")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    # 이전 실행의 값이 섞이지 않게 비우고 시작
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+class LegalServer(BaseApplication):
+    """gunicorn 을 코드에서 띄우기 (preload_app 으로 master 가 모델을 먼저 로딩)"""
+
+    def __init__(self, app, options=None):
+        self.application = app
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def main():
+    prepare_metrics_dir()
+    from main import app, analyzer  # 여기서 BERT 로딩 (master 에서 1번)
+
+    if analyzer.device.type == "cuda":
+        raise RuntimeError("CUDA 는 fork 후 공유가 안 됩니다. GPU 서버는 python main.py 로 실행하세요.")
+
+    if analyzer.model is not None:
+        # 가중치를 공유 메모리로 옮겨서 worker 들이 같은 물리 메모리를 봄
+        analyzer.model.share_memory()
+    # 지금까지 만든 객체를 GC 대상에서 빼서, GC 가 객체 헤더를 건드려 생기는 copy-on-write 방지
+    gc.freeze()
+
+    print(f"🚀 worker {WORKERS}개 × torch 스레드 {THREADS_PER_WORKER}개 (CPU {CPU_COUNT}개) → {BIND}")
+    LegalServer(app, {
+        "bind": BIND,
+        "workers": WORKERS,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "post_fork": post_fork,
+        "child_exit": child_exit,
+        "timeout": 120,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 import streamlit as st
 import json
 from jem_api import LegalAnalyzer
+from feedback_prompt import SECTION_TITLES, render_feedback
 import time
 
 
@@ -262,10 +263,28 @@ with tab2:
         
         # Gemini 피드백
         st.subheader("💡 AI 전문가 피드백")
-        st.markdown(
-            f'<div class="feedback-box">{result["feedback"]}</div>',
-            unsafe_allow_html=True
-        )
+        if isinstance(result["feedback"], dict):
+            # structured 모드: 섹션별로 바로 그림
+            feedback = result["feedback"]
+            if feedback.get("notice"):
+                st.warning(feedback["notice"])
+            for key, (title, fields) in SECTION_TITLES.items():
+                section = feedback.get(key) or {}
+                with st.expander(title, expanded=True):
+                    for field, label in fields.items():
+                        value = section.get(field)
+                        if not value:
+                            continue
+                        if isinstance(value, list):
+                            st.markdown(f"**{label}**")
+                            st.markdown("\n".join(f"- {item}" for item in value))
+                        else:
+                            st.markdown(f"**{label}**: {value}")
+        else:
+            st.markdown(
+                f'<div class="feedback-box">{result["feedback"]}</div>',
+                unsafe_allow_html=True
+            )
         
         st.markdown("---")
         
@@ -297,7 +316,7 @@ with tab2:
 - 위험도: {result['risk']:.1f}/100
 
 ## 💡 전문가 피드백
-{result['feedback']}
+{render_feedback(result['feedback'])}
 """
             st.download_button(
                 label="📄 텍스트 리포트 다운로드",
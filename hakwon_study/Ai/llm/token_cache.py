@@ -0,0 +1,81 @@
+# token_cache.py
+# 토큰화 캐시 / 같은 사연(재시도, 화면 새로고침, 예시 버튼)은 다시 토큰화하지 않음
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+import torch
+
+
+class TokenCache:
+    """사연 해시 → input_ids 를 저장하는 LRU 캐시 + fast tokenizer 배치 토큰화"""
+
+    def __init__(self, tokenizer, max_size: int = 1024, max_length: int = 512):
+        if not getattr(tokenizer, "is_fast", False):
+            print("⚠️ Rust fast tokenizer 가 아닙니다. tokenizers 패키지를 설치하세요.")
+        self.tokenizer = tokenizer
+        self.max_size = max_size
+        self.max_length = max_length
+        self._cache: "OrderedDict[bytes, torch.Tensor]" = OrderedDict()
+        # 배치 처리가 여러 스레드에서 동시에 부를 수 있음
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha1(text.encode("utf-8")).digest()
+
+    def encode(self, texts: List[str]) -> List[torch.Tensor]:
+        """사연 목록 → 사연별 input_ids (1차원, 패딩 없음)"""
+        keys = [self._key(text) for text in texts]
+        found: Dict[bytes, torch.Tensor] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[key] = self._cache[key]
+            self.hits += sum(1 for key in keys if key in found)
+
+        # 캐시에 없는 사연만 모아서 한 번의 배치 __call__ 로 토큰화
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            encoded = self.tokenizer(list(missing.values()), truncation=True,
+                                     max_length=self.max_length,
+                                     return_token_type_ids=False,
+                                     return_attention_mask=False)["input_ids"]
+            with self._lock:
+                self.misses += len(missing)
+                for key, ids in zip(missing, encoded):
+                    found[key] = torch.tensor(ids, dtype=torch.long)
+                    self._cache[key] = found[key]
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+
+        return [found[key] for key in keys]
+
+    def __call__(self, texts: List[str], device=None) -> Dict[str, torch.Tensor]:
+        """사연 목록 → 배치 안에서 가장 긴 길이로 패딩된 input_ids / attention_mask"""
+        ids = self.encode(texts)
+        input_ids = torch.nn.utils.rnn.pad_sequence(
+            ids, batch_first=True, padding_value=self.tokenizer.pad_token_id)
+        lengths = torch.tensor([len(x) for x in ids])
+        attention_mask = (torch.arange(input_ids.size(1)).unsqueeze(0)
+                          < lengths.unsqueeze(1)).long()
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if device is not None:
+            inputs = {k: v.to(device) for k, v in inputs.items()}
+        return inputs
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -1,11 +1,20 @@
 # 통합main / 레이지로딩 기능
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import importlib
+import os
+import threading
+import time
+from typing import List, Optional
+
+import psutil
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
 from pydantic import BaseModel
 
-from ai_hj.llm import main as hj_main
-from ai_db.app import main as db_main
+# 무거운 모델 모듈은 여기서 import 하지 않음 → 탭을 처음 누를 때 로딩
+# LEGAL_AI_WARMUP=hj,db 처럼 지정하면 서버 시작 직후 백그라운드에서 미리 로딩
 
 
 app = FastAPI(title="Legal_AI API")
@@ -20,27 +29,139 @@ app.add_middleware(
 )
 
 # 각 모듈 필요할 때 import
-hj_module = None
-db_module = None
+# 이름 -> 로딩 상태 (모듈 객체, 로딩 시간, 메모리 증가량)
+MODULES = {
+    "hj": {"path": "ai_hj.llm.main", "label": "sj_LLM 모듈"},
+    "db": {"path": "ai_db.app.main", "label": "판례 검색 모듈"},
+}
+for _slot in MODULES.values():
+    _slot.update(module=None, lock=threading.Lock(), status="not_loaded",
+                 load_seconds=None, rss_delta_mb=None, error=None)
+
+_process = psutil.Process(os.getpid())
+
+# /metrics (Prometheus) / 모듈이 로딩되면 그 모듈의 지표(legal_stage_seconds 등)도 같이 노출됨
+REQUEST_SECONDS = Histogram("gateway_request_seconds", "라우트별 응답 시간(초)", ["route"],
+                            buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+REQUEST_ERRORS = Counter("gateway_errors_total", "라우트별 / 상태 코드별 에러 수", ["route", "status"])
+IN_FLIGHT = Gauge("gateway_requests_in_flight", "처리 중인 요청 수")
+MODULE_LOAD_SECONDS = Gauge("gateway_module_load_seconds", "모듈 import 시간(초)", ["module"])
+
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    if request.url.path == "/metrics":
+        return await call_next(request)
+    start = time.perf_counter()
+    with IN_FLIGHT.track_inprogress():
+        response = await call_next(request)
+    # /case/{case_id}/... 처럼 경로 변수가 있으면 라우트 템플릿으로 묶음
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    REQUEST_SECONDS.labels(route=route).observe(time.perf_counter() - start)
+    if response.status_code >= 400:
+        REQUEST_ERRORS.labels(route=route, status=str(response.status_code)).inc()
+    return response
+
+
+def load_module(name: str):
+    """모듈을 처음 필요할 때 한 번만 import (동시에 첫 요청이 와도 lock 으로 한 번만 로딩)"""
+    slot = MODULES[name]
+    if slot["module"] is not None:
+        return slot["module"]
+
+    with slot["lock"]:
+        # lock 을 기다리는 동안 다른 요청이 이미 로딩을 끝냈을 수 있음
+        if slot["module"] is not None:
+            return slot["module"]
+
+        print(f"🔄 {slot['label']} 로딩 중.")
+        slot["status"] = "loading"
+        rss_before = _process.memory_info().rss
+        start = time.perf_counter()
+        try:
+            module = importlib.import_module(slot["path"])
+        except Exception as e:
+            slot["status"] = "failed"
+            slot["error"] = str(e)
+            print(f"❌ {slot['label']} 로딩 실패: {e}")
+            raise
+
+        slot["load_seconds"] = round(time.perf_counter() - start, 2)
+        MODULE_LOAD_SECONDS.labels(module=name).set(slot["load_seconds"])
+        # 다른 모듈이 동시에 로딩 중이면 그 증가분도 섞일 수 있음 (대략적인 값)
+        slot["rss_delta_mb"] = round((_process.memory_info().rss - rss_before) / 1024 ** 2, 1)
+        slot["status"] = "loaded"
+        slot["error"] = None
+        slot["module"] = module
+        print(f"✅ {slot['label']} 로딩 완료! ({slot['load_seconds']}초, +{slot['rss_delta_mb']}MB)")
+        return module
+
+
+async def get_module(name: str):
+    """import 는 오래 걸리므로 스레드에서 실행 (로딩 중에도 다른 탭 요청은 처리)"""
+    return await asyncio.to_thread(load_module, name)
+
+
+async def get_hj_module():
+    """승소율/형량 분석 모듈 - 첫 호출시에만 import"""
+    return await get_module("hj")
 
 
-def get_hj_module():
-    """승소율/형량 분석 모듈 - 첫 호출시에만 import"""
-    global hj_module
-    if hj_module is None:
-        print("sj_LLM 모듈 로딩 중.")
-        hj_module = hj_main
-        print("sj_LLM 모듈 로딩 완료")
-    return hj_module
-
-def get_db_module():
+async def get_db_module():
     """판례 검색 모듈 - 첫 호출시에만 import"""
-    global db_module
-    if db_module is None:
-        print("🔄 판례 검색 모듈 로딩 중.")
-        db_module = db_main
-        print("✅ 판례 검색 모듈 로딩 완료!")
-    return db_module
+    return await get_module("db")
+
+
+def _warmup(names):
+    for name in names:
+        try:
+            load_module(name)
+        except Exception:
+            pass  # 실패 내용은 /modules 에서 확인
+
+
+def start_warmup(names) -> list:
+    """백그라운드 스레드에서 미리 로딩 (서버 시작/요청 처리는 막지 않음)"""
+    names = [n for n in names if n in MODULES and MODULES[n]["module"] is None]
+    if names:
+        threading.Thread(target=_warmup, args=(names,), daemon=True,
+                         name="warmup").start()
+    return names
+
+
+@app.on_event("startup")
+async def warmup_on_startup():
+    names = [n.strip() for n in os.getenv("LEGAL_AI_WARMUP", "").split(",") if n.strip()]
+    if names:
+        print(f"🔥 워밍업 시작: {start_warmup(names)}")
+
+
+@app.post("/warmup")
+async def warmup(modules: str = "hj,db"):
+    """예) POST /warmup?modules=hj  → 즉시 응답하고 뒤에서 로딩"""
+    names = [n.strip() for n in modules.split(",") if n.strip()]
+    unknown = [n for n in names if n not in MODULES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"알 수 없는 모듈: {unknown}")
+    return {"started": start_warmup(names)}
+
+
+@app.get("/modules")
+async def module_status():
+    """모듈별 로딩 상태 / 로딩 시간 / 메모리 증가량"""
+    return {
+        "rss_mb": round(_process.memory_info().rss / 1024 ** 2, 1),
+        "modules": {
+            name: {k: slot[k] for k in ("path", "status", "load_seconds", "rss_delta_mb", "error")}
+            for name, slot in MODULES.items()
+        },
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape 용"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 # Request 스키마
@@ -49,6 +170,10 @@ class AnalyzeRequest(BaseModel):
 
 class CaseRequest(BaseModel):
     case_text: str
+    # 승소율 분석 결과의 embedding (LEGAL_RETURN_EMBEDDING=1) / 있으면 판례 검색에서 재임베딩 생략
+    embedding: Optional[List[float]] = None
+    # 같은 결과의 embedding_model (가중치 해시) / 판례 인덱스와 같은 체크포인트일 때만 embedding 재사용
+    embedding_model: Optional[str] = None
 
 
 # 승소율 탭 - 클릭시 llm/main.py 로딩
@@ -56,7 +181,7 @@ class CaseRequest(BaseModel):
 async def analyze_win_rate(request: AnalyzeRequest):
     """승소율 탭 클릭 → 여기서 처음 llm/main.py import"""
     try:
-        llm = get_hj_module()  # 여기서 처음 import!
+        llm = await get_hj_module()  # 여기서 처음 import!
         return await llm.analyze_win_rate(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -67,7 +192,7 @@ async def analyze_win_rate(request: AnalyzeRequest):
 async def analyze_sentence(request: AnalyzeRequest):
     """형량 탭 클릭 → llm/main.py 재사용"""
     try:
-        llm = get_hj_module()  # 이미 import 됐으면 재사용
+        llm = await get_hj_module()  # 이미 import 됐으면 재사용
         return await llm.analyze_sentence(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -78,15 +203,24 @@ async def analyze_sentence(request: AnalyzeRequest):
 async def analyze_case(request: CaseRequest):
     """판례 검색 탭 클릭 → 여기서 처음 app/main.py import"""
     try:
-        case = get_db_module()  # 여기서 처음 import!
+        case = await get_db_module()  # 여기서 처음 import!
         return await case.analyze(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/search/stats")
+async def search_stats():
+    """판례 검색 지연시간 p50/p95 / 목표 p95 / 한 쪽 검색을 버린 비율"""
+    try:
+        case = await get_db_module()
+        return await case.search_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/case/{case_id}/summary")
 async def case_summary(case_id: str):
     try:
-        case = get_db_module()
+        case = await get_db_module()
         return await case.case_summary(case_id)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -94,7 +228,7 @@ async def case_summary(case_id: str):
 @app.get("/case/{case_id}/full")
 async def case_full(case_id: str):
     try:
-        case = get_db_module()
+        case = await get_db_module()
         return await case.case_full(case_id)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -104,6 +238,6 @@ if __name__ == "__main__":
     print("="*50)
     print("⚖️  법률 AI 통합 서버 시작")
     print("📍 http://0.0.0.0:8000")
-    print("💡 Lazy Loading: 탭 클릭시 모듈 로딩")
+    print("💡 Lazy Loading: 탭 클릭시 모듈 로딩 (미리 로딩: LEGAL_AI_WARMUP=hj,db)")
     print("="*50)
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
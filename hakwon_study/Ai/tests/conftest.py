@@ -0,0 +1,8 @@
+# 테스트 공통 설정 / llm, lerning 모듈은 폴더 안에서 바로 import 하는 구조라 sys.path 에 추가
+import os
+import sys
+
+AI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (AI_DIR, os.path.join(AI_DIR, "llm"), os.path.join(AI_DIR, "lerning")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
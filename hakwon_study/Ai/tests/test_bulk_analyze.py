@@ -0,0 +1,94 @@
+# bulk_analyze.py 체크포인트 / 이어하기 테스트 (BERT / Gemini 대신 가짜 analyzer)
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("google.genai")
+
+import bulk_analyze  # noqa: E402
+
+
+class FakeAnalyzer:
+    """predict_bert_batch 만 흉내 / fail_on 번째 호출에서 예외 (중간에 멈춘 상황)"""
+
+    def __init__(self, fail_on=None):
+        self.calls = 0
+        self.fail_on = fail_on
+
+    def predict_bert_batch(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("중단")
+        return [{"win_rate": float(len(text))} for text in texts]
+
+
+def make_args(tmp_path, batch_size=3):
+    return SimpleNamespace(input=str(tmp_path / "in.jsonl"), output=str(tmp_path / "out.jsonl"),
+                           text_field="story", id_field="id", batch_size=batch_size, no_feedback=True)
+
+
+def write_input(tmp_path, n=10):
+    # id 필드가 없으므로 결과 id 는 입력 순서(offset) 로 채워짐
+    with open(tmp_path / "in.jsonl", "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"story": "사연" * (i + 1)}, ensure_ascii=False) + "\n")
+
+
+def read_ids(args):
+    with open(args.output, encoding="utf-8") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+def run(analyzer, args):
+    job = bulk_analyze.BulkJob(analyzer, args)
+    asyncio.run(job.run())
+    return job
+
+
+def test_full_run_writes_every_record(tmp_path):
+    write_input(tmp_path)
+    args = make_args(tmp_path)
+    job = run(FakeAnalyzer(), args)
+    assert read_ids(args) == list(range(10))
+    assert job.checkpoint.offset == 10
+
+
+def test_resume_after_interruption(tmp_path):
+    write_input(tmp_path)
+    args = make_args(tmp_path)
+    with pytest.raises(RuntimeError):
+        run(FakeAnalyzer(fail_on=3), args)
+    # 첫 배치만 커밋됨 → 출력에 체크포인트 뒤의 쓰다 만 줄을 붙여도 잘라내고 이어서 처리
+    assert bulk_analyze.Checkpoint(args.output).offset == 3
+    with open(args.output, "ab") as f:
+        f.write(b'{"id": 99, "broken')
+
+    run(FakeAnalyzer(), args)
+    assert read_ids(args) == list(range(10))
+
+
+def test_missing_output_restarts_from_zero(tmp_path, capsys):
+    write_input(tmp_path)
+    args = make_args(tmp_path)
+    with pytest.raises(RuntimeError):
+        run(FakeAnalyzer(fail_on=3), args)
+    (tmp_path / "out.jsonl").unlink()
+
+    run(FakeAnalyzer(), args)
+    assert read_ids(args) == list(range(10))
+    assert "출력 파일이 없어서 처음부터" in capsys.readouterr().out
+
+
+def test_truncated_output_fails(tmp_path):
+    write_input(tmp_path)
+    args = make_args(tmp_path)
+    with pytest.raises(RuntimeError):
+        run(FakeAnalyzer(fail_on=3), args)
+    with open(args.output, "r+b") as f:
+        f.truncate(5)
+
+    with pytest.raises(RuntimeError, match="체크포인트"):
+        run(FakeAnalyzer(), args)
@@ -0,0 +1,33 @@
+# llm/model.py 와 ai_db/app/vector_index.py 의 checkpoint_fingerprint 가 같은 값을 내는지
+# (패키지끼리 서로 import 하지 않아서 함수가 두 곳에 있음 → 한쪽만 바뀌면 embedding 재사용이 조용히 꺼짐)
+import os
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("faiss")
+
+import model  # noqa: E402
+from ai_db.app import vector_index  # noqa: E402
+
+
+@pytest.mark.parametrize("size", [0, 10, (1 << 20) + 7])
+def test_fingerprints_match(tmp_path, size):
+    with open(tmp_path / "pytorch_model.bin", "wb") as f:
+        f.write(os.urandom(size))
+    expected = model.checkpoint_fingerprint(str(tmp_path))
+    assert expected is not None
+    assert vector_index.checkpoint_fingerprint(str(tmp_path)) == expected
+
+
+def test_missing_checkpoint(tmp_path):
+    assert model.checkpoint_fingerprint(str(tmp_path)) is None
+    assert vector_index.checkpoint_fingerprint(str(tmp_path)) is None
+
+
+def test_fingerprint_changes_with_weights(tmp_path):
+    path = tmp_path / "pytorch_model.bin"
+    path.write_bytes(b"a")
+    first = vector_index.checkpoint_fingerprint(str(tmp_path))
+    path.write_bytes(b"b")
+    assert vector_index.checkpoint_fingerprint(str(tmp_path)) != first
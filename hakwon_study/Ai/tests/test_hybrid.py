@@ -0,0 +1,121 @@
+# ai_db/app/hybrid.py RRF 합치기 / 시간 예산 초과 시 degraded 처리 / 지연시간 통계 테스트
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from ai_db.app.hybrid import HybridSearch, rrf_fuse  # noqa: E402
+
+
+def test_rrf_prefers_rows_found_by_both():
+    bm25 = [(1, 12.0), (2, 8.0), (3, 1.0)]
+    vector = [(3, 0.9), (4, 0.8)]
+    fused = rrf_fuse([bm25, vector], k=60)
+    # 2 와 4 는 둘 다 2등 → 점수가 같음
+    assert [row for row, _ in fused][:2] == [3, 1]
+    assert set(row for row, _ in fused[2:]) == {2, 4}
+    scores = dict(fused)
+    assert scores[3] == pytest.approx(1 / 63 + 1 / 61)
+    assert scores[1] == pytest.approx(1 / 61)
+
+
+def test_rrf_ignores_raw_scores():
+    # 점수 스케일이 달라도 순위만 사용
+    assert rrf_fuse([[(7, 1e9), (8, 1e-9)]]) == rrf_fuse([[(7, 0.2), (8, 0.1)]])
+
+
+def test_rrf_empty():
+    assert rrf_fuse([]) == []
+    assert rrf_fuse([[], []]) == []
+
+
+class FakeStore:
+    def get(self, row):
+        return {"case_id": f"c{row}", "body": "본문"}
+
+
+class FakeIndex:
+    encoder_name = "fake"
+    encoder_fingerprint = None
+    dim = 2
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def search(self, query, top_k):
+        time.sleep(self.delay)
+        return [(1, 0.9), (2, 0.5)]
+
+
+class FakeBM25:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def search(self, text, top_k):
+        time.sleep(self.delay)
+        return [(2, 3.0), (3, 1.0)]
+
+
+class FakeEncoder:
+    def encode(self, texts):
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+
+def make_engine(bm25_delay=0.0, vector_delay=0.0, target_ms=100):
+    # 인덱스 파일 없이 검색 흐름만 확인 (__init__ 대신 필요한 속성만 채움)
+    engine = HybridSearch.__new__(HybridSearch)
+    engine.store, engine.encoder = FakeStore(), FakeEncoder()
+    engine.index, engine.bm25 = FakeIndex(vector_delay), FakeBM25(bm25_delay)
+    engine.p95_target_ms = target_ms
+    engine._pool = ThreadPoolExecutor(max_workers=4)
+    engine._latencies = deque(maxlen=1000)
+    engine._lock = threading.Lock()
+    engine.degraded = engine.abandoned = 0
+    return engine
+
+
+def test_search_fuses_both_sources():
+    engine = make_engine()
+    result = engine.search("사연", top_k=3)
+    assert result["sources"] == ["bm25", "vector"]
+    assert not result["degraded"]
+    assert result["results"][0]["case_id"] == "c2"  # 양쪽에 다 있는 행
+    stats = engine.latency_stats()
+    assert stats["count"] == 1 and stats["degraded"] == 0
+
+
+def test_slow_source_is_dropped_and_counted():
+    engine = make_engine(bm25_delay=0.5, target_ms=50)
+    result = engine.search("사연", top_k=3)
+    assert result["sources"] == ["vector"]
+    assert result["degraded"]
+    stats = engine.latency_stats()
+    assert stats["degraded"] == 1 and stats["degraded_rate"] == 1.0
+    assert stats["abandoned_running"] == 1
+    time.sleep(0.6)
+    assert engine.latency_stats()["abandoned_running"] == 0
+
+
+def test_search_stats_metrics():
+    pytest.importorskip("prometheus_client")
+    from prometheus_client import generate_latest
+
+    from ai_db.app import main
+    engine = make_engine()
+    engine.search("사연")
+    main._engine = engine
+    try:
+        text = generate_latest().decode()
+        assert "precedent_search_p95_ms" in text
+        assert "precedent_search_target_p95_ms 100.0" in text
+    finally:
+        main._engine = None
+
+
+def test_empty_stats():
+    assert make_engine().latency_stats() == {"count": 0}
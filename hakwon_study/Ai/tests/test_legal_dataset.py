@@ -0,0 +1,20 @@
+# legal_dataset.py 정답 컬럼 확인 테스트
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("torch")
+
+import legal_dataset  # noqa: E402
+
+
+def make_df(**drop):
+    data = {"text": ["사연"], "case_type": ["형사"], "win_rate": [50.0],
+            "sentence_years": [1.0], "fine_amount": [0.0], "risk_score": [30.0]}
+    return pd.DataFrame({k: v for k, v in data.items() if k not in drop})
+
+
+def test_missing_target_column_is_named(tmp_path):
+    with pytest.raises(ValueError, match="sentence_years"):
+        legal_dataset.build_dataset(make_df(sentence_years=True), str(tmp_path / "out"), tokenizer=None)
+    # 토큰화/파일 생성 전에 실패
+    assert not (tmp_path / "out").exists()
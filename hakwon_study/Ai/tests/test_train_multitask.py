@@ -0,0 +1,82 @@
+# train_multitask.py gradient 누적 업데이트 횟수 / gradient checkpointing 호환 테스트
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+import train_multitask  # noqa: E402
+
+
+class TinyModel(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.weight = torch.nn.Parameter(torch.ones(2))
+
+    def forward(self, input_ids, attention_mask, **_):
+        return {"loss": (self.weight * input_ids.float()).sum()}
+
+
+class CountingSGD(torch.optim.SGD):
+    def __init__(self, params):
+        super().__init__(params, lr=0.1)
+        self.updates = 0
+
+    def step(self, closure=None):
+        self.updates += 1
+        return super().step(closure)
+
+
+class ListLoader(list):
+    batch_size = 1
+
+
+def make_loader(n):
+    return ListLoader({"input_ids": torch.ones(1, 2), "attention_mask": torch.ones(1, 2)}
+                      for _ in range(n))
+
+
+@pytest.mark.parametrize("batches, grad_accum, max_steps, expected", [
+    (8, 4, None, 2),   # 누적이 딱 맞음
+    (10, 4, None, 3),  # epoch 끝에 남은 2개도 한 번 반영
+    (10, 4, 6, 2),     # max_steps 가 누적 중간 → 남은 gradient 한 번만 반영
+    (10, 3, 6, 2),     # max_steps 가 누적 경계 → 뒤에 추가 step 없음
+    (5, 1, None, 5),
+])
+def test_optimizer_step_count(batches, grad_accum, max_steps, expected):
+    model = TinyModel()
+    optimizer = CountingSGD(model.parameters())
+    report = train_multitask.train_epoch(model, make_loader(batches), optimizer, "cpu",
+                                         max_steps=max_steps, grad_accum=grad_accum)
+    assert optimizer.updates == expected
+    assert report["updates"] == expected
+    assert report["steps"] == (max_steps or batches)
+
+
+class OldBert:
+    """transformers 4.30 처럼 인자 없는 gradient_checkpointing_enable"""
+
+    def __init__(self):
+        self.enabled = False
+
+    def gradient_checkpointing_enable(self):
+        self.enabled = True
+
+
+class NewBert:
+    def __init__(self):
+        self.kwargs = None
+
+    def gradient_checkpointing_enable(self, gradient_checkpointing_kwargs=None):
+        self.kwargs = gradient_checkpointing_kwargs
+
+
+def test_grad_checkpointing_without_kwargs_support():
+    bert = OldBert()
+    train_multitask.enable_grad_checkpointing(bert)
+    assert bert.enabled
+
+
+def test_grad_checkpointing_with_kwargs_support():
+    bert = NewBert()
+    train_multitask.enable_grad_checkpointing(bert)
+    assert bert.kwargs == {"use_reentrant": False}
@@ -7,12 +7,14 @@ print("실행 중인 파일:", __file__)
 print("Python 실행 파일:", sys.executable)
 print("=" * 50)
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import json
-from db import get_connection
+from db import get_connection, get_pool, fetch_one
 from emotion import EmotionAnalyzer
+from emotion_queue import EmotionQueue
+from migrations import migrate
 import atexit
 
 # 어떤 파일들이 로드되었는지 확인
@@ -21,30 +23,45 @@ print(f"EmotionAnalyzer 모듈 위치: {EmotionAnalyzer.__module__}")
 
 app = Flask(__name__)   # Flask 앱 초기화
 app.secret_key = 'your-secret-key-change-this-in-production'  # 세션을 위한 시크릿 키
-# atexit.register(get_connection.close)
+# 종료할 때 풀에서 쉬고 있는 DB 연결 닫기 (get_connection 으로 빌린 연결은 conn.close() 로 반납)
+atexit.register(lambda: get_pool().close_all())
 
-# 사용자 테이블 생성 함수
-def init_users_table():
-    """users 테이블이 없으면 생성"""
-    conn = get_connection()
-    cur = conn.cursor()
+# 테이블 생성 / 컬럼 추가 / 유니크 키는 migrations.py 에서 앱 시작 시 한 번만
+def init_schema():
+    """아직 적용 안 된 migration 실행 (users, diaries, analysis 컬럼, (user_id, diary_date) 유니크 키)"""
     try:
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
+        migrate()
     except Exception as e:
+        # 스키마가 덜 바뀐 상태로 요청을 받지 않도록 시작을 멈춤
         print(f"테이블 생성 오류: {e}")
-    finally:
-        conn.close()
+        raise
 
 # 앱 시작 시 테이블 초기화
-init_users_table()
+init_schema()
+
+# 감정 분석은 저장 후 백그라운드 worker 가 처리 (큐는 SQLite 파일이라 재시작해도 이어서 처리)
+emotion_queue = EmotionQueue.from_env()
+
+
+@app.before_request
+def start_emotion_workers():
+    """worker 스레드는 요청을 받는 프로세스에서 시작 (gunicorn --preload 면 import 는 master 에서만 실행됨)"""
+    emotion_queue.start()
+
+
+def parse_analysis(text):
+    """analysis JSON 문자열 → dict (실패하면 None)"""
+    if not text:
+        return None
+    try:
+        parsed = json.loads(text)
+        # 기존 형식(psychologicalState 등)과 새 형식(summary) 호환
+        if 'summary' not in parsed and 'psychologicalState' in parsed:
+            # 기존 형식을 새 형식으로 변환
+            parsed['summary'] = parsed.get('advice', parsed.get('psychologicalState', '분석 결과'))
+        return parsed
+    except:
+        return None
 
 # 메인 화면 - 로그인/회원가입 선택
 @app.route("/")
@@ -144,7 +161,7 @@ def diary_list():
     cur = conn.cursor()
     try:
         cur.execute("""
-            SELECT id, content, emotion, emotion_score, diary_date, analysis
+            SELECT id, content, emotion, emotion_score, diary_date, analysis, analysis_status
             FROM diaries 
             WHERE user_id = %s 
             ORDER BY diary_date DESC
@@ -153,16 +170,7 @@ def diary_list():
         
         # analysis JSON 문자열을 파싱
         for diary in diaries:
-            if diary.get('analysis'):
-                try:
-                    parsed = json.loads(diary['analysis'])
-                    # 기존 형식(psychologicalState 등)과 새 형식(summary) 호환
-                    if 'summary' not in parsed and 'psychologicalState' in parsed:
-                        # 기존 형식을 새 형식으로 변환
-                        parsed['summary'] = parsed.get('advice', parsed.get('psychologicalState', '분석 결과'))
-                    diary['analysis'] = parsed
-                except:
-                    diary['analysis'] = None
+            diary['analysis'] = parse_analysis(diary.get('analysis'))
     except Exception as e:
         print(f"일기 목록 조회 오류: {e}")
         diaries = []
@@ -171,7 +179,7 @@ def diary_list():
     
     return render_template("diary_list.html", diaries=diaries, user={'username': session.get('username')})
 
-# 일기 작성 및 AI 분석
+# 일기 작성 → 바로 저장 / AI 분석은 백그라운드 작업
 @app.route("/diary", methods=["GET", "POST"])
 def diary():   
     # 로그인 체크
@@ -188,110 +196,28 @@ def diary():
             flash("날짜와 내용을 모두 입력해주세요.")
             return render_template("diary.html", user={'username': session.get('username')}, today=datetime.now().strftime('%Y-%m-%d'))
 
-        # 🔹 AI 분석 로직 호출
-        analysis_result = None
-        emotion = "보통"
-        
-        try:
-            print("AI 분석 시작...")
-            analyzer = EmotionAnalyzer(content)
-            analysis_result = analyzer.analyze()
-            print(f"AI 분석 결과: {analysis_result}")
-            
-            # 감정 분류 (Happy, Neutral, Sad, Angry -> 한국어로 변환)
-            mood = analysis_result.get("mood", "Neutral").strip() if analysis_result else "Neutral"
-            mood_lower = mood.lower()
-            
-            if mood_lower == "happy":
-                emotion = "행복"
-            elif mood_lower == "sad":
-                emotion = "우울"
-            elif mood_lower == "angry":
-                emotion = "분노"
-            else:  # Neutral 또는 기타
-                emotion = "보통"
-            
-            print(f"분류된 감정: {emotion} (원본: {mood})")
-            
-        except Exception as ai_error:
-            print(f"AI 분석 오류: {ai_error}")
-            import traceback
-            traceback.print_exc()
-            # AI 분석 실패 시 기본값 사용
-            analysis_result = {
-                "mood": "Neutral",
-                "summary": "분석 중 오류가 발생했습니다."
-            }
-            emotion = "보통"
-            flash("AI 분석 중 오류가 발생했지만 일기는 저장되었습니다.")
-
-        # 🔹 DB 저장 (분석 결과도 함께 저장)
+        # 🔹 DB 저장 (분석 결과는 worker 가 나중에 채움 → 요청 시간 = DB 시간)
         conn = get_connection()
         cur = conn.cursor()
-        has_analysis = False
         try:
-            # diaries 테이블에 analysis 컬럼이 있는지 확인하고 없으면 추가
-            try:
-                cur.execute("SHOW COLUMNS FROM diaries LIKE 'analysis'")
-                has_analysis = cur.fetchone() is not None
-                if not has_analysis:
-                    cur.execute("ALTER TABLE diaries ADD COLUMN analysis TEXT")
-                    conn.commit()
-                    has_analysis = True
-            except Exception as col_error:
-                print(f"컬럼 확인/추가 오류: {col_error}")
-                # 컬럼 추가 실패해도 계속 진행 (analysis 없이 저장)
-            
-            # 분석 결과를 JSON 문자열로 저장 (analysis_result가 None이 아닐 때만)
-            analysis_json = None
-            if analysis_result:
-                try:
-                    analysis_json = json.dumps(analysis_result, ensure_ascii=False)
-                except Exception as json_error:
-                    print(f"JSON 변환 오류: {json_error}")
-                    analysis_json = None
-            
-            score_map = {"행복": 3, "보통": 2, "우울": 1, "분노": 0}
-            
-            # 같은 날짜의 일기가 있는지 확인 (UNIQUE 제약 처리)
-            cur.execute("SELECT id FROM diaries WHERE user_id = %s AND diary_date = %s", 
-                       (user_id, diary_date))
-            existing = cur.fetchone()
-            
-            if existing:
-                # 기존 일기 업데이트
-                if has_analysis and analysis_json:
-                    sql = """
-                    UPDATE diaries 
-                    SET content = %s, emotion = %s, emotion_score = %s, analysis = %s
-                    WHERE id = %s
-                    """
-                    cur.execute(sql, (content, emotion, score_map[emotion], analysis_json, existing['id']))
-                else:
-                    sql = """
-                    UPDATE diaries 
-                    SET content = %s, emotion = %s, emotion_score = %s
-                    WHERE id = %s
-                    """
-                    cur.execute(sql, (content, emotion, score_map[emotion], existing['id']))
+            # 같은 날짜 일기가 있으면 내용만 바꾸고 다시 분석 대기 (uq_diaries_user_date 유니크 키 / 왕복 1번)
+            # 새 일기의 감정은 분석이 끝날 때까지 '보통' / id = LAST_INSERT_ID(id): 업데이트여도 lastrowid 가 그 일기 id
+            sql = """
+            INSERT INTO diaries (user_id, content, emotion, emotion_score, diary_date, analysis_status)
+            VALUES (%s, %s, '보통', 2, %s, 'pending')
+            ON DUPLICATE KEY UPDATE
+                id = LAST_INSERT_ID(id),
+                content = VALUES(content),
+                analysis_status = 'pending'
+            """
+            affected = cur.execute(sql, (user_id, content, diary_date))
+            diary_id = cur.lastrowid
+            # 영향받은 행 수: 새로 삽입 1 / 기존 행 업데이트 2 / 같은 내용으로 덮어씀 0
+            if affected != 1:
                 flash("해당 날짜의 일기가 이미 존재하여 업데이트되었습니다.")
-            else:
-                # 새 일기 삽입
-                if has_analysis and analysis_json:
-                    sql = """
-                    INSERT INTO diaries (user_id, content, emotion, emotion_score, diary_date, analysis)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    """
-                    cur.execute(sql, (user_id, content, emotion, score_map[emotion], diary_date, analysis_json))
-                else:
-                    sql = """
-                    INSERT INTO diaries (user_id, content, emotion, emotion_score, diary_date)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """
-                    cur.execute(sql, (user_id, content, emotion, score_map[emotion], diary_date))
             
             conn.commit()
-            print(f"일기 저장 성공: user_id={user_id}, date={diary_date}, emotion={emotion}")
+            print(f"일기 저장 성공: user_id={user_id}, date={diary_date}, diary_id={diary_id}")
         except Exception as e:
             print(f"일기 저장 오류: {e}")
             import traceback
@@ -305,26 +231,67 @@ def diary():
         finally:
             conn.close()
 
-        # 분석 결과 페이지로 이동
-        # analysis_result가 None이면 기본값 사용
-        if not analysis_result:
-            analysis_result = {
-                "psychologicalState": "분석 결과를 불러올 수 없습니다.",
-                "mood": emotion,
-                "reason": "일기는 저장되었지만 분석 결과를 표시할 수 없습니다.",
-                "advice": "일기는 정상적으로 저장되었습니다."
-            }
-        
-        return render_template("result.html", 
-                             emotion=emotion,
-                             analysis=analysis_result,
-                             diary_date=diary_date,
-                             user={'username': session.get('username')})
+        # 🔹 AI 분석 작업 등록 (commit 된 뒤에)
+        try:
+            emotion_queue.enqueue(diary_id)
+        except Exception as queue_error:
+            print(f"분석 작업 등록 오류: {queue_error}")
+            flash("AI 분석 요청 중 오류가 발생했지만 일기는 저장되었습니다.")
+
+        # 새로고침해도 다시 저장되지 않도록 결과 페이지로 이동
+        return redirect(url_for("diary_result", diary_id=diary_id))
 
     # 오늘 날짜를 기본값으로 설정
     today = datetime.now().strftime('%Y-%m-%d')
     return render_template("diary.html", user={'username': session.get('username')}, today=today)
 
+
+def find_diary(diary_id):
+    """로그인한 사용자의 일기 1개 (다른 사람 일기는 None)"""
+    return fetch_one("""
+        SELECT id, emotion, diary_date, analysis, analysis_status
+        FROM diaries WHERE id = %s AND user_id = %s
+    """, (diary_id, session['user_id']))
+
+
+# 분석 결과 페이지 (분석 중이면 result.html 이 상태를 주기적으로 확인)
+@app.route("/diary/<int:diary_id>/result")
+def diary_result(diary_id):
+    if 'user_id' not in session:
+        flash("로그인이 필요합니다.")
+        return redirect(url_for("login"))
+
+    row = find_diary(diary_id)
+    if row is None:
+        flash("일기를 찾을 수 없습니다.")
+        return redirect(url_for("diary_list"))
+
+    return render_template("result.html",
+                         diary_id=diary_id,
+                         status=row['analysis_status'],
+                         emotion=row['emotion'],
+                         analysis=parse_analysis(row['analysis']),
+                         diary_date=row['diary_date'],
+                         user={'username': session.get('username')})
+
+
+# 분석 상태 확인 (result.html / diary_list.html 에서 호출)
+@app.route("/diary/<int:diary_id>/status")
+def diary_status(diary_id):
+    if 'user_id' not in session:
+        return jsonify({"error": "login required"}), 401
+
+    row = find_diary(diary_id)
+    if row is None:
+        return jsonify({"error": "not found"}), 404
+
+    analysis = parse_analysis(row['analysis']) or {}
+    return jsonify({
+        "status": row['analysis_status'],
+        "emotion": row['emotion'],
+        "summary": analysis.get('summary'),
+    })
+
 if __name__ == "__main__":
     app.run(debug=True)
 
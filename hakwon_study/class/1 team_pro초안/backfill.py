@@ -0,0 +1,350 @@
+# backfill.py
+# 예전 일기 감정 일괄 재분석 / analysis 컬럼이 생기기 전에 쓴 일기, 오류 요약으로 저장된 일기를 다시 분석
+#
+# 실행 예시
+# python backfill.py --dry-run                  → 대상 일기 수만 출력
+# python backfill.py                            → 일기 10개씩 프롬프트 1개로 묶어서 Gemini 분석 후 DB 업데이트
+# python backfill.py --pack-size 20 --concurrency 4 --rpm 30 --include-pending
+#   - 대상: analysis 가 NULL / 요약이 "...오류가 발생했습니다..." / 키워드 분석 결과("source": "keyword")
+#     / analysis_status='failed' (--include-pending: 큐 파일이 없어져 pending 으로 멈춘 일기도 포함)
+#   - id 순서로 page-size 개씩 읽고, 한 페이지 결과는 UPDATE 1번으로 저장 → 체크포인트(last_id) 갱신
+#   - 중간에 멈춰도 같은 명령으로 다시 실행하면 체크포인트 다음 id 부터 이어서 처리 (--restart: 처음부터)
+#   - 분당 요청 수(--rpm)를 넘지 않게 간격을 두고, 429 를 받으면 모든 요청을 잠시 멈춘 뒤 재시도
+#     (기다리는 시간은 게이트웨이 밖에서 → 요청 1번의 시간 예산 / 동시 호출 자리를 차지하지 않음)
+#   - 묶음 응답이 깨지거나 빠진 일기는 반으로 나눠서 다시 요청
+#   - 끝까지 실패한 일기가 있으면 체크포인트는 그 앞까지만 → 다시 실행하면 그 일기부터 다시 시도
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import db
+# emotion 을 먼저 import (Ai/llm 폴더를 sys.path 에 추가)
+from emotion import EMOTION_SCORES, api_key, model_registry, mood_to_emotion
+from llm_gateway import CircuitOpenError, LLMGateway, is_retryable
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emotion_backfill.ckpt.json")
+
+# EmotionAnalyzer 가 오류일 때 저장하던 요약 ("분석 중 오류가 발생했습니다", "네트워크 연결 오류가 발생했습니다" ...)
+ERROR_SUMMARY = "오류가 발생했습니다"
+# Gemini 대신 키워드 분석으로 저장된 결과 (EmotionAnalyzer._simple_analysis, json.dumps 기본 구분자)
+KEYWORD_SOURCE = '"source": "keyword"'
+
+# 묶음 응답 형식 (JSON 배열, 입력한 id 그대로)
+RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "integer"},
+            "mood": {"type": "string", "enum": ["Happy", "Neutral", "Sad", "Angry"]},
+            "summary": {"type": "string"},
+        },
+        "required": ["id", "mood", "summary"],
+    },
+}
+
+
+class Checkpoint:
+    """실패 없이 처리가 끝난 마지막 diary id + 누적 업데이트 건수 + 아직 남은 실패 건수 저장"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.last_id = 0
+        self.updated = 0
+        self.failed = 0
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.last_id = data["last_id"]
+            self.updated = data.get("updated", 0)
+            self.failed = data.get("failed", 0)
+
+    def commit(self, last_id: int, updated: int, failed: int):
+        """failed 는 이번 실행에서 실패해 체크포인트 뒤에 남은 일기 수 (다음 실행에서 다시 시도하므로 누적하지 않음)"""
+        # 임시 파일에 쓰고 교체 → 저장 도중 멈춰도 체크포인트가 깨지지 않음
+        self.last_id = last_id
+        self.updated += updated
+        self.failed = failed
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"last_id": self.last_id, "updated": self.updated, "failed": self.failed,
+                       "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")}, f)
+        os.replace(tmp, self.path)
+
+
+class RatePacer:
+    """분당 요청 수 제한 + 429 를 받으면 모든 요청을 cooldown 초 동안 멈춤"""
+
+    def __init__(self, rpm: float, cooldown: float = 30.0):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self.cooldown = cooldown
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def reserve(self) -> float:
+        """다음 요청을 보내도 되는 시각까지 남은 시간(초)"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + self.interval
+            return start - now
+
+    def throttle(self):
+        with self._lock:
+            self.throttled += 1
+            self._next_at = max(self._next_at, time.monotonic() + self.cooldown)
+        print(f"⏸️ 요청 한도 초과(429) → {self.cooldown:.0f}초 쉬고 다시 요청합니다.")
+
+
+def is_rate_limited(error: Exception) -> bool:
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    text = str(error).lower()
+    return code == 429 or "429" in text or "resource_exhausted" in text or "quota" in text
+
+
+def _target_filter(include_pending: bool):
+    """재분석 대상 WHERE 조건 + 파라미터"""
+    statuses = ["failed", "pending"] if include_pending else ["failed"]
+    sql = f"""(analysis IS NULL OR analysis LIKE %s OR analysis LIKE %s
+               OR analysis_status IN ({', '.join(['%s'] * len(statuses))}))"""
+    return sql, (f"%{ERROR_SUMMARY}%", f"%{KEYWORD_SOURCE}%", *statuses)
+
+
+def select_page(after_id: int, limit: int, include_pending: bool) -> List[Dict]:
+    """다시 분석할 일기 (id 순서, after_id 다음부터)"""
+    where, params = _target_filter(include_pending)
+    return db.fetch_all(f"""
+        SELECT id, content FROM diaries
+        WHERE id > %s AND {where}
+        ORDER BY id
+        LIMIT %s
+    """, (after_id, *params, limit))
+
+
+def count_targets(include_pending: bool, after_id: int = 0) -> int:
+    where, params = _target_filter(include_pending)
+    row = db.fetch_one(f"""
+        SELECT COUNT(*) AS n FROM diaries
+        WHERE id > %s AND {where}
+    """, (after_id, *params))
+    return row['n']
+
+
+def build_prompt(entries: List[Dict], max_chars: int) -> str:
+    # EmotionAnalyzer.analyze 와 같은 지시문 + 여러 일기를 id 와 함께 나열
+    diaries = json.dumps([{"id": e['id'], "entry": (e['content'] or "")[:max_chars]} for e in entries],
+                         ensure_ascii=False)
+    return f"""Analyze the emotional tone of each diary entry below. Categorize each into exactly one of these categories: Happy, Neutral, Sad, Angry. Also provide a very short, supportive one-sentence summary of the mood in Korean.
+
+Entries (JSON): {diaries}
+
+Respond with a JSON array only, one object per entry, using the same id:
+[{{"id": 1, "mood": "Happy|Neutral|Sad|Angry", "summary": "한 줄 요약"}}]"""
+
+
+def parse_results(text: str) -> Dict[int, Dict]:
+    """JSON 배열 응답 → {id: {"mood", "summary"}}"""
+    text = text.strip()
+    start_idx = text.find("[")
+    end_idx = text.rfind("]")
+    if start_idx != -1 and end_idx > start_idx:
+        text = text[start_idx:end_idx + 1]
+    results = {}
+    for item in json.loads(text):
+        # 문자열 같은 객체가 아닌 항목은 건너뜀 (해당 일기만 빠진 것으로 보고 다시 요청)
+        if not isinstance(item, dict):
+            continue
+        try:
+            results[int(item["id"])] = {"mood": item.get("mood") or "Neutral",
+                                        "summary": item.get("summary") or "분석 결과를 가져올 수 없습니다."}
+        except (KeyError, TypeError, ValueError):
+            continue
+    return results
+
+
+class Backfill:
+    def __init__(self, model, gateway: LLMGateway, pacer: RatePacer, args):
+        self.model = model
+        self.gateway = gateway
+        self.pacer = pacer
+        self.args = args
+        self.checkpoint = Checkpoint(args.checkpoint)
+        self.stats = {"requests": 0, "retries": 0, "splits": 0}
+
+    def _request(self, prompt: str):
+        """게이트웨이로 보내는 요청 1번 (pacer 대기는 _call 에서 게이트웨이 밖에서)"""
+        async def request():
+            self.stats["requests"] += 1
+            try:
+                response = await asyncio.to_thread(
+                    self.model.generate_content, prompt,
+                    generation_config={"response_mime_type": "application/json",
+                                       "response_schema": RESPONSE_SCHEMA},
+                    request_options={"timeout": self.gateway.timeout})
+            except Exception as e:
+                if is_rate_limited(e):
+                    self.pacer.throttle()
+                raise
+            return response.text
+        return request
+
+    def _call(self, prompt: str) -> str:
+        """pacer 간격(429 cooldown 포함)만큼 기다린 뒤 게이트웨이 호출 / 일시적인 오류는 다시 기다렸다가 재시도
+        게이트웨이는 재시도 없이 1번만 보냄 → 기다리는 시간이 시간 예산과 동시 호출 자리를 쓰지 않음"""
+        for attempt in range(self.args.retries + 1):
+            time.sleep(self.pacer.reserve())
+            try:
+                return self.gateway.call(self._request(prompt))
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if attempt == self.args.retries or not is_retryable(e):
+                    raise
+                self.stats["retries"] += 1
+
+    def classify(self, entries: List[Dict]) -> Dict[int, Dict]:
+        """묶음 1개 분석 / 실패하거나 빠진 일기는 반으로 나눠서 다시 요청"""
+        try:
+            text = self._call(build_prompt(entries, self.args.max_chars))
+            results = parse_results(text)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"⚠️ 일기 {len(entries)}개 묶음 분석 실패: {type(e).__name__}: {str(e)[:100]}")
+            results = {}
+
+        wanted = {e['id'] for e in entries}
+        results = {i: r for i, r in results.items() if i in wanted}
+        missing = [e for e in entries if e['id'] not in results]
+        if missing and len(entries) > 1:
+            self.stats["splits"] += 1
+            half = max(1, len(missing) // 2) if len(missing) == len(entries) else len(missing)
+            for part in (missing[:half], missing[half:]):
+                if part:
+                    results.update(self.classify(part))
+        return results
+
+    def save(self, entries: List[Dict], results: Dict[int, Dict]) -> int:
+        """한 페이지 결과를 UPDATE 1번으로 저장 (분석하는 동안 내용이 바뀐 일기는 건너뜀)"""
+        rows = [e for e in entries if e['id'] in results]
+        if not rows:
+            return 0
+        emotion_case, score_case, analysis_case, crc_case = [], [], [], []
+        for e in rows:
+            result = results[e['id']]
+            emotion = mood_to_emotion(result["mood"])
+            emotion_case += [e['id'], emotion]
+            score_case += [e['id'], EMOTION_SCORES[emotion]]
+            analysis_case += [e['id'], json.dumps(result, ensure_ascii=False)]
+            # 읽어온 내용의 CRC32 가 그대로일 때만 (그 사이 다시 저장한 일기는 작업 큐가 새로 분석)
+            crc_case += [e['id'], zlib.crc32((e['content'] or "").encode("utf-8"))]
+        when = " ".join(["WHEN %s THEN %s"] * len(rows))
+        ids = [e['id'] for e in rows]
+        return db.execute(f"""
+            UPDATE diaries
+            SET emotion = CASE id {when} END,
+                emotion_score = CASE id {when} END,
+                analysis = CASE id {when} END,
+                analysis_status = 'done'
+            WHERE id IN ({', '.join(['%s'] * len(ids))})
+              AND CRC32(content) = CASE id {when} END
+        """, (*emotion_case, *score_case, *analysis_case, *ids, *crc_case))
+
+    def run(self):
+        args = self.args
+        if self.checkpoint.last_id:
+            print(f"🔄 체크포인트 id {self.checkpoint.last_id} 다음부터 이어서 처리합니다.")
+        total = count_targets(args.include_pending, self.checkpoint.last_id)
+        print(f"📚 재분석 대상 {total}건 (묶음 {args.pack_size}개 / 동시 {args.concurrency} / 분당 {args.rpm}회)")
+
+        done = 0
+        failed = 0
+        # 이번 실행에서 읽어갈 위치 (체크포인트는 실패한 일기가 있으면 그 앞에 멈춰 있음)
+        cursor = self.checkpoint.last_id
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            while args.limit is None or done < args.limit:
+                page_size = args.page_size if args.limit is None else min(args.page_size, args.limit - done)
+                entries = select_page(cursor, page_size, args.include_pending)
+                if not entries:
+                    break
+                packs = [entries[i:i + args.pack_size] for i in range(0, len(entries), args.pack_size)]
+                results = {}
+                try:
+                    for pack_results in pool.map(self.classify, packs):
+                        results.update(pack_results)
+                except CircuitOpenError:
+                    # 이 페이지는 체크포인트를 갱신하지 않음 → 다시 실행하면 이 페이지부터
+                    print("❌ Gemini 호출이 계속 실패해서 중단합니다. 잠시 후 같은 명령으로 다시 실행하세요.")
+                    break
+                updated = self.save(entries, results)
+                page_failed = [e['id'] for e in entries if e['id'] not in results]
+                failed += len(page_failed)
+                # 체크포인트는 처음 실패한 일기 앞까지만 (그 뒤에 성공한 일기는 대상 조건에서 빠지므로 다시 읽지 않음)
+                last_id = self.checkpoint.last_id
+                if failed == len(page_failed):
+                    last_id = page_failed[0] - 1 if page_failed else entries[-1]['id']
+                self.checkpoint.commit(last_id, updated, failed)
+                cursor = entries[-1]['id']
+                done += len(entries)
+                print(f"✅ id {entries[0]['id']}~{entries[-1]['id']}: 업데이트 {updated}건 / 실패 {len(page_failed)}건 "
+                      f"({done}/{total}, {time.time() - start:.0f}초)")
+
+        print(f"🏁 이번 실행 {done}건 / 누적 업데이트 {self.checkpoint.updated}건, 실패 {failed}건 "
+              f"/ Gemini 요청 {self.stats['requests']}회 (재시도 {self.stats['retries']}회, "
+              f"나눠서 재요청 {self.stats['splits']}회, 429 {self.pacer.throttled}회)")
+        if failed:
+            print(f"   실패한 일기는 체크포인트(id {self.checkpoint.last_id}) 뒤에 남아 있으니 "
+                  f"같은 명령으로 다시 실행하면 다시 시도합니다.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="예전 일기 감정 일괄 재분석 (묶음 요청 / 이어하기 지원)")
+    parser.add_argument("--page-size", type=int, default=200, help="DB 에서 한 번에 읽고 저장할 일기 수")
+    parser.add_argument("--pack-size", type=int, default=10, help="Gemini 요청 1번에 넣을 일기 수")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시에 보내는 Gemini 요청 수")
+    parser.add_argument("--rpm", type=float, default=30, help="분당 최대 Gemini 요청 수 (0: 제한 없음)")
+    parser.add_argument("--cooldown", type=float, default=30, help="429 를 받았을 때 쉬는 시간(초)")
+    parser.add_argument("--timeout", type=float, default=120, help="Gemini 요청 1번의 시간 예산(초)")
+    parser.add_argument("--retries", type=int, default=5, help="일시적인 오류(429 / 5xx / 시간 초과) 재시도 횟수")
+    parser.add_argument("--max-chars", type=int, default=2000, help="일기 1개에서 보낼 최대 글자 수")
+    parser.add_argument("--limit", type=int, default=None, help="이번 실행에서 처리할 최대 일기 수")
+    parser.add_argument("--include-pending", action="store_true",
+                        help="analysis_status='pending' 으로 멈춘 일기도 포함 (작업 큐가 돌고 있을 때는 사용하지 않기)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="체크포인트를 무시하고 처음부터")
+    parser.add_argument("--dry-run", action="store_true", help="대상 일기 수만 출력")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    if args.dry_run:
+        print(f"📚 재분석 대상 {count_targets(args.include_pending)}건")
+        return
+
+    model = model_registry.get()
+    if not api_key or model is None:
+        # 키워드 분석으로 덮어쓰지 않음 (Gemini 로 분석할 수 있을 때 다시 실행)
+        raise SystemExit("❌ Gemini API 키가 없어서 재분석할 수 없습니다. (.env 의 GEMINI_API_KEY)")
+
+    # 앱의 llm_gateway 와 같은 관문 / 재시도와 대기는 Backfill._call 에서 pacer 로 (게이트웨이는 1번만 보냄)
+    # 429 는 동시 요청이 한꺼번에 받는 경우가 많아서 서킷은 넉넉하게
+    gateway = LLMGateway(name="emotion_backfill", max_concurrency=args.concurrency,
+                         timeout=args.timeout, max_retries=0,
+                         failure_threshold=max(5, 2 * args.concurrency), reset_timeout=args.cooldown)
+    pacer = RatePacer(args.rpm, cooldown=args.cooldown)
+    try:
+        Backfill(model, gateway, pacer, args).run()
+    finally:
+        db.get_pool().close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,263 @@
+# db.py
+# MariaDB 연결 풀 / 요청마다 새로 연결(TCP + 인증)하지 않고 열어둔 연결을 빌려 쓰고 돌려줌
+#
+# - get_connection() 은 예전처럼 연결을 돌려주고, conn.close() 를 부르면 끊지 않고 풀로 반납
+# - 설정은 .env 의 DB_* 환경 변수 (없으면 docker-compose 의 mariadb 기본값)
+#   DB_POOL_SIZE: 항상 열어둘 연결 수 / DB_POOL_MAX_OVERFLOW: 바쁠 때 잠깐 더 여는 연결 수
+#   DB_POOL_RECYCLE: 이 시간(초)보다 오래된 연결은 새로 연결 (MariaDB wait_timeout 보다 짧게)
+#   DB_POOL_PING_INTERVAL: 이 시간(초) 이상 쉬었던 연결은 빌려줄 때 ping 으로 살아있는지 확인
+# - gunicorn worker 프로세스마다 풀 1개, 그 안의 스레드들이 같이 사용
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
 import pymysql
 from pymysql import Error
-import os
+from pymysql.constants import SERVER_STATUS
 from dotenv import load_dotenv
 
 # .env 파일에 정의된 환경 변수를 로드
 load_dotenv()
 
-def __init__(self):
-        self.connection = None
+
+def connect_kwargs() -> dict:
+    """pymysql.connect 인자 (환경 변수 → 기본값)"""
+    return {
+        "host": os.getenv("DB_HOST", "mariadb"),
+        "port": int(os.getenv("DB_PORT", "3306")),
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASSWORD", "123456"),  # 실제 환경에서는 .env 로 지정
+        "database": os.getenv("DB_NAME", "test"),        # test 데이터베이스 사용
+        "charset": "utf8mb4",
+        "cursorclass": pymysql.cursors.DictCursor,       # 쿼리 결과를 딕셔너리로 변환
+        # 조회만 하는 요청이 트랜잭션을 열어둔 채 반납되지 않도록 (쓰기는 지금처럼 commit() 호출)
+        "autocommit": True,
+        "connect_timeout": 5,
+    }
+
+
+class PoolTimeoutError(Error):
+    """timeout 안에 빌릴 수 있는 연결이 없음 (size + max_overflow 개가 모두 사용 중)"""
+
+
+class PooledConnection:
+    """풀에서 빌린 연결 / close() 하면 풀로 반납, 나머지는 pymysql 연결과 같음"""
+
+    def __init__(self, pool: "ConnectionPool", raw, created_at: float):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise Error("이미 반납된 연결입니다.")
+        return getattr(self._raw, name)
+
+    def close(self):
+        """연결을 끊지 않고 풀로 돌려줌 (두 번 불러도 괜찮음)"""
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """스레드 안전 연결 풀 (LIFO: 최근에 쓴 연결부터 다시 사용 → 남는 연결은 쉬다가 recycle)"""
+
+    def __init__(self, size: int = 5, max_overflow: int = 10, recycle: float = 3600,
+                 ping_interval: float = 30, timeout: float = 10, connect=None, **kwargs):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        self.kwargs = kwargs or connect_kwargs()
+        self._connect = connect or pymysql.connect
+        # (연결, 만든 시각, 마지막으로 반납된 시각)
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.stats = {"checkouts": 0, "connects": 0, "recycled": 0, "ping_failures": 0,
+                      "waits": 0, "timeouts": 0}
+
+    @classmethod
+    def from_env(cls) -> "ConnectionPool":
+        return cls(
+            size=int(os.getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+            recycle=float(os.getenv("DB_POOL_RECYCLE", "3600")),
+            ping_interval=float(os.getenv("DB_POOL_PING_INTERVAL", "30")),
+            timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        )
+
+    def _check_fork(self):
+        """gunicorn --preload 로 fork 된 뒤에는 부모 프로세스의 연결(소켓)을 쓰지 않음"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle = queue.LifoQueue()
+                    self._opened = 0
+                    self._pid = os.getpid()
+
+    def _new_connection(self):
+        raw = self._connect(**self.kwargs)
+        self.stats["connects"] += 1
+        return raw, time.time()
+
+    def _discard(self, raw):
+        with self._lock:
+            self._opened -= 1
         try:
-            self.connection = pymysql.connect(
-                host='mariadb',
-                port=3306,
-                
-                database='test',  # test 데이터베이스 사용
-                user='root',
-                password='123456',  # mariadb 설치 당시의 패스워드, 실제 환경에서는 보안을 위해 환경변수 등을 사용
-                charset='utf8mb4',
-                cursorclass=pymysql.cursors.DictCursor   # 쿼리 결과를 딕셔너리로 변환
-            )
-            print("MariaDB에 성공적으로 연결되었습니다.")
-        except Error as e:
-            print(f"MariaDB 연결 중 오류 발생: {e}")
-
-# def get_connection():
-    
-#     conn = pymysql.connect(
-#         host=os.getenv("DB_HOST"),        # DB 주소
-#         user=os.getenv("DB_USER"),        # DB 사용자명
-#         password=os.getenv("DB_PASSWORD"),# DB 비밀번호 (노출 X)
-#         database=os.getenv("DB_NAME"),    # DB 이름
-#         cursorclass=pymysql.cursors.DictCursor
-#     )
-    
-#     print(" 데이터베이스 연결 성공!")
-#     return conn
+            raw.close()
+        except Exception:
+            pass
+
+    def _healthy(self, raw, created_at: float, returned_at: float) -> bool:
+        now = time.time()
+        if now - created_at > self.recycle:
+            self.stats["recycled"] += 1
+            return False
+        if now - returned_at > self.ping_interval:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                self.stats["ping_failures"] += 1
+                return False
+        return True
+
+    def acquire(self, timeout: float = None) -> PooledConnection:
+        """연결 빌리기 (쉬는 연결 → 새 연결(size + max_overflow 까지) → 반납될 때까지 대기)"""
+        self._check_fork()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        waited = False
+        while True:
+            try:
+                raw, created_at, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._opened < self.size + self.max_overflow
+                    if can_open:
+                        self._opened += 1
+                if can_open:
+                    try:
+                        raw, created_at = self._new_connection()
+                    except Exception:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                    break
+                # 모두 사용 중 → 누군가 반납할 때까지 대기 (끊긴 연결이 버려지면 새로 열 수 있게 짧게 나눠서)
+                if not waited:
+                    self.stats["waits"] += 1
+                    waited = True
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeoutError(f"{timeout}초 안에 DB 연결을 빌리지 못했습니다.")
+                try:
+                    raw, created_at, returned_at = self._idle.get(timeout=min(remaining, 0.1))
+                except queue.Empty:
+                    continue
+            if self._healthy(raw, created_at, returned_at):
+                break
+            self._discard(raw)
+
+        self.stats["checkouts"] += 1
+        return PooledConnection(self, raw, created_at)
+
+    def _release(self, raw, created_at: float):
+        if self._pid != os.getpid():
+            return
+        try:
+            # 끝나지 않은 트랜잭션(commit 안 한 쓰기 / autocommit 끈 연결)은 되돌리고 반납
+            if raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        with self._lock:
+            # 바쁠 때 더 열었던 연결(overflow)은 쉬는 연결이 size 개를 넘으면 닫음
+            keep = self._idle.qsize() < self.size
+        if keep:
+            self._idle.put((raw, created_at, time.time()))
+        else:
+            self._discard(raw)
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ... → 끝나면 자동 반납"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close_all(self):
+        """쉬고 있는 연결 모두 닫기 (프로세스 종료 시)"""
+        while True:
+            try:
+                raw, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(raw)
+
+    def status(self) -> dict:
+        with self._lock:
+            opened = self._opened
+        idle = self._idle.qsize()
+        return {"size": self.size, "max_overflow": self.max_overflow, "opened": opened,
+                "idle": idle, "in_use": opened - idle, **self.stats}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """프로세스 전체가 같이 쓰는 풀 (처음 사용할 때 생성)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool.from_env()
+    return _pool
+
+
+def get_connection() -> PooledConnection:
+    """풀에서 연결 빌리기 / 다 쓰면 conn.close() (실제로는 반납)"""
+    return get_pool().acquire()
+
+
+def connection():
+    """with connection() as conn: ..."""
+    return get_pool().connection()
+
+
+# ---------- 자주 쓰는 쿼리 ----------
+def fetch_one(sql: str, params=None):
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchone()
+
+
+def fetch_all(sql: str, params=None):
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+def execute(sql: str, params=None) -> int:
+    """INSERT / UPDATE / DELETE → 영향받은 행 수 (바로 commit)"""
+    with connection() as conn, conn.cursor() as cur:
+        affected = cur.execute(sql, params)
+        conn.commit()
+        return affected
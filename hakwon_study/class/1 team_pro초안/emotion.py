@@ -1,9 +1,19 @@
 # emotion.py
 import google.generativeai as genai
+import asyncio
 import json
 import os
+import sys
+import threading
+import time
 from dotenv import load_dotenv
 
+# LLM 호출 관문은 법률 분석 서비스와 같은 파일 사용 (hakwon_study/Ai/llm/llm_gateway.py, 복사본을 두지 않음)
+# 다른 위치에 배포할 때는 LLM_GATEWAY_PATH 로 llm_gateway.py 가 있는 폴더 지정
+sys.path.append(os.getenv("LLM_GATEWAY_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "Ai", "llm"))
+from llm_gateway import LLMGateway, CircuitOpenError, is_retryable
+
 # .env 파일 로드
 load_dotenv()
 
@@ -11,20 +21,21 @@ load_dotenv()
 # 환경 변수에서 먼저 확인하고, 없으면 직접 설정된 키 사용
 api_key = os.getenv("GEMINI_API_KEY")
 
+# 모든 일기 분석이 같이 쓰는 LLM 호출 풀 (동시 호출 수 / 시간 예산 / 재시도 / 서킷 브레이커)
+llm_gateway = LLMGateway.from_env(name="emotion")
+
+# GEMINI_BASE_URL 을 주면 그 주소로 호출 (Ai/llm/fake_llm_server.py 로 로컬 테스트)
+base_url = os.getenv("GEMINI_BASE_URL")
+
 if api_key and api_key != "YOUR_API_KEY":
     try:
-        genai.configure(api_key=api_key)
+        if base_url:
+            genai.configure(api_key=api_key, transport="rest",
+                            client_options={"api_endpoint": base_url})
+        else:
+            genai.configure(api_key=api_key)
         print(f"✅ Gemini API 키가 설정되었습니다. (키 길이: {len(api_key)})")
-        
-        # 사용 가능한 모델 목록 확인
-        try:
-            print("🔍 사용 가능한 모델 목록 확인 중...")
-            models = genai.list_models()
-            available_models = [m.name for m in models if 'generateContent' in m.supported_generation_methods]
-            print(f"✅ 사용 가능한 모델: {available_models[:5]}")  # 처음 5개만 출력
-        except Exception as list_e:
-            print(f"⚠️ 모델 목록 확인 실패: {list_e}")
-            
+        # 모델 목록 확인은 import 할 때 하지 않고 처음 분석할 때 model_registry 가 한 번만
     except Exception as e:
         print(f"⚠️ API 키 설정 오류: {e}")
         api_key = None
@@ -33,51 +44,120 @@ else:
     api_key = None
 
 
+class ModelRegistry:
+    """프로세스 전체가 같이 쓰는 Gemini 모델 (일기마다 list_models 를 다시 부르지 않음)
+
+    - 처음 get() 할 때 list_models 로 flash → pro 순서로 모델을 골라 GenerativeModel 1개를 만들어 둠
+    - ttl(초)이 지나면 다음 get() 때 다시 고름 (목록 조회가 실패하면 기존 모델 계속 사용)
+    - GEMINI_MODEL 을 지정하면 목록 조회 없이 그 모델 사용
+    - refresh(): 모델이 없어졌을 때(404) 등 바로 다시 고르기
+    """
+
+    def __init__(self, ttl: float = 3600, pinned: str = None, list_timeout: float = 10):
+        self.ttl = ttl
+        self.pinned = pinned
+        self.list_timeout = list_timeout
+        self.model = None
+        self.model_name = None
+        self._resolved_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"resolves": 0, "list_failures": 0, "hits": 0}
+
+    @classmethod
+    def from_env(cls) -> "ModelRegistry":
+        return cls(ttl=float(os.getenv("GEMINI_MODEL_TTL", "3600")),
+                   pinned=os.getenv("GEMINI_MODEL") or None)
+
+    def _choose(self) -> str:
+        """사용 가능한 모델 중 flash 우선, 없으면 pro, 그것도 없으면 gemini-pro"""
+        if self.pinned:
+            return self.pinned
+        print("🔍 사용 가능한 모델 목록 확인 중...")
+        models = genai.list_models(request_options={"timeout": self.list_timeout})
+        available_models = [m.name.replace('models/', '') for m in models
+                            if 'generateContent' in m.supported_generation_methods]
+        print(f"✅ 사용 가능한 모델: {available_models[:5]}")  # 처음 5개만 출력
+        preferred_models = [m for m in available_models if 'flash' in m.lower()]
+        if not preferred_models:
+            preferred_models = [m for m in available_models if 'pro' in m.lower()]
+        return preferred_models[0] if preferred_models else "gemini-pro"
+
+    def get(self):
+        """캐시된 GenerativeModel (API 키가 없으면 None)"""
+        if not api_key:
+            return None
+        if self.model is not None and time.time() - self._resolved_at < self.ttl:
+            self.stats["hits"] += 1
+            return self.model
+        with self._lock:
+            # 다른 스레드가 먼저 골랐으면 그대로 사용
+            if self.model is not None and time.time() - self._resolved_at < self.ttl:
+                self.stats["hits"] += 1
+                return self.model
+            try:
+                model_name = self._choose()
+            except Exception as e:
+                self.stats["list_failures"] += 1
+                print(f"⚠️ 모델 목록 확인 실패: {e}")
+                if self.model is not None:
+                    # 기존 모델로 계속 / 1분 뒤에 다시 확인
+                    self._resolved_at = time.time() - self.ttl + 60
+                    return self.model
+                model_name = "gemini-pro"
+            if model_name != self.model_name or self.model is None:
+                self.model = genai.GenerativeModel(model_name)
+                self.model_name = model_name
+                print(f"✅ Gemini 모델 초기화 성공 ({model_name})")
+            self._resolved_at = time.time()
+            self.stats["resolves"] += 1
+            return self.model
+
+    def refresh(self):
+        """바로 다시 고르기 (모델 폐기 / 키 교체 후)"""
+        with self._lock:
+            # ttl 이 얼마든 만료된 것으로 (0 으로 두면 시계 값이 ttl 보다 작을 때 그대로 재사용)
+            self._resolved_at = float("-inf")
+        return self.get()
+
+    def status(self) -> dict:
+        return {"model": self.model_name, "ttl": self.ttl,
+                "age": round(time.time() - self._resolved_at, 1) if self.model else None,
+                **self.stats}
+
+
+# 모든 EmotionAnalyzer 가 같이 쓰는 모델
+model_registry = ModelRegistry.from_env()
+
+
+# 감정 분류 (Happy, Neutral, Sad, Angry -> 한국어) / DB emotion_score
+EMOTION_SCORES = {"행복": 3, "보통": 2, "우울": 1, "분노": 0}
+MOOD_TO_EMOTION = {"happy": "행복", "sad": "우울", "angry": "분노"}
+
+
+def mood_to_emotion(mood) -> str:
+    """Gemini mood → 한국어 감정 (Neutral 또는 기타는 보통)"""
+    return MOOD_TO_EMOTION.get(str(mood or "Neutral").strip().lower(), "보통")
+
+
 class EmotionAnalyzer:
     def __init__(self, content: str):
         self.content = content
         self.api_key = api_key
-        if self.api_key:
-            # 사용 가능한 모델 목록에서 찾기
-            try:
-                models = genai.list_models()
-                available_models = [m.name.replace('models/', '') for m in models 
-                                   if 'generateContent' in m.supported_generation_methods]
-                
-                # 우선순위: flash 모델 우선, 없으면 pro 모델
-                preferred_models = [m for m in available_models if 'flash' in m.lower()]
-                if not preferred_models:
-                    preferred_models = [m for m in available_models if 'pro' in m.lower()]
-                
-                if preferred_models:
-                    model_name = preferred_models[0]
-                    self.model = genai.GenerativeModel(model_name)
-                    print(f"✅ Gemini 모델 초기화 성공 ({model_name})")
-                else:
-                    # 기본 모델 시도
-                    model_names = ["gemini-pro", "models/gemini-pro"]
-                    for model_name in model_names:
-                        try:
-                            self.model = genai.GenerativeModel(model_name)
-                            print(f"✅ Gemini 모델 초기화 성공 ({model_name})")
-                            break
-                        except:
-                            continue
-                    
-                    if not self.model:
-                        print("❌ 사용 가능한 모델을 찾을 수 없습니다")
-            except Exception as e:
-                print(f"⚠️ 모델 목록 확인 실패, 기본 모델 시도: {e}")
-                try:
-                    self.model = genai.GenerativeModel("gemini-pro")
-                    print("✅ Gemini 모델 초기화 성공 (gemini-pro - 기본)")
-                except:
-                    self.model = None
-        else:
+        # 모델은 model_registry 가 한 번 골라서 재사용 (일기마다 list_models 호출 없음)
+        try:
+            self.model = model_registry.get()
+        except Exception as e:
+            print(f"⚠️ Gemini 모델 초기화 실패: {e}")
             self.model = None
 
-    def analyze(self):
-        # API 키가 없으면 간단한 분석 반환
+    def analyze(self, raise_on_error: bool = False):
+        """Gemini 감정 분석 → {"mood", "summary"}
+
+        Args:
+            raise_on_error: True 면 Gemini 호출/파싱 실패를 오류 요약 대신 예외로 올림
+                (emotion_queue worker 가 fail() 로 재시도하고 마지막 시도에서만 키워드 분석 사용)
+        """
+        # API 키가 없으면 간단한 분석 반환 (재시도해도 결과가 같으므로 raise_on_error 여도 그대로)
         if not self.api_key or not self.model:
             print("⚠️ API 키가 없어 간단한 분석을 수행합니다.")
             print(f"API 키 상태: api_key={bool(self.api_key)}, model={bool(self.model)}")
@@ -98,11 +178,11 @@ Respond in JSON format only:
 
         try:
             print("🔄 Gemini API 호출 중...")
-            response = self.model.generate_content(prompt)
-            print(f"Gemini 응답 원본: {response.text[:200]}...")  # 디버깅용
+            response_text = llm_gateway.call(self._request(prompt))
+            print(f"Gemini 응답 원본: {response_text[:200]}...")  # 디버깅용
             
             # JSON 추출
-            text = response.text.strip()
+            text = response_text.strip()
             
             # ```json 또는 ```로 감싸진 경우 제거
             if "```" in text:
@@ -133,9 +213,17 @@ Respond in JSON format only:
             
             return result
 
+        except CircuitOpenError:
+            if raise_on_error:
+                raise
+            # 최근에 Gemini 호출이 계속 실패함 → 기다리지 않고 키워드 분석으로 대체
+            print("⚠️ Gemini 호출이 잠시 차단된 상태라 간단한 분석을 수행합니다.")
+            return self._simple_analysis()
         except json.JSONDecodeError as e:
             print(f"JSON 파싱 오류: {e}")
             print(f"파싱 시도한 텍스트: {text[:500]}")
+            if raise_on_error:
+                raise
             # JSON 파싱 실패 시 기본값 반환
             return {
                 "mood": "Neutral",
@@ -150,6 +238,20 @@ Respond in JSON format only:
             # API 키 관련 오류인지 확인
             error_str = str(e).lower()
             error_type = type(e).__name__
+
+            # 모델이 없어졌으면(404) 다음 분석부터 다른 모델을 쓰도록 다시 고름
+            if "404" in error_str or "not found" in error_str:
+                try:
+                    model_registry.refresh()
+                except Exception as refresh_error:
+                    print(f"⚠️ 모델 다시 고르기 실패: {refresh_error}")
+            if raise_on_error:
+                raise
+
+            # 재시도를 다 써도 실패 (시간 초과 / 429 / 5xx) → 서킷이 열렸을 때와 같이 키워드 분석으로 대체
+            if is_retryable(e):
+                print("⚠️ Gemini 호출이 계속 실패해서 간단한 분석을 수행합니다.")
+                return self._simple_analysis()
             
             # 더 정확한 오류 메시지
             if "api" in error_str or "key" in error_str or "authentication" in error_str or "permission" in error_str:
@@ -171,6 +273,16 @@ Respond in JSON format only:
                 "summary": f"분석 중 오류가 발생했습니다: {str(e)[:80]}"
             }
     
+    def _request(self, prompt):
+        """게이트웨이가 재시도할 때마다 새로 만드는 요청 (동기 SDK 호출을 스레드에서 실행)"""
+        async def request():
+            response = await asyncio.to_thread(
+                self.model.generate_content, prompt,
+                # 게이트웨이 시간 예산이 끝나면 SDK 요청도 끝나도록
+                request_options={"timeout": llm_gateway.timeout})
+            return response.text
+        return request
+
     def _simple_analysis(self):
         """API 키가 없을 때 간단한 키워드 기반 분석"""
         content_lower = self.content.lower()
@@ -199,5 +311,6 @@ Respond in JSON format only:
         
         return {
             "mood": mood,
-            "summary": summary
+            "summary": summary,
+            "source": "keyword"  # Gemini 가 아닌 키워드 분석 (backfill.py 재분석 대상)
         }
@@ -0,0 +1,261 @@
+# emotion_queue.py
+# 감정 분석 작업 큐 / 일기는 바로 저장하고 Gemini 분석은 백그라운드 worker 스레드가 처리
+#
+# /diary POST → diaries 에 analysis_status='pending' 으로 저장 → enqueue(diary_id)
+#   → worker 가 EmotionAnalyzer 로 분석 → emotion / emotion_score / analysis 업데이트, analysis_status='done'
+#   → result.html / diary_list.html 은 /diary/<id>/status 를 주기적으로 확인
+#
+# - 큐는 SQLite 파일 (EMOTION_QUEUE_PATH) 이라 서버가 재시작해도 남은 작업을 이어서 처리
+# - gunicorn worker 프로세스마다 worker 스레드가 돌지만 작업 가져오기는 BEGIN IMMEDIATE 로 한 곳만 성공
+# - 가져간 작업은 lease(초) 동안만 잠금 → 프로세스가 죽으면 lease 가 끝난 뒤 다른 worker 가 다시 가져감
+#   (lease 는 Gemini 호출 시간 예산보다 길게 / 시도 횟수를 다 쓴 작업은 다시 가져가지 않고 failed)
+# - worker 스레드는 app.py 의 before_request 에서 프로세스마다 처음 한 번 시작 (gunicorn --preload 로 fork 된 뒤에도)
+# - 실패하면 max_attempts 번까지 재시도 (점점 길게 대기)
+#   Gemini 가 마지막 시도까지 실패하면 키워드 분석 결과를 저장, DB 오류 등으로 끝까지 실패하면 analysis_status='failed'
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+import db
+from emotion import EMOTION_SCORES, EmotionAnalyzer, llm_gateway, mood_to_emotion
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emotion_jobs.db")
+
+
+class EmotionQueue:
+    """SQLite 작업 큐 + worker 스레드
+
+    Args:
+        path: 큐 파일 경로
+        workers: 프로세스당 worker 스레드 수 (Gemini 동시 호출 수는 llm_gateway 가 따로 제한)
+        lease: 작업 1건 최대 처리 시간(초) / 넘으면 다른 worker 가 다시 가져감
+        max_attempts: 최대 시도 횟수
+        poll_interval: 다른 프로세스가 넣은 작업을 확인하는 주기(초)
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, workers: int = 2, lease: float = 120,
+                 max_attempts: int = 3, poll_interval: float = 1.0):
+        self.path = path
+        self.workers = workers
+        # 처리가 lease 보다 오래 걸리면 다른 worker 가 같은 작업을 동시에 가져감
+        # → Gemini 호출 시간 예산(재시도 포함) + 모델 목록 조회 / DB 여유 시간보다 짧으면 늘림
+        min_lease = llm_gateway.timeout + 60
+        if lease < min_lease:
+            print(f"⚠️ EMOTION_JOB_LEASE {lease:.0f}초는 Gemini 시간 예산보다 짧아서 {min_lease:.0f}초로 늘립니다.")
+            lease = min_lease
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._init_schema()
+
+    @classmethod
+    def from_env(cls) -> "EmotionQueue":
+        return cls(
+            path=os.getenv("EMOTION_QUEUE_PATH", DEFAULT_PATH),
+            workers=int(os.getenv("EMOTION_WORKERS", "2")),
+            lease=float(os.getenv("EMOTION_JOB_LEASE", "120")),
+            max_attempts=int(os.getenv("EMOTION_MAX_ATTEMPTS", "3")),
+        )
+
+    # ---------- SQLite ----------
+    def _conn(self) -> sqlite3.Connection:
+        """스레드마다 연결 1개 (sqlite3 연결은 스레드끼리 공유하지 않음)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            # isolation_level=None: BEGIN / COMMIT 을 직접 관리
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")   # 읽기와 쓰기가 서로 막지 않게
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        # diary_id 당 작업 1줄 / 다시 저장하면 version 을 올려서 다시 대기열로
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                diary_id INTEGER PRIMARY KEY,
+                status TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 1,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                locked_until REAL NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn().execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, locked_until)")
+
+    def enqueue(self, diary_id: int):
+        """일기 저장 commit 후 호출 (같은 일기를 다시 저장하면 새 내용으로 다시 분석)"""
+        now = time.time()
+        self._conn().execute("""
+            INSERT INTO jobs (diary_id, status, version, attempts, locked_until, updated_at)
+            VALUES (?, 'queued', 1, 0, 0, ?)
+            ON CONFLICT(diary_id) DO UPDATE SET
+                status = 'queued', version = version + 1, attempts = 0,
+                locked_until = 0, error = NULL, updated_at = excluded.updated_at
+        """, (diary_id, now))
+        self._wake.set()
+
+    def claim(self) -> Optional[Dict]:
+        """대기 중이거나 lease 가 끝난 작업 1건 가져오기"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")  # 다른 프로세스와 같은 작업을 가져가지 않도록 쓰기 잠금
+        try:
+            # 시도 횟수를 다 쓴 running 작업(처리 중 프로세스가 죽음 / lease 초과)은 다시 가져가지 않음
+            row = conn.execute("""
+                SELECT diary_id, version, attempts FROM jobs
+                WHERE status IN ('queued', 'running') AND locked_until <= ? AND attempts < ?
+                ORDER BY updated_at LIMIT 1
+            """, (now, self.max_attempts)).fetchone()
+            if row is not None:
+                conn.execute("""
+                    UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                                    locked_until = ?, updated_at = ?
+                    WHERE diary_id = ?
+                """, (now + self.lease, now, row['diary_id']))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return {"diary_id": row['diary_id'], "version": row['version'], "attempts": row['attempts'] + 1}
+
+    def is_current(self, job: Dict) -> bool:
+        """처리하는 동안 일기가 다시 저장되지 않았는지"""
+        row = self._conn().execute("SELECT version FROM jobs WHERE diary_id = ?",
+                                   (job['diary_id'],)).fetchone()
+        return row is not None and row['version'] == job['version']
+
+    def finish(self, job: Dict):
+        # 처리 중에 다시 저장됐으면(version 변경) 그 작업은 queued 로 남아 있음
+        self._conn().execute("""
+            UPDATE jobs SET status = 'done', locked_until = 0, error = NULL, updated_at = ?
+            WHERE diary_id = ? AND version = ?
+        """, (time.time(), job['diary_id'], job['version']))
+
+    def fail(self, job: Dict, error: str) -> bool:
+        """실패 기록 → 더 이상 재시도하지 않으면 True"""
+        final = job['attempts'] >= self.max_attempts
+        # 재시도 대기: 5초, 20초, 45초 ...
+        retry_at = time.time() + 5 * job['attempts'] ** 2
+        self._conn().execute("""
+            UPDATE jobs SET status = ?, locked_until = ?, error = ?, updated_at = ?
+            WHERE diary_id = ? AND version = ?
+        """, ("failed" if final else "queued", 0 if final else retry_at, error[:500],
+              time.time(), job['diary_id'], job['version']))
+        return final
+
+    def reap(self) -> List[int]:
+        """lease 가 끝났는데 시도 횟수를 다 쓴 running 작업 → failed (diary_id 목록)"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("""
+                SELECT diary_id FROM jobs
+                WHERE status = 'running' AND locked_until <= ? AND attempts >= ?
+            """, (now, self.max_attempts)).fetchall()
+            conn.execute("""
+                UPDATE jobs SET status = 'failed', locked_until = 0, error = 'lease expired', updated_at = ?
+                WHERE status = 'running' AND locked_until <= ? AND attempts >= ?
+            """, (now, now, self.max_attempts))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [row['diary_id'] for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    # ---------- worker ----------
+    def start(self):
+        """worker 스레드 시작 (프로세스당 한 번 / 요청마다 불러도 이미 시작했으면 바로 return)"""
+        if self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            for i in range(self.workers):
+                threading.Thread(target=self._run, daemon=True, name=f"emotion-worker-{i}").start()
+        print(f"✅ 감정 분석 worker {self.workers}개 시작 (큐: {self.path})")
+
+    def _run(self):
+        while True:
+            try:
+                job = self.claim()
+            except Exception as e:
+                print(f"⚠️ 작업 큐 읽기 오류: {e}")
+                job = None
+            if job is None:
+                self._reap()
+                # 새 작업이 들어오면 바로 깨어나고, 아니면 poll_interval 마다 확인
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self.process(job)
+
+    def _reap(self):
+        try:
+            diary_ids = self.reap()
+            if diary_ids:
+                print(f"⚠️ 처리 중 멈춘 작업 {diary_ids} → 분석 실패로 표시")
+                placeholders = ", ".join(["%s"] * len(diary_ids))
+                db.execute(f"UPDATE diaries SET analysis_status = 'failed' WHERE id IN ({placeholders})",
+                           diary_ids)
+        except Exception as e:
+            print(f"⚠️ 멈춘 작업 정리 오류: {e}")
+
+    def process(self, job: Dict):
+        diary_id = job['diary_id']
+        try:
+            row = db.fetch_one("SELECT content FROM diaries WHERE id = %s", (diary_id,))
+            if row is None:
+                # 그 사이 삭제된 일기
+                self.finish(job)
+                return
+
+            print(f"AI 분석 시작... (diary_id={diary_id}, 시도 {job['attempts']})")
+            analyzer = EmotionAnalyzer(row['content'])
+            try:
+                # Gemini 실패는 예외로 받아서 fail() → 점점 길게 대기 후 재시도
+                result = analyzer.analyze(raise_on_error=True)
+            except Exception as e:
+                if job['attempts'] < self.max_attempts:
+                    raise
+                # 마지막 시도까지 실패 → 오류 문장 대신 키워드 분석 결과 저장
+                print(f"⚠️ Gemini 분석 {job['attempts']}번 실패 → 키워드 분석 사용 (diary_id={diary_id}): {e}")
+                result = analyzer._simple_analysis()
+            if not self.is_current(job):
+                print(f"↩️ diary_id={diary_id} 가 다시 저장되어 이전 분석 결과는 버립니다.")
+                return
+            emotion = mood_to_emotion(result.get("mood"))
+            db.execute("""
+                UPDATE diaries
+                SET emotion = %s, emotion_score = %s, analysis = %s, analysis_status = 'done'
+                WHERE id = %s
+            """, (emotion, EMOTION_SCORES[emotion], json.dumps(result, ensure_ascii=False), diary_id))
+            self.finish(job)
+            print(f"분류된 감정: {emotion} (diary_id={diary_id})")
+        except Exception as e:
+            print(f"AI 분석 작업 오류 (diary_id={diary_id}): {e}")
+            traceback.print_exc()
+            if self.fail(job, f"{type(e).__name__}: {e}"):
+                try:
+                    db.execute("UPDATE diaries SET analysis_status = 'failed' WHERE id = %s", (diary_id,))
+                except Exception as db_error:
+                    print(f"분석 실패 상태 저장 오류: {db_error}")
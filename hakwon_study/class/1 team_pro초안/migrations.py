@@ -0,0 +1,200 @@
+# migrations.py
+# DB 스키마 버전 관리 / 앱 시작할 때 한 번만 실행 (요청마다 SHOW COLUMNS / ALTER TABLE 하지 않음)
+#
+# 실행 예시
+# python migrations.py          → 아직 안 된 migration 적용 후 현재 버전 출력
+# python migrations.py --status → 적용 내역만 출력
+# python migrations.py --dedupe-diaries → 같은 날짜 중복 일기를 diaries_duplicates_backup 에 복사한 뒤 정리하고 적용
+#   - 적용한 버전은 schema_migrations 테이블에 기록 (이미 적용된 버전은 건너뜀)
+#   - gunicorn worker 여러 개가 동시에 시작해도 GET_LOCK 으로 한 프로세스만 실행
+#   - 새 스키마 변경은 MIGRATIONS 맨 뒤에 (다음 번호, 이름, 함수(cur, options)) 추가
+#   - 사용자 데이터를 지우는 단계는 앱 시작 시 자동으로 하지 않음 (멈추고 직접 실행할 명령을 안내)
+import argparse
+
+from db import connection
+
+LOCK_NAME = "diary_schema_migrations"
+
+
+class MigrationError(RuntimeError):
+    """직접 확인이 필요한 상태라 migration 을 멈춤"""
+
+
+def _column_exists(cur, table: str, column: str) -> bool:
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cur.fetchone() is not None
+
+
+def _unique_key_exists(cur, table: str, columns: list) -> bool:
+    """columns 순서 그대로인 UNIQUE 인덱스가 이미 있는지"""
+    cur.execute("""
+        SELECT index_name, GROUP_CONCAT(column_name ORDER BY seq_in_index) AS cols
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND non_unique = 0
+        GROUP BY index_name
+    """, (table,))
+    return any(row['cols'] == ",".join(columns) for row in cur.fetchall())
+
+
+def create_users(cur, options):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def create_diaries(cur, options):
+    # 기획서.md 의 diaries 테이블 (이미 있으면 그대로 두고 다음 migration 에서 보완)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS diaries (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            content TEXT,
+            emotion VARCHAR(20),
+            emotion_score INT,
+            diary_date DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+
+
+def add_analysis_column(cur, options):
+    # 예전에는 일기 저장할 때마다 확인하던 컬럼
+    if not _column_exists(cur, "diaries", "analysis"):
+        cur.execute("ALTER TABLE diaries ADD COLUMN analysis TEXT")
+
+
+def add_user_date_unique_key(cur, options):
+    """하루에 일기 1개 → INSERT ... ON DUPLICATE KEY UPDATE 한 번으로 저장"""
+    if _unique_key_exists(cur, "diaries", ["user_id", "diary_date"]):
+        return
+    cur.execute("""
+        SELECT user_id, diary_date, COUNT(*) AS n, GROUP_CONCAT(id ORDER BY id) AS ids
+        FROM diaries GROUP BY user_id, diary_date HAVING COUNT(*) > 1
+    """)
+    duplicates = cur.fetchall()
+    if duplicates and not options.get("dedupe_diaries"):
+        lines = [f"  - user_id={row['user_id']} {row['diary_date']}: id {row['ids']}" for row in duplicates[:20]]
+        if len(duplicates) > 20:
+            lines.append(f"  ... 외 {len(duplicates) - 20}건")
+        raise MigrationError(
+            "같은 날짜에 일기가 여러 개라 (user_id, diary_date) 유니크 키를 추가할 수 없습니다.\n"
+            + "\n".join(lines)
+            + "\n가장 최근 일기만 남기려면 python migrations.py --dedupe-diaries 를 실행하세요."
+              " (지우는 일기는 diaries_duplicates_backup 테이블에 먼저 복사)")
+    if duplicates:
+        # 지우기 전에 백업 (화면에서도 최신 것으로 덮어썼던 예전 일기들)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS diaries_duplicates_backup AS
+            SELECT d.*, NOW() AS backed_up_at FROM diaries d WHERE 1 = 0
+        """)
+        cur.execute("""
+            INSERT INTO diaries_duplicates_backup
+            SELECT d.*, NOW() FROM diaries d
+            WHERE EXISTS (
+                SELECT 1 FROM diaries newer
+                WHERE newer.user_id = d.user_id AND newer.diary_date = d.diary_date AND newer.id > d.id
+            )
+        """)
+        backed_up = cur.rowcount
+        cur.execute("""
+            DELETE d FROM diaries d
+            JOIN diaries newer
+              ON newer.user_id = d.user_id AND newer.diary_date = d.diary_date AND newer.id > d.id
+        """)
+        print(f"⚠️ 같은 날짜에 중복된 일기 {cur.rowcount}건을 정리했습니다. "
+              f"(diaries_duplicates_backup 에 {backed_up}건 백업)")
+    cur.execute("ALTER TABLE diaries ADD UNIQUE KEY uq_diaries_user_date (user_id, diary_date)")
+
+
+def add_analysis_status(cur, options):
+    """감정 분석은 백그라운드 작업 → pending / done / failed (기존 일기는 done)"""
+    if not _column_exists(cur, "diaries", "analysis_status"):
+        cur.execute("""
+            ALTER TABLE diaries
+            ADD COLUMN analysis_status VARCHAR(20) NOT NULL DEFAULT 'done'
+        """)
+
+
+# (버전, 이름, 함수) / 한 번 배포한 항목은 고치지 말고 새 버전을 추가
+MIGRATIONS = [
+    (1, "create_users", create_users),
+    (2, "create_diaries", create_diaries),
+    (3, "add_analysis_column", add_analysis_column),
+    (4, "add_user_date_unique_key", add_user_date_unique_key),
+    (5, "add_analysis_status", add_analysis_status),
+]
+
+
+def applied_versions(cur) -> set:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cur.fetchall()}
+
+
+def migrate(lock_timeout: int = 60, dedupe_diaries: bool = False) -> list:
+    """아직 적용 안 된 migration 실행 → 이번에 적용한 버전 목록
+
+    Args:
+        dedupe_diaries: 같은 날짜 중복 일기를 백업 후 정리 (python migrations.py --dedupe-diaries 로만)
+    """
+    options = {"dedupe_diaries": dedupe_diaries}
+    done = []
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT GET_LOCK(%s, %s) AS locked", (LOCK_NAME, lock_timeout))
+        if not cur.fetchone()['locked']:
+            raise RuntimeError("다른 프로세스가 migration 중입니다. (GET_LOCK 시간 초과)")
+        try:
+            applied = applied_versions(cur)
+            for version, name, apply in MIGRATIONS:
+                if version in applied:
+                    continue
+                print(f"🛠️ migration {version}: {name}")
+                apply(cur, options)
+                # MariaDB DDL 은 자동 commit 이라 버전 기록은 적용이 끝난 뒤에
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                            (version, name))
+                conn.commit()
+                done.append(version)
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+    return done
+
+
+def status() -> list:
+    with connection() as conn, conn.cursor() as cur:
+        applied_versions(cur)
+        cur.execute("SELECT version, name, applied_at FROM schema_migrations ORDER BY version")
+        return cur.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="diary 앱 DB migration")
+    parser.add_argument("--status", action="store_true", help="적용 내역만 출력")
+    parser.add_argument("--dedupe-diaries", action="store_true",
+                        help="같은 날짜 중복 일기를 diaries_duplicates_backup 에 복사한 뒤 최신 것만 남김")
+    args = parser.parse_args()
+
+    if not args.status:
+        done = migrate(dedupe_diaries=args.dedupe_diaries)
+        print(f"✅ 적용한 migration: {done or '없음 (최신 상태)'}")
+    for row in status():
+        print(f"  - {row['version']}: {row['name']} ({row['applied_at']})")
+
+
+if __name__ == "__main__":
+    main()
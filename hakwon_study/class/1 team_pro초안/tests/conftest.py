@@ -0,0 +1,7 @@
+# 테스트 공통 설정 / 앱 모듈(db, emotion, backfill ...)은 앱 폴더에서 바로 import 하는 구조라 sys.path 에 추가
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
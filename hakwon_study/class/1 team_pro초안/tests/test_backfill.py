@@ -0,0 +1,77 @@
+# backfill.py 응답 파싱 / 묶음 UPDATE(CASE) 저장 테스트 (MariaDB 대신 SQLite + CRC32 함수)
+import json
+import sqlite3
+import zlib
+
+import pytest
+
+pytest.importorskip("pymysql")
+pytest.importorskip("google.generativeai")
+
+import backfill  # noqa: E402
+
+
+def test_parse_results_reads_array_inside_text():
+    text = 'Here you go:\n```json\n[{"id": 3, "mood": "Sad", "summary": "힘든 하루"}]\n```'
+    assert backfill.parse_results(text) == {3: {"mood": "Sad", "summary": "힘든 하루"}}
+
+
+def test_parse_results_skips_bad_items():
+    text = json.dumps(["oops", 7, None, {"mood": "Happy"}, {"id": "x", "mood": "Happy"},
+                       {"id": "5", "mood": "Angry", "summary": "화남"}, {"id": 6}])
+    results = backfill.parse_results(text)
+    assert results == {5: {"mood": "Angry", "summary": "화남"},
+                       6: {"mood": "Neutral", "summary": "분석 결과를 가져올 수 없습니다."}}
+
+
+def test_parse_results_invalid_json_raises():
+    with pytest.raises(ValueError):
+        backfill.parse_results("not json")
+
+
+@pytest.fixture
+def diaries(monkeypatch):
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.create_function("CRC32", 1, lambda s: None if s is None else zlib.crc32(s.encode("utf-8")))
+    conn.execute("CREATE TABLE diaries (id INTEGER PRIMARY KEY, content TEXT, emotion TEXT, "
+                 "emotion_score INT, analysis TEXT, analysis_status TEXT)")
+    for i in (1, 2, 3):
+        conn.execute("INSERT INTO diaries VALUES (?, ?, NULL, NULL, NULL, 'failed')", (i, f"일기 {i}"))
+
+    def execute(sql, params=None):
+        cur = conn.execute(sql.replace("%s", "?"), params or ())
+        return cur.rowcount
+    monkeypatch.setattr(backfill.db, "execute", execute)
+    return conn
+
+
+def make_job():
+    # save 는 self 속성을 쓰지 않음
+    return backfill.Backfill.__new__(backfill.Backfill)
+
+
+def test_save_updates_rows_with_one_case_update(diaries):
+    entries = [{"id": 1, "content": "일기 1"}, {"id": 2, "content": "일기 2"}, {"id": 3, "content": "일기 3"}]
+    results = {1: {"mood": "Happy", "summary": "좋음"}, 3: {"mood": "Angry", "summary": "화남"}}
+    assert make_job().save(entries, results) == 2
+
+    rows = {r["id"]: dict(r) for r in diaries.execute("SELECT * FROM diaries")}
+    assert (rows[1]["emotion"], rows[1]["emotion_score"], rows[1]["analysis_status"]) == ("행복", 3, "done")
+    assert json.loads(rows[1]["analysis"]) == results[1]
+    assert (rows[3]["emotion"], rows[3]["emotion_score"]) == ("분노", 0)
+    # 결과가 없는 일기는 그대로
+    assert rows[2]["analysis"] is None and rows[2]["analysis_status"] == "failed"
+
+
+def test_save_skips_diaries_edited_meanwhile(diaries):
+    entries = [{"id": 1, "content": "일기 1"}, {"id": 2, "content": "일기 2"}]
+    diaries.execute("UPDATE diaries SET content = '새로 고친 일기' WHERE id = 2")
+    results = {1: {"mood": "Sad", "summary": "슬픔"}, 2: {"mood": "Happy", "summary": "좋음"}}
+    assert make_job().save(entries, results) == 1
+    assert diaries.execute("SELECT analysis FROM diaries WHERE id = 2").fetchone()[0] is None
+
+
+def test_save_without_results_skips_query(monkeypatch):
+    monkeypatch.setattr(backfill.db, "execute", lambda *a: pytest.fail("쿼리를 보내면 안 됨"))
+    assert make_job().save([{"id": 1, "content": "x"}], {}) == 0
@@ -0,0 +1,108 @@
+# emotion_queue.py 작업 상태 전이 테스트 (claim / fail / finish / reap, 큐 파일은 임시 폴더)
+import pytest
+
+pytest.importorskip("pymysql")
+pytest.importorskip("google.generativeai")
+
+from emotion_queue import EmotionQueue  # noqa: E402
+
+
+@pytest.fixture
+def queue(tmp_path):
+    # worker 스레드는 시작하지 않음 (start() 를 부르지 않음)
+    return EmotionQueue(path=str(tmp_path / "jobs.db"), lease=600, max_attempts=2)
+
+
+def job_row(queue, diary_id):
+    return dict(queue._conn().execute("SELECT * FROM jobs WHERE diary_id = ?", (diary_id,)).fetchone())
+
+
+def expire(queue, diary_id):
+    """lease / 재시도 대기 시간이 지난 것처럼"""
+    queue._conn().execute("UPDATE jobs SET locked_until = 0 WHERE diary_id = ?", (diary_id,))
+
+
+def test_claim_locks_job(queue):
+    queue.enqueue(1)
+    job = queue.claim()
+    assert job == {"diary_id": 1, "version": 1, "attempts": 1}
+    assert job_row(queue, 1)["status"] == "running"
+    # lease 동안은 다른 worker 가 가져가지 않음
+    assert queue.claim() is None
+
+    queue.finish(job)
+    assert job_row(queue, 1)["status"] == "done"
+    assert queue.claim() is None
+
+
+def test_fail_requeues_then_gives_up(queue):
+    queue.enqueue(1)
+    job = queue.claim()
+    assert queue.fail(job, "503") is False
+    row = job_row(queue, 1)
+    assert row["status"] == "queued" and row["error"] == "503"
+    # 재시도 대기 중에는 가져가지 않음
+    assert queue.claim() is None
+
+    expire(queue, 1)
+    job = queue.claim()
+    assert job["attempts"] == 2
+    assert queue.fail(job, "503") is True
+    assert job_row(queue, 1)["status"] == "failed"
+    expire(queue, 1)
+    assert queue.claim() is None
+
+
+def test_expired_lease_is_claimed_again(queue):
+    queue.enqueue(1)
+    queue.claim()
+    expire(queue, 1)  # 처리하던 프로세스가 죽음
+    job = queue.claim()
+    assert job["attempts"] == 2
+
+
+def test_reap_fails_jobs_out_of_attempts(queue):
+    queue.enqueue(1)
+    queue.enqueue(2)
+    queue.claim()
+    expire(queue, 1)
+    queue.claim()               # 1 번 두 번째 시도 (attempts = max_attempts)
+    queue.claim()               # 2 번 첫 시도
+    expire(queue, 1)
+    expire(queue, 2)
+
+    assert queue.reap() == [1]
+    assert job_row(queue, 1)["status"] == "failed"
+    assert job_row(queue, 1)["error"] == "lease expired"
+    # 시도가 남은 2 번은 다시 가져갈 수 있음
+    assert job_row(queue, 2)["status"] == "running"
+    assert queue.claim()["diary_id"] == 2
+    assert queue.reap() == []
+
+
+def test_resave_while_running_keeps_new_version(queue):
+    queue.enqueue(1)
+    job = queue.claim()
+    queue.enqueue(1)            # 분석 중에 일기를 다시 저장
+    assert not queue.is_current(job)
+
+    queue.finish(job)           # 예전 버전 결과는 반영하지 않음
+    row = job_row(queue, 1)
+    assert (row["status"], row["version"], row["attempts"]) == ("queued", 2, 0)
+    assert queue.fail(job, "old") is False
+    assert job_row(queue, 1)["error"] is None
+
+    assert queue.claim() == {"diary_id": 1, "version": 2, "attempts": 1}
+
+
+def test_stats(queue):
+    queue.enqueue(1)
+    queue.enqueue(2)
+    queue.finish(queue.claim())
+    assert queue.stats() == {"done": 1, "queued": 1}
+
+
+def test_lease_shorter_than_gateway_budget_is_raised(tmp_path):
+    from emotion import llm_gateway
+    queue = EmotionQueue(path=str(tmp_path / "jobs.db"), lease=1)
+    assert queue.lease == llm_gateway.timeout + 60
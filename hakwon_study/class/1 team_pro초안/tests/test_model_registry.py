@@ -0,0 +1,109 @@
+# emotion.py ModelRegistry TTL / refresh / 목록 조회 실패 테스트 (google.generativeai 대신 가짜)
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+import emotion  # noqa: E402
+from emotion import ModelRegistry  # noqa: E402
+
+
+class FakeGenai:
+    def __init__(self, names):
+        self.names = names
+        self.list_calls = 0
+        self.fail = False
+
+    def list_models(self, request_options=None):
+        self.list_calls += 1
+        if self.fail:
+            raise ConnectionError("list_models 실패")
+        return [SimpleNamespace(name=f"models/{n}", supported_generation_methods=["generateContent"])
+                for n in self.names]
+
+    def GenerativeModel(self, name):
+        return SimpleNamespace(name=name)
+
+
+@pytest.fixture
+def genai(monkeypatch):
+    fake = FakeGenai(["gemini-1.5-pro", "gemini-2.0-flash"])
+    monkeypatch.setattr(emotion, "genai", fake)
+    monkeypatch.setattr(emotion, "api_key", "test-key")
+    return fake
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(emotion.time, "time", lambda: now[0])
+    return now
+
+
+def test_prefers_flash_and_caches(genai, clock):
+    registry = ModelRegistry(ttl=60)
+    model = registry.get()
+    assert model.name == "gemini-2.0-flash"
+    assert registry.get() is model
+    assert genai.list_calls == 1
+    assert registry.stats["hits"] == 1
+
+
+def test_falls_back_to_pro(genai, clock):
+    genai.names = ["gemini-1.5-pro", "embedding-001"]
+    assert ModelRegistry().get().name == "gemini-1.5-pro"
+
+
+def test_ttl_expiry_lists_again(genai, clock):
+    registry = ModelRegistry(ttl=60)
+    first = registry.get()
+    clock[0] += 61
+    # 같은 모델이면 GenerativeModel 을 새로 만들지 않음
+    assert registry.get() is first
+    assert genai.list_calls == 2
+
+    genai.names = ["gemini-2.5-flash"]
+    clock[0] += 61
+    assert registry.get().name == "gemini-2.5-flash"
+
+
+def test_refresh_ignores_ttl(genai, clock):
+    registry = ModelRegistry(ttl=3600)
+    registry.get()
+    genai.names = ["gemini-2.5-flash"]
+    assert registry.refresh().name == "gemini-2.5-flash"
+    assert genai.list_calls == 2
+
+
+def test_list_failure_keeps_model_and_retries_after_a_minute(genai, clock):
+    registry = ModelRegistry(ttl=600)
+    model = registry.get()
+    clock[0] += 601
+    genai.fail = True
+    assert registry.get() is model
+    assert registry.stats["list_failures"] == 1
+    # 1분 안에는 다시 조회하지 않음
+    clock[0] += 30
+    assert registry.get() is model
+    assert genai.list_calls == 2
+    clock[0] += 31
+    genai.fail = False
+    registry.get()
+    assert genai.list_calls == 3
+
+
+def test_list_failure_without_model_uses_default(genai, clock):
+    genai.fail = True
+    assert ModelRegistry().get().name == "gemini-pro"
+
+
+def test_pinned_model_skips_listing(genai, clock):
+    assert ModelRegistry(pinned="gemini-2.5-pro").get().name == "gemini-2.5-pro"
+    assert genai.list_calls == 0
+
+
+def test_no_api_key(genai, monkeypatch):
+    monkeypatch.setattr(emotion, "api_key", None)
+    assert ModelRegistry().get() is None
+    assert genai.list_calls == 0